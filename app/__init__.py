@@ -11,7 +11,6 @@ __version__ = "1.0.0"
 __author__ = "AI Agriculture Chatbot Team"
 __email__ = "support@aiagrichatbot.com"
 
-import logging
 from app.config import Config
 from app.utils import setup_logging
 
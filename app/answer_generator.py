@@ -1,11 +1,22 @@
 import logging
+import time
 import google.generativeai as genai
-from typing import Optional, Dict, Any
+from google.api_core import exceptions as google_exceptions
+from typing import Optional, Callable, List
 from app.config import Config
 from app.utils import is_agriculture_related, load_knowledge_base
+from app.messages import get_message, message_catalog
+from app.logging_setup import SAMPLED
+from app.concurrency import AdaptiveLimiter, Hedger, LimiterRejected
+from app.schemes import scheme_engine
+from app.weather import weather_engine
 
 logger = logging.getLogger(__name__)
 
+# Context providers: (query, language) -> extra prompt context, or None.
+# They run for every generated answer, so they must be local and fast.
+CONTEXT_PROVIDERS: List[Callable[[str, str], Optional[str]]] = [weather_engine.context, scheme_engine.context]
+
 class GeminiAnswerGenerator:
     """Gemini AI-powered answer generator for agricultural queries"""
     
@@ -31,11 +42,15 @@ class GeminiAnswerGenerator:
             logger.error(f"Failed to initialize Gemini model: {e}")
             raise
     
-    def _create_enhanced_prompt(self, user_query: str, language: str = 'en') -> str:
+    def _create_enhanced_prompt(self, user_query: str, language: str = 'en', direct: bool = False) -> str:
         """Create enhanced prompt with agricultural context"""
         
-        # Base system prompt for Koti character
-        system_prompt = """तुम्ही कोती आहात, महाराष्ट्रातील शेतकऱ्यांसाठी एक AI सहायक. तुम्ही एका अनुभवी गावातील वडिलांसारखे बोलता आणि शेतकऱ्यांना त्यांच्या शेती, पिके, हवामान, बाजारभाव आणि सरकारी योजनांबद्दल मदत करता."""
+        if direct and language == 'mr':
+            # Marathi query answered directly in Marathi (direct pipeline mode)
+            system_prompt = Config.get_system_prompt('marathi')
+        else:
+            # Base system prompt for Koti character
+            system_prompt = """तुम्ही कोती आहात, महाराष्ट्रातील शेतकऱ्यांसाठी एक AI सहायक. तुम्ही एका अनुभवी गावातील वडिलांसारखे बोलता आणि शेतकऱ्यांना त्यांच्या शेती, पिके, हवामान, बाजारभाव आणि सरकारी योजनांबद्दल मदत करता."""
         
         if language == 'mr':
             system_prompt += " नेहमी मराठीत उत्तर द्या आणि आदरपूर्वक बोला."
@@ -44,19 +59,40 @@ class GeminiAnswerGenerator:
         
         # Check if query is agriculture-related
         if not is_agriculture_related(user_query):
-            redirect_message = {
-                'en': "I specialize in helping farmers with agricultural questions. Please ask me about farming, crops, weather, market prices, or government schemes for farmers.",
-                'mr': "मी शेतकऱ्यांना शेतीच्या प्रश्नांमध्ये मदत करण्यात तज्ञ आहे. कृपया मला शेती, पिके, हवामान, बाजारभाव किंवा शेतकऱ्यांसाठी सरकारी योजनांबद्दल विचारा."
-            }
-            return redirect_message.get(language, redirect_message['en'])
+            return get_message('redirect_short', language, 'en')
         
-        # Create full prompt
-        full_prompt = f"{system_prompt}\n\nUser: {user_query}\nKoti:"
+        # Create full prompt, with any local data relevant to the question
+        context = self._provider_context(user_query, language)
+        if context:
+            full_prompt = f"{system_prompt}\n\n{context}\n\nUser: {user_query}\nKoti:"
+        else:
+            full_prompt = f"{system_prompt}\n\nUser: {user_query}\nKoti:"
         
         return full_prompt
     
-    def generate_response(self, user_query: str, language: str = 'mr') -> str:
-        """Generate AI response to user query"""
+    def _provider_context(self, user_query: str, language: str) -> str:
+        """Context from the registered providers (e.g. the local weather forecast)"""
+        sections = []
+        for provider in CONTEXT_PROVIDERS:
+            try:
+                context = provider(user_query, language)
+            except Exception as e:
+                logger.error("Context provider %s failed: %s", getattr(provider, '__qualname__', provider), e)
+                continue
+            if context:
+                sections.append(context)
+        return '\n\n'.join(sections)
+    
+    def generate_response(self, user_query: str, language: str = 'mr', timeout: float = None,
+                          direct: bool = False) -> str:
+        """
+        Generate AI response to user query.
+        `timeout` is the time budget (seconds) left for this call; it bounds both
+        the wait for a concurrency slot and the upstream request. `direct` marks
+        the chat pipeline's direct mode (query as written, answered in its language).
+        """
+        timeout = Config.GEMINI_TIMEOUT if timeout is None else min(timeout, Config.GEMINI_TIMEOUT)
+        started = time.monotonic()
         try:
             if not self.model:
                 try:
@@ -66,11 +102,10 @@ class GeminiAnswerGenerator:
                     return self._get_api_key_missing_message(language)
             
             # Create prompt
-            prompt = self._create_enhanced_prompt(user_query, language)
+            prompt = self._create_enhanced_prompt(user_query, language, direct)
             
             # Check if we got a redirect message
-            if prompt in ["I specialize in helping farmers with agricultural questions. Please ask me about farming, crops, weather, market prices, or government schemes for farmers.",
-                        "मी शेतकऱ्यांना शेतीच्या प्रश्नांमध्ये मदत करण्यात तज्ञ आहे. कृपया मला शेती, पिके, हवामान, बाजारभाव किंवा शेतकऱ्यांसाठी सरकारी योजनांबद्दल विचारा."]:
+            if message_catalog.is_canned(prompt):
                 return prompt
             
             # Configure safety settings
@@ -93,17 +128,28 @@ class GeminiAnswerGenerator:
                 },
             ]
             
-            # Generate response
-            response = self.model.generate_content(
-                prompt,
-                safety_settings=safety_settings,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 1024,
-                }
-            )
+            expires_at = started + timeout
+            
+            def attempt():
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    raise LimiterRejected("Deadline passed while waiting for a Gemini slot")
+                return self.model.generate_content(
+                    prompt,
+                    safety_settings=safety_settings,
+                    generation_config={
+                        "temperature": 0.7,
+                        "top_p": 0.8,
+                        "top_k": 40,
+                        "max_output_tokens": 1024,
+                    },
+                    request_options={"timeout": remaining}
+                )
+            
+            # Generate response within the adaptive concurrency limit; slow calls
+            # may be hedged with a duplicate request (tail latency), each attempt
+            # holding its own limiter slot until it finishes
+            response = gemini_hedger.call(attempt, timeout=expires_at - time.monotonic())
             
             # Check if response was blocked
             if not response.text:
@@ -112,33 +158,32 @@ class GeminiAnswerGenerator:
             
             # Clean and return response
             cleaned_response = response.text.strip()
-            logger.info(f"Generated response: {cleaned_response[:100]}...")
+            logger.info("Generated response (%d chars)", len(cleaned_response), extra=SAMPLED)
+            logger.debug("Generated response: %.100s...", cleaned_response)
             
             return cleaned_response
             
+        except LimiterRejected as e:
+            logger.warning("Gemini call shed: %s", e)
+            return self._get_fallback_response(user_query, language)
         except ValueError as e:
             if "API key" in str(e):
-                logger.error(f"API key error: {e}")
+                logger.error("API key error: %s", e)
                 return self._get_api_key_missing_message(language)
-            logger.error(f"Value error generating response: {e}")
+            logger.error("Value error generating response: %s", e)
             return self._get_fallback_response(user_query, language)
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
+            logger.error("Error generating response: %s", e)
             return self._get_fallback_response(user_query, language)
     
     def _get_fallback_response(self, user_query: str, language: str) -> str:
         """Provide fallback response when AI fails"""
         
-        fallback_responses = {
-            'en': "I apologize, but I'm having trouble processing your query right now. Please try rephrasing your question or contact our support team.",
-            'mr': "माफ करा, सध्या मला तुमच्या प्रश्नाची उत्तरे देण्यात अडचण येत आहे. कृपया तुमचा प्रश्न पुन्हा विचारा किंवा आमच्या सहाय्यता टीमशी संपर्क साधा."
-        }
-        
         # Try to provide basic information based on keywords
         if is_agriculture_related(user_query):
             return self._get_basic_agriculture_info(user_query, language)
         
-        return fallback_responses.get(language, fallback_responses['en'])
+        return get_message('fallback', language, 'en')
     
     def _get_basic_agriculture_info(self, user_query: str, language: str) -> str:
         """Provide basic agricultural information as fallback"""
@@ -147,34 +192,45 @@ class GeminiAnswerGenerator:
         
         # Basic crop information
         if any(word in query_lower for word in ['rice', 'भात', 'तांदूळ']):
-            responses = {
-                'en': "Rice is a major Kharif crop in Maharashtra. Best planted during June-July with monsoon rains. Requires adequate water and fertile soil.",
-                'mr': "भात हे महाराष्ट्रातील प्रमुख खरीप पीक आहे. जून-जुलैमध्ये पावसाळ्यात लावले जाते. पुरेसे पाणी आणि सुपीक मातीची गरज असते."
-            }
-            return responses.get(language, responses['en'])
+            return get_message('crop_rice', language, 'en')
         
         elif any(word in query_lower for word in ['cotton', 'कापूस']):
-            responses = {
-                'en': "Cotton is an important cash crop in Maharashtra. Planted during Kharif season. Requires warm climate and moderate rainfall.",
-                'mr': "कापूस हे महाराष्ट्रातील महत्वाचे नगदी पीक आहे. खरीप हंगामात लावले जाते. उष्ण हवामान आणि मध्यम पावसाची गरज असते."
-            }
-            return responses.get(language, responses['en'])
+            return get_message('crop_cotton', language, 'en')
         
         # Default fallback
-        default_responses = {
-            'en': "For specific agricultural advice, please contact your local agriculture extension officer or visit the nearest Krishi Vigyan Kendra.",
-            'mr': "विशिष्ट शेती सल्ल्यासाठी, कृपया तुमच्या स्थानिक कृषी विस्तार अधिकाऱ्याशी संपर्क साधा किंवा जवळच्या कृषी विज्ञान केंद्राला भेट द्या."
-        }
-        
-        return default_responses.get(language, default_responses['en'])
+        return get_message('contact_extension_officer', language, 'en')
     
     def _get_api_key_missing_message(self, language: str) -> str:
         """Return a user-friendly message when API key is missing"""
-        messages = {
-            'en': "The AI service is currently unavailable. The system administrator needs to set up the API key. Please contact support for assistance.",
-            'mr': "AI सेवा सध्या उपलब्ध नाही. सिस्टम प्रशासकाने API की सेट करणे आवश्यक आहे. कृपया मदतीसाठी सपोर्टशी संपर्क साधा."
-        }
-        return messages.get(language, messages['en'])
+        return get_message('api_key_missing', language, 'en')
+
+def _is_overload(error: BaseException) -> bool:
+    """Upstream errors that mean Gemini is overloaded (back off) rather than broken"""
+    return isinstance(error, (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.ServiceUnavailable,
+        TimeoutError
+    ))
+
+# Shared limiter for all Gemini calls in this process
+gemini_limiter = AdaptiveLimiter(
+    'gemini',
+    initial_limit=Config.GEMINI_INITIAL_CONCURRENCY,
+    min_limit=Config.GEMINI_MIN_CONCURRENCY,
+    max_limit=Config.GEMINI_MAX_CONCURRENCY,
+    max_queue_time=Config.GEMINI_MAX_QUEUE_TIME,
+    is_overload=_is_overload
+)
+
+# Hedging for Gemini calls (off by default: a hedge doubles the cost of slow calls)
+gemini_hedger = Hedger(
+    'gemini',
+    enabled=Config.HEDGING_ENABLED,
+    percentile=Config.HEDGE_PERCENTILE,
+    max_workers=Config.GEMINI_MAX_CONCURRENCY,  # Every attempt holds a limiter slot, so none waits for a thread
+    limiter=gemini_limiter
+)
 
 # Global instance
 answer_generator = GeminiAnswerGenerator()
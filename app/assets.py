@@ -0,0 +1,255 @@
+"""
+Static asset build
+
+Minifies, fingerprints and precompresses the web UI assets into
+webapp/static/dist/ and writes a manifest mapping source paths to their
+fingerprinted names. The app serves these from /assets/ with immutable
+caching; templates reference them through asset_url().
+
+A build never deletes the files of the previous one: pages (and service
+worker caches) rendered before a deploy keep loading their assets.
+Superseded files are pruned once they are ASSET_RETENTION_DAYS old. Running
+workers pick up a new manifest without a restart.
+
+Usage:
+    python -m app.assets             # build and print transfer sizes
+    python -m app.assets --no-minify
+    python -m app.assets --keep-days 1
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Any, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional - only .gz variants are built
+    brotli = None
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'webapp', 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_FILE = os.path.join(DIST_DIR, 'manifest.json')
+
+# Source assets (relative to webapp/static)
+ASSETS = ('css/style.css', 'js/script.js')
+
+MANIFEST_CHECK_SECONDS = 5  # How often a worker looks for a newer manifest
+
+# Characters after which a '/' starts a regex literal rather than a division
+_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+
+
+def minify_js(source: str) -> str:
+    """
+    Conservative JavaScript minifier: drops comments, indentation and blank
+    lines but keeps line breaks, so automatic semicolon insertion is unaffected.
+    """
+    out = []
+    i, length = 0, len(source)
+    last = ''  # Last significant character emitted
+
+    while i < length:
+        char = source[i]
+        pair = source[i:i + 2]
+
+        if pair == '//':
+            end = source.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        if pair == '/*':
+            end = source.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+
+        if char in '\'"`' or (char == '/' and (last in _REGEX_PREFIX or last == '')):
+            # Copy string, template or regex literal verbatim
+            start = i
+            i += 1
+            in_class = False
+            while i < length:
+                current = source[i]
+                if current == '\\':
+                    i += 2
+                    continue
+                if char == '/':
+                    if current == '[':
+                        in_class = True
+                    elif current == ']':
+                        in_class = False
+                    elif current == '/' and not in_class:
+                        break
+                elif current == char:
+                    break
+                i += 1
+            i += 1
+            out.append(source[start:i])
+            last = char
+            continue
+
+        out.append(char)
+        if not char.isspace():
+            last = char
+        i += 1
+
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+_CSS_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+
+def minify_css(source: str) -> str:
+    """Whitespace/comment CSS minifier that leaves quoted strings untouched"""
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub('', source))
+    for index in range(0, len(parts), 2):  # Even indexes are outside strings
+        part = re.sub(r'\s+', ' ', parts[index])
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)  # Not before ':' - '.a :hover' differs from '.a:hover'
+        parts[index] = part.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+def _minify(path: str, data: bytes) -> bytes:
+    text = data.decode('utf-8')
+    if path.endswith('.js'):
+        return minify_js(text).encode('utf-8')
+    if path.endswith('.css'):
+        return minify_css(text).encode('utf-8')
+    return data
+
+
+def build_assets(minify: bool = True, static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR,
+                 keep_days: float = None) -> Dict[str, Any]:
+    """Build fingerprinted, precompressed assets and return the manifest"""
+    os.makedirs(dist_dir, exist_ok=True)
+
+    manifest = {'assets': {}, 'sizes': {}}
+    for path in ASSETS:
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            original = f.read()
+        data = _minify(path, original) if minify else original
+
+        digest = hashlib.blake2b(data, digest_size=5).hexdigest()
+        stem, extension = os.path.splitext(path)
+        fingerprinted = f"{stem}.{digest}{extension}"
+        output = os.path.join(dist_dir, fingerprinted)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+
+        with open(output, 'wb') as f:
+            f.write(data)
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(f"{output}.gz", 'wb') as f:
+            f.write(gzipped)
+        sizes = {'original': len(original), 'minified': len(data), 'gzip': len(gzipped)}
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            with open(f"{output}.br", 'wb') as f:
+                f.write(compressed)
+            sizes['br'] = len(compressed)
+
+        manifest['assets'][path] = fingerprinted
+        manifest['sizes'][path] = sizes
+
+    tmp_file = os.path.join(dist_dir, 'manifest.json.tmp')
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, os.path.join(dist_dir, 'manifest.json'))
+
+    prune_assets(manifest, dist_dir, Config.ASSET_RETENTION_DAYS if keep_days is None else keep_days)
+    return manifest
+
+
+def prune_assets(manifest: Dict[str, Any], dist_dir: str, keep_days: float) -> int:
+    """Delete files of earlier builds that are older than keep_days; returns files deleted"""
+    current = set()
+    for fingerprinted in manifest['assets'].values():
+        current.update((fingerprinted, f"{fingerprinted}.gz", f"{fingerprinted}.br"))
+    cutoff = time.time() - keep_days * 86400
+    deleted = 0
+    for root, _, files in os.walk(dist_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, dist_dir).replace(os.sep, '/')
+            if relative == 'manifest.json' or relative in current:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    deleted += 1
+            except OSError as e:
+                logger.warning("Could not prune asset %s: %s", relative, e)
+    return deleted
+
+
+_manifest: Optional[Dict[str, str]] = None
+_manifest_mtime: Optional[float] = None
+_manifest_checked_at = 0.0
+
+
+def load_manifest(reload: bool = False) -> Dict[str, str]:
+    """
+    Source path -> fingerprinted path (empty if the assets were never built).
+    A rebuilt manifest is picked up within MANIFEST_CHECK_SECONDS.
+    """
+    global _manifest, _manifest_mtime, _manifest_checked_at
+    now = time.monotonic()
+    if _manifest is not None and not reload and now - _manifest_checked_at < MANIFEST_CHECK_SECONDS:
+        return _manifest
+    _manifest_checked_at = now
+
+    try:
+        mtime = os.path.getmtime(MANIFEST_FILE)
+    except OSError:
+        mtime = None
+    if _manifest is None or reload or mtime != _manifest_mtime:
+        try:
+            with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                _manifest = json.load(f)['assets']
+        except (OSError, ValueError, KeyError):
+            _manifest = {}
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def fingerprinted_path(path: str) -> Optional[str]:
+    """Fingerprinted dist path for a source asset, if built"""
+    return load_manifest().get(path)
+
+
+def _report(manifest: Dict[str, Any]):
+    sizes = manifest['sizes']
+    print(f"{'asset':<16} {'original':>9} {'minified':>9} {'gzip':>7} {'br':>7}")
+    for path, size in sizes.items():
+        print(f"{path:<16} {size['original']:>9} {size['minified']:>9} {size['gzip']:>7} {size.get('br', '-'):>7}")
+
+    before = sum(size['original'] for size in sizes.values())
+    after = sum(min(size['gzip'], size.get('br', size['gzip'])) for size in sizes.values())
+    print(f"\nFirst load:  {before} -> {after} bytes ({100 * (1 - after / before):.0f}% smaller)")
+    print(f"Repeat load: {len(sizes)} revalidation requests -> 0 requests (immutable, served from browser cache)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument('--no-minify', action='store_true', help="Skip minification (fingerprint and compress only)")
+    parser.add_argument('--keep-days', type=float,
+                        help=f"Keep superseded builds this long (default: {Config.ASSET_RETENTION_DAYS:g})")
+    args = parser.parse_args()
+
+    manifest = build_assets(minify=not args.no_minify, keep_days=args.keep_days)
+    print(f"Built {len(manifest['assets'])} assets into {DIST_DIR}\n")
+    _report(manifest)
+
+
+if __name__ == '__main__':
+    main()
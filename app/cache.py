@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.config import Config
+from app.shared_cache import create_shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and single-flight computation.
+
+    Concurrent get_or_compute calls for the same missing key share one
+    computation: the first caller computes, the others wait for its result.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, name: str = 'cache'):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Callers that attached to an in-flight computation
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """Store a value, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: float = None,
+                       cache_if: Callable[[Any], bool] = None, wait_timeout: float = None) -> Any:
+        """
+        Get a cached value or compute it once, sharing the computation with
+        concurrent callers. Results rejected by cache_if are returned but not
+        stored; exceptions propagate to every waiting caller. A caller waiting
+        on another's computation raises TimeoutError after wait_timeout seconds.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                return value
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result(timeout=wait_timeout)
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if value is not None and (cache_if is None or cache_if(value)):
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Live entries as (key, value, remaining TTL), least recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value, expires_at - now) for key, (value, expires_at) in self._entries.items()
+                    if expires_at > now]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'backend': 'memory',
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_in_flight': self.shared,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def make_cache(max_size: int, ttl: float, name: str):
+    """Cache on the configured CACHE_BACKEND, falling back to a per-process TTLCache"""
+    if Config.CACHE_BACKEND != 'memory':
+        try:
+            return create_shared_cache(Config.CACHE_BACKEND, max_size, ttl, name)
+        except Exception as e:
+            logger.error("Shared %s cache unavailable (%s); using a per-process cache", name, e)
+    return TTLCache(max_size, ttl, name)
+
+
+# Global caches shared by the pipeline (and by batch requests)
+response_cache = make_cache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL, 'response')
+translation_cache = make_cache(Config.TRANSLATION_CACHE_SIZE, Config.TRANSLATION_CACHE_TTL, 'translation')
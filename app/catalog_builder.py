@@ -0,0 +1,159 @@
+"""
+Message catalog builder
+
+Compiles the canned bilingual messages plus precomputed translations of the
+most frequent questions/answers from the chat logs into a compact JSON
+artifact that every worker loads once at startup.
+
+With --clusters, the FAQs come from the near-duplicate clusters mined by
+app.faq_miner instead of exact repeats (ranked by the cluster's total count).
+Only the representative question is indexed: near-duplicates can still need
+a different answer, so variants are kept in the clusters file for review.
+Questions answered from live data (prices, forecasts, schemes, doses) are
+never precomputed.
+
+Usage:
+    python -m app.catalog_builder --top 100 --workers 8
+    python -m app.catalog_builder --mock --output /tmp/catalog.json    # no Translate API calls
+    python -m app.catalog_builder --clusters data/faq_clusters.json
+"""
+
+import argparse
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Iterable
+
+from app.config import Config
+from app.faq_miner import is_data_dependent, load_faq_clusters
+from app.messages import DEFAULT_MESSAGES, faq_key, message_catalog
+from app.utils import chat_log_files, iter_chat_logs, is_agriculture_related
+
+logger = logging.getLogger(__name__)
+
+
+class MockTranslator:
+    """Offline stand-in for the Translate API (marks text with the target language)"""
+
+    def translate(self, text: str, target: str) -> str:
+        return f"[{target}] {text}"
+
+
+class LanguageProcessorTranslator:
+    """Translator backed by the real Google Translate API"""
+
+    def __init__(self):
+        from app.translator import language_processor
+        self.language_processor = language_processor
+
+    def translate(self, text: str, target: str) -> str:
+        if target == 'en':
+            return self.language_processor.translate_to_english(text)
+        return self.language_processor.translate_to_marathi(text)
+
+
+def collect_top_questions(log_files: Iterable[str], top: int) -> List[Dict[str, Any]]:
+    """Find the most frequent agriculture questions and their latest answers"""
+    counts = Counter()
+    latest = {}
+
+    for log_file in log_files:
+        for entry in iter_chat_logs(log_file):
+            question = entry.get('user_input', '')
+            answer = entry.get('bot_response', '')
+            if not question or not answer or answer.startswith('ERROR:'):
+                continue
+            if not is_agriculture_related(question) or message_catalog.is_canned(answer):
+                continue
+            if is_data_dependent(question):
+                continue
+
+            key = faq_key(question)
+            counts[key] += 1
+            latest[key] = {
+                'question': question,
+                'answer': answer,
+                'language': entry.get('language', 'mr')
+            }
+
+    return [dict(latest[key], count=count) for key, count in counts.most_common(top)]
+
+
+def build_catalog(log_files: Iterable[str], translator, top: int = 100, workers: int = 8,
+                  clusters_file: str = None) -> Dict[str, Any]:
+    """
+    Build the catalog artifact with precomputed FAQ translations.
+    
+    The translator is required: MockTranslator output must never end up in
+    the catalog that production workers serve by accident.
+    """
+    if clusters_file:
+        faqs = load_faq_clusters(clusters_file, top)
+    else:
+        faqs = collect_top_questions(log_files, top)
+
+    def translate_faq(faq: Dict[str, Any]) -> Dict[str, Any]:
+        source = faq['language'] if faq['language'] in Config.SUPPORTED_LANGUAGES else 'mr'
+        target = 'en' if source == 'mr' else 'mr'
+        return {
+            'question': {source: faq['question'], target: translator.translate(faq['question'], target)},
+            'answer': {source: faq['answer'], target: translator.translate(faq['answer'], target)}
+        }
+
+    # Translation is network-bound, so threads give us the parallelism we need
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        translated = list(executor.map(translate_faq, faqs))
+
+    faq_index = {}
+    faq_answers = []
+    for index, faq in enumerate(translated):
+        faq_answers.append(faq['answer'])
+        for question in faq['question'].values():
+            faq_index.setdefault(faq_key(question), index)
+
+    return {
+        'version': 1,
+        'built_at': datetime.now().isoformat(),
+        'messages': DEFAULT_MESSAGES,
+        'faq_index': faq_index,
+        'faq_answers': faq_answers
+    }
+
+
+def write_catalog(catalog: Dict[str, Any], output_file: str):
+    """Write the artifact atomically so running workers never read a partial file"""
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_file, output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed message catalog")
+    parser.add_argument('--logs', nargs='+', help="Chat log files to mine (default: all current and rotated logs)")
+    parser.add_argument('--output', help=f"Catalog artifact path (default: {Config.MESSAGE_CATALOG_FILE})")
+    parser.add_argument('--top', type=int, default=100, help="Number of FAQ answers to precompute")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel translation workers")
+    parser.add_argument('--mock', action='store_true',
+                        help="Use the offline mock translator (requires an explicit --output)")
+    parser.add_argument('--clusters', nargs='?', const=Config.FAQ_CLUSTERS_FILE,
+                        help="Take FAQs from mined near-duplicate clusters (python -m app.faq_miner)")
+    args = parser.parse_args()
+    if args.mock and not args.output:
+        parser.error("--mock requires --output so mock translations never replace the served catalog")
+    output_file = args.output or Config.MESSAGE_CATALOG_FILE
+
+    translator = MockTranslator() if args.mock else LanguageProcessorTranslator()
+    catalog = build_catalog(args.logs or chat_log_files(), translator, args.top, args.workers, args.clusters)
+    write_catalog(catalog, output_file)
+
+    print(f"Wrote {output_file}: {len(catalog['messages'])} messages, "
+          f"{len(catalog['faq_answers'])} FAQ answers, {len(catalog['faq_index'])} indexed questions")
+
+
+if __name__ == '__main__':
+    main()
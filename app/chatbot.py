@@ -1,48 +1,124 @@
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from datetime import datetime
-import uuid
 
 from app.translator import language_processor
 from app.answer_generator import answer_generator
 from app.utils import (
     validate_input, 
+    clean_text,
     log_conversation, 
     create_response_template,
     format_error_message,
     get_welcome_message,
     is_agriculture_related
 )
+from app.messages import get_message, message_catalog
+from app.logging_setup import SAMPLED, stage_timer, request_timestamp
+from app.normalizer import normalize_text, canonical_key
+from app.config import Config
+from app.cache import make_cache, response_cache
+from app.deadline import Deadline
+from app.pipeline import start_stage, run_in_background
+from app.sharding import session_router
+from app.fertilizer import fertilizer_calculator
+from app.history_store import history_store
+from app.market_prices import price_engine
+from app.schemes import scheme_engine
+from app.stats import chat_stats
+from app.weather import weather_engine
 
 logger = logging.getLogger(__name__)
 
+# Local answerers: (text, normalized text, language) -> answer or None.
+# Tried in order after the FAQ lookup and before the model; the first answer wins.
+LOCAL_ANSWERERS: List[Callable[[str, str, str], Optional[str]]] = [
+    price_engine.answer,
+    scheme_engine.answer,
+    fertilizer_calculator.answer,
+]
+
+# Bounded pool shared by all batch requests so a large batch cannot exhaust threads
+_batch_executor = ThreadPoolExecutor(max_workers=Config.BATCH_MAX_WORKERS, thread_name_prefix='chat-batch')
+
 class AgriChatbot:
     """Main chatbot orchestrator that handles the complete conversation flow"""
     
     def __init__(self):
-        self.session_data = {}
+        # Ordered by last activity (every write moves the session to the end),
+        # so cleanup only looks at the expired head
+        self.session_data: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._session_lock = threading.Lock()
+        # With a shared cache backend, sessions are written through so that
+        # another node (or worker) can serve them when the owner is down
+        self.session_store = (
+            make_cache(Config.SESSION_STORE_SIZE, Config.SESSION_STORE_TTL, 'session')
+            if Config.CACHE_BACKEND != 'memory' else None
+        )
         logger.info("AgriChatbot initialized successfully")
     
     def create_session(self) -> str:
-        """Create a new chat session"""
-        session_id = str(uuid.uuid4())
-        self.session_data[session_id] = {
-            'created_at': datetime.now().isoformat(),
+        """Create a new chat session (owned by this node when sharded)"""
+        session_id = session_router.new_session_id()
+        now = request_timestamp()
+        self._put_session(session_id, {
+            'created_at': now,
             'conversation_count': 0,
             'preferred_language': 'mr',  # Default to Marathi
-            'last_activity': datetime.now().isoformat()
-        }
-        logger.info(f"New session created: {session_id}")
+            'last_activity': now
+        }, new=True)
+        logger.info("New session created: %s", session_id, extra=SAMPLED)
         return session_id
     
+    def _put_session(self, session_id: str, session: Dict[str, Any], new: bool = False, store: bool = True):
+        """
+        Add or replace a session. All session writes go through here (and
+        _drop_session) so the running statistics stay in step with session_data.
+        """
+        with self._session_lock:
+            previous = self.session_data.pop(session_id, None)
+            if previous is not None:
+                chat_stats.session_removed(previous)
+            self.session_data[session_id] = session
+            chat_stats.session_added(session, new=new)
+        if store:
+            self._store_session(session_id, session)
+    
+    def _drop_session(self, session_id: str, expired: bool = False) -> Optional[Dict[str, Any]]:
+        """Remove a local session; returns it, or None if it was not here"""
+        with self._session_lock:
+            session = self.session_data.pop(session_id, None)
+            if session is not None:
+                chat_stats.session_removed(session, expired=expired)
+        return session
+    
+    def _store_session(self, session_id: str, session: Dict[str, Any]):
+        """Write a session through to the shared store"""
+        if self.session_store is not None:
+            self.session_store.set(session_id, dict(session))
+    
+    def _load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Local session, else a copy from the shared store (sessions of an unreachable owner)"""
+        session = self.session_data.get(session_id)
+        if session is None and self.session_store is not None:
+            stored = self.session_store.get(session_id)
+            if stored is not None:
+                session = dict(stored)
+                self._put_session(session_id, session, store=False)
+        return session
+    
     def get_welcome_response(self, session_id: str = None, language: str = 'mr') -> Dict[str, Any]:
         """Get welcome message for new users"""
         if not session_id:
             session_id = self.create_session()
         
         # Update session language preference
-        if session_id in self.session_data:
-            self.session_data[session_id]['preferred_language'] = language
+        session = self._load_session(session_id)
+        if session is not None:
+            self._put_session(session_id, dict(session, preferred_language=language))
         
         welcome_msg = get_welcome_message(language)
         
@@ -51,212 +127,374 @@ class AgriChatbot:
             'language': language,
             'status': 'success',
             'session_id': session_id,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': request_timestamp(),
             'is_welcome': True
         }
     
-    def process_query(self, user_input: str, session_id: str = None) -> Dict[str, Any]:
+    def process_query(self, user_input: str, session_id: str = None, language: str = None,
+                      deadline: Deadline = None) -> Dict[str, Any]:
+        """Process a user query and count it by language and status (see _process_query)"""
+        result = self._process_query(user_input, session_id, language, deadline)
+        chat_stats.record_query(result.get('language'), result.get('status'))
+        return result
+    
+    def _process_query(self, user_input: str, session_id: str = None, language: str = None,
+                       deadline: Deadline = None) -> Dict[str, Any]:
         """
-        Main method to process user queries through the complete pipeline:
-        1. Input validation
-        2. Language detection
-        3. Translation (if needed)
-        4. AI response generation
-        5. Response translation (if needed)
-        6. Logging
+        Main method to process user queries. The pipeline is a small stage graph:
+        
+            validate -> normalize -+-> detect (may call Translate) --+-> lookup (FAQ / local answerers / response cache)
+                                   +-> classify (agriculture check) -+      | miss
+                                                                            v
+                                         translate_query -> generate -> translate_response
+        
+        Detection runs concurrently with the local classifier; FAQ, local data
+        (e.g. mandi prices), cache and redirect answers are returned without
+        translating the query at all.
+        Conversation logging and session bookkeeping run after the reply, in
+        the background.
+        
+        `language` forces the response language (e.g. the UI language selector);
+        by default the reply is in the detected language of the query.
+        
+        `deadline` is the end-to-end time budget; stages that cannot fit in
+        the remaining budget are skipped or degraded rather than overrunning it.
         """
+        deadline = deadline or Deadline(Config.CHAT_DEADLINE)
         
         # Create session if not provided
         if not session_id:
             session_id = self.create_session()
         
         try:
-            # Step 1: Input validation
+            # Validation
             is_valid, validation_message = validate_input(user_input)
             if not is_valid:
-                logger.warning(f"Invalid input: {validation_message}")
-                return create_response_template(
+                logger.warning("Invalid input: %s", validation_message)
+                response_data = create_response_template(
                     format_error_message('mr'),
                     'mr',
                     'error'
                 )
+                response_data['session_id'] = session_id
+                return response_data
             
-            # Step 2: Language processing
-            processed_text, detected_language, original_text = language_processor.process_query(user_input)
-            
-            # Update session data
-            self._update_session(session_id, detected_language)
-            
-            # Step 3: Check if query is agriculture-related
-            if not is_agriculture_related(original_text):
-                redirect_response = self._get_redirect_response(detected_language)
-                
-                # Log the interaction
-                log_conversation(
-                    user_input=original_text,
-                    bot_response=redirect_response,
-                    language=detected_language,
-                    session_id=session_id
-                )
-                
-                return create_response_template(
-                    redirect_response,
-                    detected_language,
-                    'redirect'
-                )
+            # Normalization - one canonical form shared by the classifier and lookups
+            with stage_timer('normalize'):
+                user_input = clean_text(user_input)
+                normalized_text = normalize_text(user_input)
+                query_key = canonical_key(normalized_text, normalized=True)
             
-            # Step 4: Generate AI response
-            logger.info(f"Generating response for query: '{processed_text[:50]}...'")
+            # Language detection (only when the client did not choose a language)
+            # alongside the agriculture classifier. The stage is always awaited,
+            # so it never outlives the request it records timings for.
+            detection = None
+            if language not in Config.SUPPORTED_LANGUAGES:
+                detection = start_stage('detect', language_processor.detect_language, user_input, deadline)
+            with stage_timer('classify'):
+                is_agriculture = is_agriculture_related(normalized_text, normalized=True)
             
-            # Generate response in English (Gemini works better with English)
-            ai_response = answer_generator.generate_response(processed_text, 'en')
+            # With a client-chosen language, generation detects the query language itself if it needs it
+            detected_language = None
+            if detection is not None:
+                language = detected_language = detection.result()
             
-            # Step 5: Translate response if needed
-            final_response = language_processor.process_response(ai_response, detected_language)
+            if not is_agriculture:
+                final_response, status = self._get_redirect_response(language), 'redirect'
+            else:
+                # Precomputed FAQ answers and local data answers need no model call
+                with stage_timer('lookup'):
+                    final_response = message_catalog.get_faq_answer(user_input, language, key=query_key)
+                if final_response is None:
+                    with stage_timer('local_answer'):
+                        final_response = self._local_answer(user_input, normalized_text, language)
+                
+                if final_response is None:
+                    # Translate, generate and translate back once per canonical
+                    # question; concurrent identical questions share the computation
+                    final_response, _ = response_cache.get_or_compute(
+                        self._response_key(query_key, user_input, language),
+                        lambda: self._generate_answer(user_input, detected_language, language, deadline),
+                        cache_if=lambda result: result[1]
+                    )
+                status = 'success'
             
-            # Step 6: Log conversation
-            log_conversation(
-                user_input=original_text,
+            # Post-response work - the reply does not wait for it
+            run_in_background('update_session', self._update_session, session_id, language)
+            run_in_background(
+                'log_conversation',
+                log_conversation,
+                user_input=user_input,
                 bot_response=final_response,
-                language=detected_language,
+                language=language,
                 session_id=session_id
             )
             
-            # Step 7: Create response
             response_data = create_response_template(
                 final_response,
-                detected_language,
-                'success'
+                language,
+                status
             )
             response_data['session_id'] = session_id
+            history_store.record(session_id, user_input, final_response, language, status, response_data['timestamp'])
             
-            logger.info(f"Query processed successfully for session {session_id}")
+            logger.info("Query processed successfully for session %s", session_id, extra=SAMPLED)
             return response_data
             
         except Exception as e:
-            logger.error(f"Error processing query: {e}", exc_info=True)
+            logger.error("Error processing query: %s", e, exc_info=True)
             
             # Determine language for error message
             try:
-                _, detected_lang, _ = language_processor.process_query(user_input)
+                detected_lang = language or language_processor.detect_language(user_input)
             except:
                 detected_lang = 'mr'  # Default fallback
             
             error_response = format_error_message(detected_lang)
             
             # Log the error
-            log_conversation(
+            run_in_background(
+                'log_conversation',
+                log_conversation,
                 user_input=user_input,
                 bot_response=f"ERROR: {str(e)}",
                 language=detected_lang,
                 session_id=session_id
             )
             
-            return create_response_template(
+            response_data = create_response_template(
                 error_response,
                 detected_lang,
                 'error'
             )
+            response_data['session_id'] = session_id
+            history_store.record(session_id, user_input, error_response, detected_lang, 'error',
+                                 response_data['timestamp'])
+            return response_data
+    
+    def _local_answer(self, text: str, normalized_text: str, language: str) -> Optional[str]:
+        """First answer from the local answerers, or None"""
+        for answerer in LOCAL_ANSWERERS:
+            try:
+                answer = answerer(text, normalized_text, language)
+            except Exception as e:
+                logger.error("Local answerer %s failed: %s", getattr(answerer, '__qualname__', answerer), e)
+                continue
+            if answer:
+                return answer
+        return None
+    
+    def _response_key(self, query_key: str, text: str, language: str) -> str:
+        """Response cache key; weather answers are also keyed by the forecast they may be based on"""
+        return f"{query_key}:{language}{weather_engine.cache_tag(text)}"
+    
+    def _generate_answer(self, original_text: str, detected_language: Optional[str], language: str,
+                         deadline: Deadline) -> Tuple[str, bool]:
+        """
+        Generate an AI answer and translate it into the response language.
+        Returns: (answer, cacheable) - canned fallback answers are not cached
+        """
+        logger.debug("Generating response for query: '%.50s...'", original_text)
+        
+        # Not enough time left for a model call at all
+        if not deadline.has(Config.MIN_GENERATE_BUDGET):
+            logger.warning("Deadline budget exhausted before generation (%s)", deadline)
+            return get_message('fallback', language), False
+        
+        # Direct mode (or no time for the translation round trip): ask Gemini
+        # in the response language, with the query as the user wrote it
+        if Config.PIPELINE_MODE == 'direct' or (
+                language != 'en' and not deadline.has(Config.MIN_GENERATE_BUDGET + 2 * Config.MIN_TRANSLATE_BUDGET)):
+            with stage_timer('generate'):
+                ai_response = answer_generator.generate_response(
+                    original_text, language, timeout=deadline.remaining(), direct=True
+                )
+            return ai_response, not message_catalog.is_canned(ai_response)
+        
+        # Translate the query to English (Gemini works better with English)
+        with stage_timer('translate_query'):
+            processed_text, _, _ = language_processor.process_query(original_text, deadline, detected_language)
+        
+        # Generate the English answer, keeping a slice of the budget for translating it back
+        reserve = Config.MIN_TRANSLATE_BUDGET if language != 'en' else 0.0
+        with stage_timer('generate'):
+            ai_response = answer_generator.generate_response(
+                processed_text, 'en', timeout=deadline.remaining() - reserve
+            )
+        
+        # Translate response if needed
+        with stage_timer('translate_response'):
+            final_response = language_processor.process_response(ai_response, language, deadline)
+        
+        return final_response, not message_catalog.is_canned(ai_response)
+    
+    def process_batch(self, items: List[Dict[str, Any]], default_language: str = None) -> List[Dict[str, Any]]:
+        """
+        Process many queries concurrently on the bounded batch worker pool.
+        Results are returned in input order with per-item status.
+        
+        Each item runs the full pipeline in its own task (detection included),
+        so FAQ, local, cached and redirect answers never wait on Translate and
+        only the items that reach generation are translated.
+        """
+        futures = []
+        for item in items:
+            message = item.get('message')
+            if not isinstance(message, str):
+                error = 'message must be a string'
+            elif not message.strip():
+                error = 'Empty message'
+            elif not isinstance(item.get('session_id') or '', str):
+                error = 'session_id must be a string'
+            else:
+                error = None
+            future = None if error else _batch_executor.submit(
+                self.process_query,
+                message,
+                item.get('session_id'),
+                item.get('language') or default_language
+            )
+            futures.append((future, error))
+        
+        results = []
+        for index, (item, (future, error)) in enumerate(zip(items, futures)):
+            if future is None:
+                result = create_response_template(format_error_message('mr'), 'mr', 'error')
+                result['error'] = error
+            else:
+                result = future.result()
+            result['index'] = index
+            if 'id' in item:
+                result['id'] = item['id']
+            results.append(result)
+        
+        return results
+    
+    def warm_query(self, user_input: str, language: str, throttle: Callable[[], None] = None) -> bool:
+        """
+        Prefill the response (and translation) caches for a question without
+        logging it or touching sessions. `throttle` is called right before the
+        upstream calls. Returns True if a new answer was generated and cached.
+        """
+        user_input = clean_text(user_input)
+        normalized_text = normalize_text(user_input)
+        if not user_input or not is_agriculture_related(normalized_text, normalized=True):
+            return False
+        
+        query_key = canonical_key(normalized_text, normalized=True)
+        if message_catalog.get_faq_answer(user_input, language, key=query_key) is not None:
+            return False
+        if self._local_answer(user_input, normalized_text, language) is not None:
+            return False
+        
+        cache_key = self._response_key(query_key, user_input, language)
+        if response_cache.get(cache_key) is not None:
+            return False
+        
+        if throttle:
+            throttle()
+        deadline = Deadline(Config.CHAT_DEADLINE)
+        _, cacheable = response_cache.get_or_compute(
+            cache_key,
+            lambda: self._generate_answer(user_input, None, language, deadline),
+            cache_if=lambda result: result[1]
+        )
+        return cacheable
     
     def _update_session(self, session_id: str, detected_language: str):
         """Update session data with new interaction"""
-        if session_id in self.session_data:
-            self.session_data[session_id].update({
-                'last_activity': datetime.now().isoformat(),
-                'conversation_count': self.session_data[session_id]['conversation_count'] + 1,
-                'preferred_language': detected_language
-            })
+        now = request_timestamp()
+        session = self._load_session(session_id)
+        if session is not None:
+            self._put_session(session_id, dict(
+                session,
+                last_activity=now,
+                conversation_count=session['conversation_count'] + 1,
+                preferred_language=detected_language
+            ))
         else:
             # Create session if it doesn't exist
-            self.session_data[session_id] = {
-                'created_at': datetime.now().isoformat(),
+            self._put_session(session_id, {
+                'created_at': now,
                 'conversation_count': 1,
                 'preferred_language': detected_language,
-                'last_activity': datetime.now().isoformat()
-            }
+                'last_activity': now
+            }, new=True)
     
     def _get_redirect_response(self, language: str) -> str:
         """Get response for non-agriculture queries"""
-        redirect_messages = {
-            'mr': """मी कोती आहे - तुमचा शेती सहायक! 🌾
-            
-मी फक्त शेतीशी संबंधित प्रश्नांची उत्तरे देतो:
-• पिकांची माहिती (भात, गहू, कापूस, ऊस इ.)
-• हवामान आणि हंगामी सल्ले
-• बाजारभाव आणि विक्री
-• सरकारी योजना आणि अनुदान
-• मातीची काळजी आणि खते
-• कीटक आणि रोग व्यवस्थापन
-
-कृपया मला शेतीबद्दल विचारा! 🚜""",
-            
-            'en': """I am Koti - your agriculture assistant! 🌾
-            
-I only answer agriculture-related questions about:
-• Crop information (Rice, Wheat, Cotton, Sugarcane etc.)
-• Weather and seasonal advice
-• Market prices and sales
-• Government schemes and subsidies
-• Soil care and fertilizers
-• Pest and disease management
-
-Please ask me about farming! 🚜"""
-        }
-        
-        return redirect_messages.get(language, redirect_messages['mr'])
+        return get_message('redirect', language)
     
     def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session information"""
-        return self.session_data.get(session_id)
+        session = self.session_data.get(session_id)
+        if session is None and self.session_store is not None:
+            session = self.session_store.get(session_id)
+        return session
+    
+    def import_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> int:
+        """Take over sessions handed over by another node (the more recent copy wins)"""
+        imported = 0
+        for session_id, data in sessions.items():
+            current = self.session_data.get(session_id)
+            if current is None or current.get('last_activity', '') <= data.get('last_activity', ''):
+                self._put_session(session_id, dict(data))
+                imported += 1
+        return imported
+    
+    def rebalance_sessions(self) -> int:
+        """Move sessions this node no longer owns to their new owners"""
+        moved = 0
+        with self._session_lock:
+            local_ids = list(self.session_data)
+        for node, session_ids in session_router.plan_moves(local_ids).items():
+            sessions = {session_id: self.session_data[session_id] for session_id in session_ids
+                        if session_id in self.session_data}
+            if sessions and session_router.send_sessions(node, sessions):
+                for session_id in sessions:
+                    self._drop_session(session_id)
+                moved += len(sessions)
+        logger.info("Rebalanced %d sessions to other nodes", moved)
+        return moved
     
     def cleanup_old_sessions(self, hours: int = 24):
         """Clean up sessions older than specified hours"""
         current_time = datetime.now()
-        sessions_to_remove = []
+        removed = 0
         
-        for session_id, session_data in self.session_data.items():
-            try:
-                last_activity = datetime.fromisoformat(session_data['last_activity'])
-                if (current_time - last_activity).total_seconds() > (hours * 3600):
-                    sessions_to_remove.append(session_id)
-            except:
-                # Remove sessions with invalid timestamps
-                sessions_to_remove.append(session_id)
+        # Sessions are ordered by last write, so stop at the first recent one
+        while True:
+            with self._session_lock:
+                if not self.session_data:
+                    break
+                session_id, session_data = next(iter(self.session_data.items()))
+                try:
+                    last_activity = datetime.fromisoformat(session_data['last_activity'])
+                    if (current_time - last_activity).total_seconds() <= (hours * 3600):
+                        break
+                except:
+                    pass  # Remove sessions with invalid timestamps
+                del self.session_data[session_id]
+                chat_stats.session_removed(session_data, expired=True)
+            removed += 1
+            logger.debug("Cleaned up old session: %s", session_id)
         
-        for session_id in sessions_to_remove:
-            del self.session_data[session_id]
-            logger.info(f"Cleaned up old session: {session_id}")
-        
-        logger.info(f"Cleaned up {len(sessions_to_remove)} old sessions")
+        logger.info("Cleaned up %d old sessions", removed)
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get chatbot statistics"""
-        total_sessions = len(self.session_data)
-        total_conversations = sum(
-            session['conversation_count'] 
-            for session in self.session_data.values()
-        )
-        
-        # Language distribution
-        language_stats = {'mr': 0, 'en': 0}
-        for session in self.session_data.values():
-            lang = session.get('preferred_language', 'mr')
-            language_stats[lang] = language_stats.get(lang, 0) + 1
-        
-        return {
-            'total_sessions': total_sessions,
-            'total_conversations': total_conversations,
-            'language_distribution': language_stats,
-            'active_sessions': total_sessions
-        }
+        """Get chatbot statistics (running counters, constant time in the number of sessions)"""
+        stats = chat_stats.sessions_snapshot()
+        stats.update(chat_stats.traffic_snapshot())
+        return stats
 
 # Global chatbot instance
 chatbot = AgriChatbot()
 
 # Convenience functions for backward compatibility
-def process_user_query(user_input: str, session_id: str = None) -> Dict[str, Any]:
+def process_user_query(user_input: str, session_id: str = None, language: str = None,
+                       deadline: Deadline = None) -> Dict[str, Any]:
     """Convenience function to process user query"""
-    return chatbot.process_query(user_input, session_id)
+    return chatbot.process_query(user_input, session_id, language, deadline)
 
 def get_welcome_message_response(session_id: str = None, language: str = 'mr') -> Dict[str, Any]:
     """Convenience function to get welcome message"""
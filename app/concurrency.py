@@ -0,0 +1,340 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LimiterRejected(Exception):
+    """Raised when a call cannot get a concurrency slot in time"""
+
+
+class AdaptiveLimiter:
+    """Adaptive concurrency limiter for an upstream dependency (AIMD).
+
+    The limit grows additively (about +1 per limit's worth of successful
+    calls) while latency stays within `tolerance` x the observed baseline,
+    and shrinks multiplicatively on overload signals (429s, timeouts) or
+    latency inflation. Callers that cannot get a slot within their queue
+    timeout are rejected immediately so they can take the fallback path.
+    """
+
+    def __init__(self, name: str, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 backoff: float = 0.7, tolerance: float = 2.0, max_queue_time: float = 2.0,
+                 is_overload: Callable[[BaseException], bool] = None):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_queue_time = max_queue_time
+        self.is_overload = is_overload or (lambda error: False)
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._baseline: Optional[float] = None  # Slowly-tracking "no load" latency
+        self._smoothed: Optional[float] = None  # Recent latency (EWMA)
+        self._last_decrease = 0.0
+
+        self.successes = 0
+        self.overloads = 0
+        self.errors = 0
+        self.rejected = 0
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        """
+        Hold a concurrency slot for the duration of the block.
+        Raises LimiterRejected if no slot frees up within the queue timeout.
+        """
+        start = self.take(timeout)
+        try:
+            yield
+        except BaseException as e:
+            self.give_back(start, e)
+            raise
+        else:
+            self.give_back(start)
+
+    def take(self, timeout: float = None) -> float:
+        """
+        Take a slot that the caller (or the thread it hands the call to) must
+        return with give_back(). Returns the start time to pass back.
+        Raises LimiterRejected if no slot frees up within the queue timeout.
+        """
+        queue_timeout = self.max_queue_time if timeout is None else min(timeout, self.max_queue_time)
+        deadline = time.monotonic() + max(queue_timeout, 0.0)
+
+        with self._condition:
+            self._queued += 1
+            try:
+                while self._in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise LimiterRejected(f"{self.name}: no slot within {queue_timeout:.2f}s "
+                                              f"(in flight {self._in_flight}, limit {int(self.limit)})")
+                    self._condition.wait(remaining)
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+        return time.monotonic()
+
+    def try_take(self) -> Optional[float]:
+        """Take a slot only if one is free right now (not counted as a rejection otherwise)"""
+        with self._condition:
+            if self._in_flight >= int(self.limit):
+                return None
+            self._in_flight += 1
+        return time.monotonic()
+
+    def return_unused(self):
+        """Return a slot whose call never started (no latency or error to record)"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def give_back(self, start: float, error: BaseException = None):
+        """Return a slot taken with take()/try_take() once the call has really finished"""
+        if error is None:
+            self._release(time.monotonic() - start)
+        else:
+            self._release(time.monotonic() - start, overload=self.is_overload(error), error=True)
+
+    def _release(self, latency: float, overload: bool = False, error: bool = False):
+        with self._condition:
+            self._in_flight -= 1
+
+            if overload:
+                self.overloads += 1
+                self._decrease()
+            elif error:
+                self.errors += 1  # Not a load signal; leave the limit alone
+            else:
+                self.successes += 1
+                self._observe(latency)
+
+            self._condition.notify()
+
+    def _observe(self, latency: float):
+        """Update latency estimates and adjust the limit (caller holds the lock)"""
+        self._smoothed = latency if self._smoothed is None else 0.8 * self._smoothed + 0.2 * latency
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        else:
+            # Drift up slowly so the baseline follows real changes in upstream speed
+            self._baseline = 0.99 * self._baseline + 0.01 * latency
+
+        if self._smoothed > self._baseline * self.tolerance:
+            self._decrease()
+        elif self._in_flight + 1 >= int(self.limit):
+            # Only grow when the current limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _decrease(self):
+        """Multiplicative decrease, at most once per smoothed latency interval"""
+        now = time.monotonic()
+        if now - self._last_decrease < (self._smoothed or 0.0):
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        if int(self.limit) != previous:
+            logger.warning("%s concurrency limit reduced %d -> %d", self.name, previous, int(self.limit))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get limiter metrics"""
+        with self._condition:
+            return {
+                'name': self.name,
+                'limit': int(self.limit),
+                'in_flight': self._in_flight,
+                'queued': self._queued,
+                'latency_ms': round(self._smoothed * 1000, 1) if self._smoothed else None,
+                'baseline_latency_ms': round(self._baseline * 1000, 1) if self._baseline else None,
+                'successes': self.successes,
+                'overloads': self.overloads,
+                'errors': self.errors,
+                'rejected': self.rejected
+            }
+
+
+class LatencyTracker:
+    """Ring buffer of recent latencies with percentile lookup"""
+
+    def __init__(self, size: int = 256):
+        self._samples = [0.0] * size
+        self._size = size
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples[self._count % self._size] = latency
+            self._count += 1
+
+    def __len__(self) -> int:
+        return min(self._count, self._size)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples[:min(self._count, self._size)])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """Wait for tokens; returns False if they would not be available within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+class Hedger:
+    """Hedged requests for an idempotent upstream call.
+
+    If the primary attempt has not finished after the tracked latency
+    percentile, a duplicate attempt is started and whichever finishes first
+    wins. A running attempt cannot be cancelled: the loser (or every attempt,
+    on timeout) is abandoned and its result discarded.
+
+    With a limiter, every attempt holds its own slot until it really
+    finishes, abandoned or not, so hedges never exceed the upstream limit.
+    A hedge is only sent if a slot is free at that moment.
+    """
+
+    def __init__(self, name: str, enabled: bool = False, percentile: float = 0.95,
+                 min_samples: int = 20, max_workers: int = 16, limiter: AdaptiveLimiter = None):
+        self.name = name
+        self.limiter = limiter
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self._max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                        thread_name_prefix=f"hedge-{self.name}")
+        return self._executor
+
+    def _timed(self, fn: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        result = fn()
+        self.latencies.record(time.monotonic() - start)
+        return result
+
+    def _attempt(self, fn: Callable[[], Any], slot: Optional[float]) -> Any:
+        """One attempt; its limiter slot is returned when it finishes, even if abandoned"""
+        try:
+            result = self._timed(fn)
+        except BaseException as e:
+            if slot is not None:
+                self.limiter.give_back(slot, e)
+            raise
+        if slot is not None:
+            self.limiter.give_back(slot)
+        return result
+
+    def call(self, fn: Callable[[], Any], timeout: float = None) -> Any:
+        """
+        Run fn, hedging with a duplicate attempt after the latency percentile.
+        With a limiter, waiting for the first slot counts against timeout
+        (LimiterRejected if none frees up).
+        """
+        started = time.monotonic()
+        slot = self.limiter.take(timeout) if self.limiter is not None else None
+        if timeout is not None:
+            timeout = max(timeout - (time.monotonic() - started), 0.0)
+
+        threshold = self.latencies.percentile(self.percentile) if len(self.latencies) >= self.min_samples else None
+        if not self.enabled or threshold is None or (timeout is not None and threshold >= timeout):
+            return self._attempt(fn, slot)
+
+        executor = self._get_executor()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        primary = executor.submit(self._attempt, fn, slot)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        hedge_slot = self.limiter.try_take() if self.limiter is not None else None
+        if self.limiter is not None and hedge_slot is None:
+            # No spare upstream capacity: a duplicate would only add load
+            self.hedges_skipped += 1
+            pending = {primary}
+            hedge = None
+        else:
+            self.hedges += 1
+            hedge = executor.submit(self._attempt, fn, hedge_slot)
+            pending = {primary, hedge}
+        slots = {primary: slot, hedge: hedge_slot}
+        error = None
+
+        while pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    self._abandon(pending, slots)
+                    if future is hedge:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+
+        self._abandon(pending, slots)
+        if error is not None:
+            raise error
+        raise TimeoutError(f"{self.name}: no attempt finished within {timeout:.2f}s")
+
+    def _abandon(self, futures, slots: Dict[Any, Optional[float]]):
+        """Drop attempts still running; one that never started gives its slot back now"""
+        for future in futures:
+            if future.cancel() and slots.get(future) is not None:
+                self.limiter.return_unused()
+
+    def metrics(self) -> Dict[str, Any]:
+        threshold = self.latencies.percentile(self.percentile)
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': round(threshold * 1000, 1) if threshold is not None else None,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedges_skipped': self.hedges_skipped
+        }
@@ -14,6 +14,22 @@ class Config:
     # Model Configuration
     GEMINI_MODEL = "gemini-1.5-flash"
     
+    # Upstream call budget: per-call timeout and adaptive concurrency limits
+    GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 20))
+    GEMINI_MAX_QUEUE_TIME = float(os.environ.get('GEMINI_MAX_QUEUE_TIME', 2))
+    GEMINI_INITIAL_CONCURRENCY = int(os.environ.get('GEMINI_INITIAL_CONCURRENCY', 8))
+    GEMINI_MIN_CONCURRENCY = int(os.environ.get('GEMINI_MIN_CONCURRENCY', 1))
+    GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 64))
+    
+    # End-to-end deadlines and hedged requests
+    CHAT_DEADLINE = float(os.environ.get('CHAT_DEADLINE', 25))
+    TRANSLATE_TIMEOUT = float(os.environ.get('TRANSLATE_TIMEOUT', 5))
+    # Minimum budget worth starting a translation / generation call with
+    MIN_TRANSLATE_BUDGET = float(os.environ.get('MIN_TRANSLATE_BUDGET', 1.0))
+    MIN_GENERATE_BUDGET = float(os.environ.get('MIN_GENERATE_BUDGET', 2.0))
+    HEDGING_ENABLED = os.environ.get('HEDGING_ENABLED', 'false').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.95))
+    
     # Generation Parameters
     GENERATION_CONFIG = {
         "temperature": 0.7,
@@ -50,7 +66,23 @@ class Config:
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
-    LOG_FILE = 'data/logs/app.log'
+    LOG_FILE = os.environ.get('LOG_FILE', 'data/logs/app.log')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json or text
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 5 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+    # Fraction of high-volume per-request INFO events to keep
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+    
+    # Message catalog (built by `python -m app.catalog_builder`)
+    MESSAGE_CATALOG_FILE = os.environ.get('MESSAGE_CATALOG_FILE', 'data/message_catalog.json')
+    # Near-duplicate FAQ clusters (built by `python -m app.faq_miner`)
+    FAQ_CLUSTERS_FILE = os.environ.get('FAQ_CLUSTERS_FILE', 'data/faq_clusters.json')
+    
+    # Conversation logs (JSON Lines, rotated by size)
+    CHAT_LOG_FILE = os.environ.get('CHAT_LOG_FILE', 'data/logs/chat_logs.jsonl')
+    CHAT_LOG_MAX_BYTES = int(os.environ.get('CHAT_LOG_MAX_BYTES', 50 * 1024 * 1024))
+    CHAT_LOG_BACKUP_COUNT = int(os.environ.get('CHAT_LOG_BACKUP_COUNT', 10))
+    LEGACY_CHAT_LOG_FILE = 'data/logs/chat_logs.json'
     
     # Chatbot Personality
     SYSTEM_PROMPTS = {
@@ -64,6 +96,120 @@ class Config:
     # Translation Settings
     SUPPORTED_LANGUAGES = ['en', 'mr']  # English and Marathi
     DEFAULT_LANGUAGE = 'mr'  # Default to Marathi
+    # Strip common Marathi suffixes when building canonical query keys
+    QUERY_STEMMING = os.environ.get('QUERY_STEMMING', 'false').lower() == 'true'
+    # Local detections below this confidence fall back to the Translate /detect API
+    LANGUAGE_DETECTION_MIN_CONFIDENCE = float(os.environ.get('LANGUAGE_DETECTION_MIN_CONFIDENCE', 0.75))
+    
+    # Caching
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2048))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 6 * 3600))
+    TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', 4096))
+    TRANSLATION_CACHE_TTL = int(os.environ.get('TRANSLATION_CACHE_TTL', 24 * 3600))
+    # Cache backend: 'memory' (per worker process), 'shm' (shared-memory slot
+    # table for all workers on the host) or 'redis' (local Redis-compatible daemon)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+    SHARED_CACHE_PREFIX = os.environ.get('SHARED_CACHE_PREFIX', 'agri-cache')
+    SHARED_CACHE_SLOT_BYTES = int(os.environ.get('SHARED_CACHE_SLOT_BYTES', 8192))
+    # How long other workers wait for one worker's in-flight computation
+    SHARED_CACHE_LEASE_SECONDS = float(os.environ.get('SHARED_CACHE_LEASE_SECONDS', 30))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Cache warm-up at worker start (see app/warmup.py)
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+    WARMUP_SNAPSHOT_FILE = os.environ.get('WARMUP_SNAPSHOT_FILE', 'data/warmup_snapshot.json')
+    WARMUP_TOP_K = int(os.environ.get('WARMUP_TOP_K', 50))
+    # Replayed questions per second, so warm-up does not burst the upstream quota
+    WARMUP_RATE = float(os.environ.get('WARMUP_RATE', 1.0))
+    WARMUP_MAX_SECONDS = float(os.environ.get('WARMUP_MAX_SECONDS', 300))
+    
+    # Batch chat API
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 50))
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 8))
+    
+    # Response serialization and compression
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 512))
+    GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+    BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+    WELCOME_CACHE_MAX_AGE = int(os.environ.get('WELCOME_CACHE_MAX_AGE', 86400))
+    ASSET_CACHE_MAX_AGE = int(os.environ.get('ASSET_CACHE_MAX_AGE', 31536000))
+    # Superseded fingerprinted assets are kept this long for pages still referencing them
+    ASSET_RETENTION_DAYS = float(os.environ.get('ASSET_RETENTION_DAYS', 7))
+    
+    # Chat pipeline mode: 'translate' (Marathi -> English -> Gemini -> Marathi)
+    # or 'direct' (Gemini answers in the user's language, no translation hops)
+    PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'translate').lower()
+    
+    # Chat pipeline concurrency (per-request stages and post-response work);
+    # stages run on the request thread when all stage workers are busy
+    PIPELINE_STAGE_WORKERS = int(os.environ.get('PIPELINE_STAGE_WORKERS', 16))
+    PIPELINE_BACKGROUND_WORKERS = int(os.environ.get('PIPELINE_BACKGROUND_WORKERS', 2))
+    
+    # Local answerers (answered without the model)
+    MARKET_PRICES_DB = os.environ.get('MARKET_PRICES_DB', 'data/market_prices.db')
+    MARKET_PRICE_RELOAD_SECONDS = int(os.environ.get('MARKET_PRICE_RELOAD_SECONDS', 300))
+    
+    # Weather advisories from local forecast files (context for Gemini)
+    WEATHER_FORECAST_DIR = os.environ.get('WEATHER_FORECAST_DIR', 'data/weather/forecasts')
+    WEATHER_GAZETTEER = os.environ.get('WEATHER_GAZETTEER', 'data/weather/gazetteer.csv')
+    WEATHER_RELOAD_SECONDS = int(os.environ.get('WEATHER_RELOAD_SECONDS', 60))
+    WEATHER_CONTEXT_DAYS = int(os.environ.get('WEATHER_CONTEXT_DAYS', 5))
+    
+    # Government scheme eligibility rules (see app/schemes.py)
+    SCHEMES_DIR = os.environ.get('SCHEMES_DIR', 'data/schemes')
+    SCHEME_RELOAD_SECONDS = int(os.environ.get('SCHEME_RELOAD_SECONDS', 60))
+    SCHEME_BATCH_MAX_PROFILES = int(os.environ.get('SCHEME_BATCH_MAX_PROFILES', 10000))
+    
+    # Fertilizer dose calculator bulk API
+    FERTILIZER_BATCH_MAX_PLOTS = int(os.environ.get('FERTILIZER_BATCH_MAX_PLOTS', 10000))
+    
+    # Idempotency keys for /api/chat and /generate (stored responses for retries)
+    IDEMPOTENCY_STORE_SIZE = int(os.environ.get('IDEMPOTENCY_STORE_SIZE', 10000))
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 3600))
+    
+    # Sessions written through to the shared cache backend (when not 'memory')
+    SESSION_STORE_SIZE = int(os.environ.get('SESSION_STORE_SIZE', 100000))
+    SESSION_STORE_TTL = int(os.environ.get('SESSION_STORE_TTL', 24 * 3600))
+    
+    # Multi-node session sharding (see app/sharding.py); a single node if unset.
+    # CLUSTER_NODES: comma-separated base URLs of all nodes, CLUSTER_SELF: this node's URL
+    CLUSTER_NODES = [
+        node.strip().rstrip('/') for node in os.environ.get('CLUSTER_NODES', '').split(',') if node.strip()
+    ]
+    CLUSTER_SELF = os.environ.get('CLUSTER_SELF', '').rstrip('/')
+    CLUSTER_VNODES = int(os.environ.get('CLUSTER_VNODES', 128))
+    # Shared secret for internal calls (membership changes, session hand-over)
+    CLUSTER_SECRET = os.environ.get('CLUSTER_SECRET', '')
+    CLUSTER_CONNECT_TIMEOUT = float(os.environ.get('CLUSTER_CONNECT_TIMEOUT', 1.0))
+    # How long an unreachable node is skipped (its sessions are served locally)
+    CLUSTER_RETRY_SECONDS = float(os.environ.get('CLUSTER_RETRY_SECONDS', 10))
+    # Membership file shared by all worker processes of a node (written by PUT
+    # /api/cluster/nodes, or by deploy tooling); overrides CLUSTER_NODES when present
+    CLUSTER_NODES_FILE = os.environ.get('CLUSTER_NODES_FILE', 'data/cluster_nodes.json')
+    CLUSTER_RELOAD_SECONDS = float(os.environ.get('CLUSTER_RELOAD_SECONDS', 2))
+    
+    # Conversation history store for /api/session/history (see app/history_store.py)
+    HISTORY_ENABLED = os.environ.get('HISTORY_ENABLED', 'true').lower() == 'true'
+    HISTORY_DB = os.environ.get('HISTORY_DB', 'data/history.db')
+    HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 200))
+    HISTORY_FLUSH_SECONDS = float(os.environ.get('HISTORY_FLUSH_SECONDS', 1.0))
+    HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 10000))
+    # Retention: 0 keeps messages forever / keeps every message of a session
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 90))
+    HISTORY_MAX_PER_SESSION = int(os.environ.get('HISTORY_MAX_PER_SESSION', 500))
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 200))
+
+    # Asynchronous job queue (SMS/IVR partners)
+    JOB_QUEUE_DB = os.environ.get('JOB_QUEUE_DB', 'data/jobs.db')
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5))
+    JOB_CALLBACK_WORKERS = int(os.environ.get('JOB_CALLBACK_WORKERS', 2))
+    # Comma-separated callback endpoints (scheme://host[:port][/path]) that job results may be sent to
+    JOB_CALLBACK_ALLOWED_PREFIXES = [
+        prefix.strip() for prefix in os.environ.get('JOB_CALLBACK_ALLOWED_PREFIXES', '').split(',') if prefix.strip()
+    ]
     
     # Rate Limiting (future use)
     RATE_LIMIT_PER_MINUTE = 30
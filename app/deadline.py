@@ -0,0 +1,44 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """End-to-end time budget for one request, passed down the pipeline.
+
+    Each stage asks how much time is left and degrades (skips translation,
+    serves cached or fallback answers) instead of overrunning the budget.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: float, maximum: float = None) -> 'Deadline':
+        """Build a deadline from a client-supplied timeout header (seconds)"""
+        try:
+            budget = float(value) if value else default
+        except ValueError:
+            budget = default
+        if maximum is not None:
+            budget = min(budget, maximum)
+        return cls(max(budget, 0.0))
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has(self, seconds: float) -> bool:
+        """Whether at least `seconds` of budget remain"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float = None) -> float:
+        """Remaining budget as a call timeout, optionally capped"""
+        remaining = self.remaining()
+        return remaining if cap is None else min(remaining, cap)
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
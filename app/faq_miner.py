@@ -0,0 +1,352 @@
+"""
+FAQ mining
+
+Finds the questions farmers keep asking, including reworded and misspelled
+variants ("कांद्याला पाणी किती द्यावे" / "कांद्याला किती पाणी द्यायचे"), so
+their answers can be precomputed, cached and reviewed.
+
+Comparing every pair of questions is quadratic, so near-duplicates are found
+in roughly linear time instead:
+
+1. Chat logs are split into tasks (see app.log_analytics) and counted per
+   normalized question across a process pool.
+2. Each distinct question is shingled into character 4-grams and reduced to
+   a MinHash signature (vectorized with NumPy when available), again in the
+   pool.
+3. Signatures are cut into LSH bands; questions sharing a band bucket are
+   candidates, confirmed by estimated Jaccard similarity and merged with
+   union-find. Character similarity cannot tell "कांद्याला पाणी किती" from
+   "कापसाला पाणी किती" or 2 acres from 5, so questions are only merged
+   when the crops and numbers they mention are the same.
+4. Clusters are ranked by total count and written to
+   `Config.FAQ_CLUSTERS_FILE` with a representative question, its latest
+   answer and the top variants. The catalog builder
+   (`python -m app.catalog_builder --clusters`) and cache warmers read this
+   file; variants are for review and ranking only and are never indexed
+   to the representative's answer.
+
+Questions whose answers depend on live data (mandi prices, forecasts,
+scheme rules, computed fertilizer doses) are left out: a frozen answer
+would be served ahead of the local answerers that compute the current one.
+
+Usage:
+    python -m app.faq_miner --top 200 --workers 8
+    python -m app.faq_miner data/archive/*.jsonl.gz --threshold 0.7 --print
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import time
+import zlib
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Optional - signatures fall back to pure Python
+    np = None
+
+from app.config import Config
+from app.fertilizer import is_fertilizer_question
+from app.log_analytics import plan_tasks, iter_task_entries
+from app.market_prices import COMMODITIES, is_price_question
+from app.messages import faq_key, message_catalog
+from app.normalizer import lookup_prefix, normalize_text
+from app.schemes import scheme_engine
+from app.utils import chat_log_files, fold_numbers, is_agriculture_related
+from app.weather import WEATHER_WORDS
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows: candidates from ~50% similarity
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.6         # Estimated Jaccard needed to merge two questions
+MAX_BUCKET_HEADS = 4            # Comparisons per bucket, keeps banding linear
+SIGNATURE_CHUNK = 20000         # Questions per signature task
+
+# Universal hashing (a*x + b) mod p over 32-bit shingle hashes; fixed seed so
+# every worker process computes identical signatures
+_PRIME = 4294967291             # Largest prime below 2**32
+_rng = random.Random(1729)
+_PERM_A = [_rng.randrange(1, 1 << 31) for _ in range(NUM_PERM)]
+_PERM_B = [_rng.randrange(0, 1 << 31) for _ in range(NUM_PERM)]
+_PERMUTATIONS = list(zip(_PERM_A, _PERM_B))
+if np is not None:
+    _NP_A = np.array(_PERM_A, dtype=np.uint64)[:, None]
+    _NP_B = np.array(_PERM_B, dtype=np.uint64)[:, None]
+
+_CROP_INDEX = {
+    normalize_text(alias, stem=False): key
+    for key, (_, _, aliases) in COMMODITIES.items()
+    for alias in aliases
+}
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def shingles(normalized: str, size: int = SHINGLE_SIZE) -> List[int]:
+    """32-bit hashes of the character shingles of a normalized question"""
+    text = f" {normalized} "
+    if len(text) <= size:
+        return [zlib.crc32(text.encode('utf-8'))]
+    return list({zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)})
+
+
+def minhash(normalized: str) -> bytes:
+    """MinHash signature (NUM_PERM uint32 values) of a normalized question"""
+    hashes = shingles(normalized)
+    if np is not None:
+        values = (_NP_A * np.array(hashes, dtype=np.uint64) + _NP_B) % _PRIME
+        return values.min(axis=1).astype(np.uint32).tobytes()
+    return array('I', [min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMUTATIONS]).tobytes()
+
+
+def entities(question: str) -> str:
+    """Crops and numbers a question mentions; questions are only merged when these agree"""
+    tokens = normalize_text(question, stem=False).split()
+    crops = sorted({crop for crop in (lookup_prefix(token, _CROP_INDEX) for token in tokens) if crop})
+    numbers = sorted({float(number) for number in _NUMBER.findall(fold_numbers(question))})
+    return ' '.join(crops) + '|' + ' '.join(f"{number:g}" for number in numbers)
+
+
+def is_data_dependent(question: str) -> bool:
+    """Questions answered from live data (prices, forecasts, scheme rules, dose calculations)"""
+    normalized = normalize_text(question, stem=False)
+    tokens = normalized.split()
+    return (is_price_question(tokens) or is_fertilizer_question(tokens)
+            or any(token.startswith(WEATHER_WORDS) for token in tokens)
+            or scheme_engine.is_scheme_question(normalized))
+
+
+def similarity(left: bytes, right: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    matches = sum(a == b for a, b in zip(memoryview(left).cast('I'), memoryview(right).cast('I')))
+    return matches / NUM_PERM
+
+
+def _usable(entry: Dict[str, Any]) -> bool:
+    question = entry.get('user_input') or ''
+    answer = entry.get('bot_response') or ''
+    if not question or not answer or answer.startswith('ERROR:'):
+        return False
+    if not is_agriculture_related(question) or message_catalog.is_canned(answer):
+        return False
+    return not is_data_dependent(question)
+
+
+def count_task(task: Tuple[str, Optional[int], Optional[int]]) -> Tuple[Counter, Dict[str, Tuple[str, str]]]:
+    """Count usable questions per normalized text, with a sample (question, language) for each"""
+    counts = Counter()
+    samples = {}
+    for entry in iter_task_entries(task):
+        if not _usable(entry):
+            continue
+        question = entry['user_input']
+        normalized = normalize_text(question)
+        if not normalized:
+            continue
+        counts[normalized] += 1
+        samples[normalized] = (question, entry.get('language', 'mr'))
+    return counts, samples
+
+
+def signature_task(questions: List[Tuple[str, str]]) -> List[Tuple[bytes, str]]:
+    """MinHash signature and entities for a chunk of (normalized question, sample question)"""
+    return [(minhash(normalized), entities(sample)) for normalized, sample in questions]
+
+
+def answer_task(args: Tuple[Tuple[str, Optional[int], Optional[int]], frozenset]) -> Dict[str, Tuple[str, str]]:
+    """Latest (timestamp, answer) for each wanted normalized question"""
+    task, wanted = args
+    answers = {}
+    for entry in iter_task_entries(task):
+        question = entry.get('user_input') or ''
+        if not question or not _usable(entry):
+            continue
+        normalized = normalize_text(question)
+        if normalized in wanted:
+            stamp = entry.get('timestamp') or ''
+            if normalized not in answers or stamp >= answers[normalized][0]:
+                answers[normalized] = (stamp, entry['bot_response'])
+    return answers
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (union by size, path halving)"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, left: int, right: int) -> bool:
+        left, right = self.find(left), self.find(right)
+        if left == right:
+            return False
+        if self.size[left] < self.size[right]:
+            left, right = right, left
+        self.parent[right] = left
+        self.size[left] += self.size[right]
+        return True
+
+
+def cluster_signatures(signatures: List[bytes], threshold: float = DEFAULT_THRESHOLD,
+                       keys: List[str] = None) -> UnionFind:
+    """
+    Merge near-duplicate signatures using LSH banding. With keys (see
+    entities), only signatures with equal keys are merged, so every cluster
+    has a single key.
+    """
+    sets = UnionFind(len(signatures))
+    band_bytes = ROWS * 4
+    for band in range(BANDS):
+        start = band * band_bytes
+        buckets: Dict[Any, List[int]] = {}
+        for index, signature in enumerate(signatures):
+            band_key = signature[start:start + band_bytes]
+            heads = buckets.setdefault(band_key if keys is None else (keys[index], band_key), [])
+            merged = False
+            for head in heads:
+                if sets.find(head) == sets.find(index) or similarity(signatures[head], signature) >= threshold:
+                    sets.union(head, index)
+                    merged = True
+                    break
+            # Compare against a few heads per bucket only, so hot buckets stay linear
+            if not merged and len(heads) < MAX_BUCKET_HEADS:
+                heads.append(index)
+    return sets
+
+
+def mine_faqs(paths: Iterable[str], top: int = 200, min_count: int = 2,
+              threshold: float = DEFAULT_THRESHOLD, workers: int = None,
+              max_variants: int = 10) -> Dict[str, Any]:
+    """Mine ranked near-duplicate FAQ clusters from chat logs"""
+    started = time.perf_counter()
+    tasks = plan_tasks(list(paths))
+    parallel = len(tasks) > 1 and workers != 1
+
+    executor = ProcessPoolExecutor(max_workers=workers) if parallel else None
+    try:
+        mapper = executor.map if executor else map
+
+        counts = Counter()
+        samples = {}
+        for partial_counts, partial_samples in mapper(count_task, tasks):
+            counts.update(partial_counts)
+            samples.update(partial_samples)
+
+        questions = list(counts)
+        pairs = [(question, samples[question][0]) for question in questions]
+        chunks = [pairs[i:i + SIGNATURE_CHUNK] for i in range(0, len(pairs), SIGNATURE_CHUNK)]
+        computed = [item for chunk in mapper(signature_task, chunks) for item in chunk]
+        signatures = [signature for signature, _ in computed]
+        keys = [key for _, key in computed]
+
+        sets = cluster_signatures(signatures, threshold, keys)
+        members: Dict[int, List[int]] = {}
+        for index in range(len(questions)):
+            members.setdefault(sets.find(index), []).append(index)
+
+        ranked = []
+        for indexes in members.values():
+            total = sum(counts[questions[index]] for index in indexes)
+            if total >= min_count:
+                indexes.sort(key=lambda index: counts[questions[index]], reverse=True)
+                ranked.append((total, indexes))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        ranked = ranked[:top]
+
+        # Second pass for answers, so only the representatives' answers are held in memory
+        wanted = frozenset(questions[indexes[0]] for _, indexes in ranked)
+        answers = {}
+        for partial in mapper(answer_task, [(task, wanted) for task in tasks]):
+            for normalized, (stamp, answer) in partial.items():
+                if normalized not in answers or stamp >= answers[normalized][0]:
+                    answers[normalized] = (stamp, answer)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    clusters = []
+    for rank, (total, indexes) in enumerate(ranked, 1):
+        representative = questions[indexes[0]]
+        question, language = samples[representative]
+        clusters.append({
+            'rank': rank,
+            'count': total,
+            'question': question,
+            'answer': answers.get(representative, ('', ''))[1],
+            'language': language,
+            'key': faq_key(question),
+            'variants': [
+                {'question': samples[questions[index]][0], 'count': counts[questions[index]]}
+                for index in indexes[:max_variants]
+            ]
+        })
+
+    return {
+        'version': 1,
+        'built_at': datetime.now().isoformat(),
+        'entries': sum(counts.values()),
+        'distinct_questions': len(questions),
+        'threshold': threshold,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'clusters': clusters
+    }
+
+
+def write_clusters(result: Dict[str, Any], output_file: str):
+    """Write the clusters atomically so readers never see a partial file"""
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_file, output_file)
+
+
+def load_faq_clusters(path: str = None, top: int = None) -> List[Dict[str, Any]]:
+    """Ranked FAQ clusters (question, answer, language, count, variants) from a mined file"""
+    path = path or Config.FAQ_CLUSTERS_FILE
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        clusters = json.load(f).get('clusters', [])
+    clusters = [cluster for cluster in clusters if cluster.get('question') and cluster.get('answer')]
+    return clusters[:top] if top else clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine near-duplicate FAQ clusters from chat logs")
+    parser.add_argument('paths', nargs='*', help="Log files (default: all current, rotated and legacy logs)")
+    parser.add_argument('--output', default=Config.FAQ_CLUSTERS_FILE, help="Clusters file")
+    parser.add_argument('--top', type=int, default=200, help="Number of clusters to keep")
+    parser.add_argument('--min-count', type=int, default=2, help="Minimum total count per cluster")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated Jaccard similarity needed to merge questions")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--print', action='store_true', help="Print the top clusters")
+    args = parser.parse_args()
+
+    result = mine_faqs(args.paths or chat_log_files(), args.top, args.min_count, args.threshold, args.workers)
+    write_clusters(result, args.output)
+
+    print(f"Wrote {args.output}: {len(result['clusters'])} clusters from {result['entries']} questions "
+          f"({result['distinct_questions']} distinct) in {result['elapsed_seconds']}s")
+    if args.print:
+        for cluster in result['clusters'][:20]:
+            print(f"  {cluster['count']:>6}  {len(cluster['variants']):>3} variants  {cluster['question'][:70]}")
+
+
+if __name__ == '__main__':
+    main()
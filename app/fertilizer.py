@@ -0,0 +1,350 @@
+"""
+Fertilizer dose calculator
+
+Computes NPK recommendations and urea/DAP/MOP quantities from the crop, the
+plot area and (optionally) soil-test values. Doses are the general
+recommended doses per hectare, adjusted by the soil-test rating of each
+nutrient (low +25%, high -25%). Crops in the knowledge base
+(load_knowledge_base) with an "npk" entry add to or override the built-in
+table.
+
+The calculation is vectorized with NumPy, so a CSV of thousands of plots is
+computed in one pass. Chat questions about fertilizer doses for a known crop
+are answered locally.
+
+Usage:
+    python -m app.fertilizer query "2 एकर कांद्यासाठी किती खत द्यावे?"
+    python -m app.fertilizer batch plots.csv -o doses.csv
+"""
+
+import argparse
+import csv
+import io
+import logging
+import math
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.logging_setup import SAMPLED
+from app.market_prices import COMMODITIES
+from app.normalizer import lookup_prefix, normalize_text
+from app.utils import HECTARES_PER_ACRE, fold_numbers, load_knowledge_base, parse_area_hectares
+
+try:
+    import numpy as np
+except ImportError:  # Optional - the calculator is disabled without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# General recommended doses: crop -> (N, P2O5, K2O kg/ha, split nitrogen)
+RECOMMENDED_NPK = {
+    'cotton': (120, 60, 60, True),
+    'soybean': (30, 60, 30, False),
+    'tur': (25, 50, 0, False),
+    'gram': (25, 50, 0, False),
+    'groundnut': (25, 50, 0, False),
+    'wheat': (120, 60, 40, True),
+    'paddy': (100, 50, 50, True),
+    'rice': (100, 50, 50, True),
+    'jowar': (80, 40, 40, True),
+    'bajra': (50, 25, 25, True),
+    'maize': (120, 60, 40, True),
+    'onion': (100, 50, 50, True),
+    'tomato': (100, 50, 50, True),
+    'potato': (120, 60, 100, True),
+    'sugarcane': (250, 115, 115, True),
+}
+
+# Soil-test ratings of available N, P, K (kg/ha): below LOW is low, above HIGH is high
+SOIL_LOW = (280, 10, 108)
+SOIL_HIGH = (560, 25, 280)
+LOW_SOIL_FACTOR = 1.25
+HIGH_SOIL_FACTOR = 0.75
+
+# Nutrient content of the straight fertilizers
+UREA_N = 0.46
+DAP_N = 0.18
+DAP_P2O5 = 0.46
+MOP_K2O = 0.60
+BAG_KG = 50
+
+# Fertilizer or nutrient words that mark a fertilizer question (matched as
+# token prefixes). 'dose'/'मात्रा' alone is not enough: pesticide questions
+# ask for doses too
+FERTILIZER_WORDS = tuple(normalize_text(word, stem=False) for word in (
+    'fertilizer', 'fertiliser', 'urea', 'dap', 'npk', 'nutrient', 'nitrogen', 'phosphorus', 'potash',
+    'potassium', 'खत', 'खते', 'युरिया', 'डीएपी', 'पोटॅश', 'नत्र', 'स्फुरद', 'पालाश', 'नायट्रोजन',
+))
+
+# Plant-protection words: such questions are never answered with fertilizer doses
+PESTICIDE_WORDS = tuple(normalize_text(word, stem=False) for word in (
+    'pesticide', 'insecticide', 'fungicide', 'herbicide', 'weedicide',
+    'कीटकनाशक', 'किटकनाशक', 'बुरशीनाशक', 'तणनाशक',
+))
+
+_SOIL_VALUES = (
+    re.compile(r'(?:\bn\b|nitrogen|नत्र|नायट्रोजन)\D{0,6}(\d+(?:\.\d+)?)'),
+    re.compile(r'(?:\bp\b|phosphorus|स्फुरद|फॉस्फरस)\D{0,6}(\d+(?:\.\d+)?)'),
+    re.compile(r'(?:\bk\b|potassium|पालाश|पोटॅशियम)\D{0,6}(\d+(?:\.\d+)?)'),
+)
+
+
+class FertilizerCalculator:
+    """Vectorized NPK and fertilizer quantity calculator"""
+
+    def __init__(self):
+        table = dict(RECOMMENDED_NPK)
+        crop_index = {
+            normalize_text(alias, stem=False): key
+            for key, (_, _, aliases) in COMMODITIES.items()
+            for alias in aliases
+        }
+        for name, info in load_knowledge_base().get('crops', {}).items():
+            npk = info.get('npk') if isinstance(info, dict) else None
+            if npk:
+                key = crop_index.get(normalize_text(name, stem=False), name)
+                table[key] = (npk[0], npk[1], npk[2], info.get('split_nitrogen', True))
+        for key in table:
+            crop_index.setdefault(normalize_text(key, stem=False), key)
+
+        self.crops = list(table)
+        self._crop_index = crop_index
+        self._rows = {key: row for row, key in enumerate(self.crops)}
+        self._npk = np.array([table[key][:3] for key in self.crops], dtype=np.float64) if np is not None else None
+        self._split = [table[key][3] for key in self.crops]
+
+    def crop_key(self, name: str) -> Optional[str]:
+        """Crop key for a crop name ('Onion', 'कांदा'), if it has a recommended dose"""
+        key = self._crop_index.get(normalize_text(name, stem=False))
+        return key if key in self._rows else None
+
+    def calculate(self, crop_rows, area_ha, soil_n, soil_p, soil_k) -> Dict[str, Any]:
+        """
+        Doses for many plots at once. Inputs are equal-length arrays; soil values
+        are NaN where not tested. Returns arrays of nutrient doses (kg/ha) and
+        fertilizer quantities (kg for the plot).
+        """
+        base = self._npk[np.asarray(crop_rows, dtype=np.int64)]
+        soil = np.column_stack([soil_n, soil_p, soil_k]).astype(np.float64)
+
+        # NaN compares False both ways, so untested nutrients keep the base dose
+        factor = np.where(soil < SOIL_LOW, LOW_SOIL_FACTOR, np.where(soil > SOIL_HIGH, HIGH_SOIL_FACTOR, 1.0))
+        dose = base * factor
+        nutrients = dose * np.asarray(area_ha, dtype=np.float64)[:, None]
+
+        dap = nutrients[:, 1] / DAP_P2O5
+        urea = np.maximum(nutrients[:, 0] - dap * DAP_N, 0.0) / UREA_N
+        mop = nutrients[:, 2] / MOP_K2O
+        return {'dose': dose, 'factor': factor, 'urea': urea, 'dap': dap, 'mop': mop}
+
+    def calculate_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Doses for bulk records (crop, area_ha or area_acres, soil_n, soil_p, soil_k)"""
+        results: List[Dict[str, Any]] = []
+        rows, areas, soil, valid = [], [], [], []
+
+        for index, record in enumerate(records):
+            values = {key.strip().lower(): value for key, value in record.items() if key}
+            result = {'index': index, 'id': values.get('id')}
+            results.append(result)
+            try:
+                crop = self.crop_key(str(values.get('crop') or ''))
+                if crop is None:
+                    raise ValueError(f"no recommended dose for crop {values.get('crop')!r}")
+                if _present(values.get('area_ha')):
+                    area = float(values['area_ha'])
+                elif _present(values.get('area_acres')):
+                    area = float(values['area_acres']) * HECTARES_PER_ACRE
+                else:
+                    area = 1.0
+                if not math.isfinite(area) or area <= 0:
+                    raise ValueError("area must be a positive number")
+                tests = []
+                for key in ('soil_n', 'soil_p', 'soil_k'):
+                    value = float(values[key]) if _present(values.get(key)) else None
+                    if value is not None and not math.isfinite(value):
+                        raise ValueError(f"{key} must be a number")
+                    tests.append(float('nan') if value is None else value)
+            except (TypeError, ValueError) as e:
+                result['error'] = f"Invalid plot: {e}"
+                continue
+            result.update(crop=crop, area_ha=round(area, 4))
+            rows.append(self._rows[crop])
+            areas.append(area)
+            soil.append(tests)
+            valid.append(result)
+
+        if valid:
+            soil_array = np.array(soil, dtype=np.float64)
+            computed = self.calculate(rows, areas, soil_array[:, 0], soil_array[:, 1], soil_array[:, 2])
+            dose = np.round(computed['dose'], 1).tolist()
+            quantities = np.round(np.column_stack([computed['urea'], computed['dap'], computed['mop']]), 1).tolist()
+            for result, (n, p, k), (urea, dap, mop) in zip(valid, dose, quantities):
+                result.update(n_kg_ha=n, p2o5_kg_ha=p, k2o_kg_ha=k, urea_kg=urea, dap_kg=dap, mop_kg=mop)
+        return results
+
+    def parse_question(self, text: str, normalized_text: str) -> Optional[Tuple[str, Optional[float], List[float]]]:
+        """(crop, area in ha or None, soil N/P/K or NaN) for a fertilizer question about a known crop"""
+        tokens = normalized_text.split()
+        if not is_fertilizer_question(tokens):
+            return None
+        crop = next((key for key in (lookup_prefix(token, self._crop_index) for token in tokens)
+                     if key in self._rows), None)
+        if crop is None:
+            return None
+
+        folded = fold_numbers(text)
+        soil = []
+        for pattern in _SOIL_VALUES:
+            match = pattern.search(folded)
+            soil.append(float(match.group(1)) if match else float('nan'))
+        return crop, parse_area_hectares(folded, folded=True), soil
+
+    def answer(self, text: str, normalized_text: str, language: str) -> Optional[str]:
+        """Answer a fertilizer dose question locally, or None if it is not one we can answer"""
+        if np is None:
+            return None
+        # Suffix matching needs unstemmed tokens
+        if Config.QUERY_STEMMING:
+            normalized_text = normalize_text(text, stem=False)
+
+        parsed = self.parse_question(text, normalized_text)
+        if parsed is None:
+            return None
+        crop, area_ha, soil = parsed
+        # Farmers think in acres: without a stated area, answer for one acre
+        stated_area = area_ha is not None
+        area_ha = area_ha if stated_area else HECTARES_PER_ACRE
+
+        computed = self.calculate([self._rows[crop]], [area_ha], [soil[0]], [soil[1]], [soil[2]])
+        logger.info("Answered fertilizer question locally: %s, %.2f ha", crop, area_ha, extra=SAMPLED)
+        return format_fertilizer_answer(
+            crop, area_ha, stated_area, any(value == value for value in soil),  # NaN != NaN
+            {key: value[0].tolist() for key, value in computed.items()},
+            self._split[self._rows[crop]], language
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {'enabled': np is not None, 'crops': len(self.crops)}
+
+
+def is_fertilizer_question(tokens: List[str]) -> bool:
+    """A fertilizer or nutrient word, and no pesticide word, in the normalized tokens"""
+    return (any(token.startswith(FERTILIZER_WORDS) for token in tokens)
+            and not any(token.startswith(PESTICIDE_WORDS) for token in tokens))
+
+
+def _present(value: Any) -> bool:
+    return value is not None and str(value).strip() != ''
+
+
+def _acres(value: float) -> str:
+    """Fixed-point acres without trailing zeros (150, 12.5, 0.25)"""
+    return f"{value:.{2 if value < 10 else 1}f}".rstrip('0').rstrip('.')
+
+
+def _crop_name(crop: str, language: str) -> str:
+    if crop in COMMODITIES:
+        return COMMODITIES[crop][1 if language == 'mr' else 0]
+    return crop.title()
+
+
+def format_fertilizer_answer(crop: str, area_ha: float, stated_area: bool, soil_tested: bool,
+                             computed: Dict[str, Any], split_nitrogen: bool, language: str) -> str:
+    """Bilingual dose answer for one plot"""
+    marathi = language == 'mr'
+    n, p, k = computed['dose']
+    area_acres = area_ha / HECTARES_PER_ACRE
+    labels = ('नत्र', 'स्फुरद', 'पालाश') if marathi else ('N', 'P2O5', 'K2O')
+
+    if marathi:
+        area = f"{_acres(area_acres)} एकर / {area_ha:.2f} हेक्टर" if stated_area else "1 एकर"
+        lines = [f"{_crop_name(crop, language)} - खत मात्रा ({area}):",
+                 f"शिफारस: नत्र {n:.0f}, स्फुरद {p:.0f}, पालाश {k:.0f} किलो प्रति हेक्टर"]
+    else:
+        area = f"{_acres(area_acres)} acres / {area_ha:.2f} ha" if stated_area else "1 acre"
+        lines = [f"{_crop_name(crop, language)} - fertilizer dose ({area}):",
+                 f"Recommended: N {n:.0f}, P2O5 {p:.0f}, K2O {k:.0f} kg per hectare"]
+
+    adjusted = []
+    for label, factor in zip(labels, computed['factor']):
+        if factor > 1:
+            adjusted.append(f"{label} +25%" + (" (जमिनीत कमी)" if marathi else " (low in soil)"))
+        elif factor < 1:
+            adjusted.append(f"{label} -25%" + (" (जमिनीत जास्त)" if marathi else " (high in soil)"))
+    if adjusted:
+        lines.append(("माती परीक्षणानुसार बदल: " if marathi else "Adjusted for your soil test: ") + ', '.join(adjusted))
+
+    lines.append("तुमच्या क्षेत्रासाठी खते:" if marathi else "Fertilizer for your plot:")
+    for name_en, name_mr, key in (('Urea', 'युरिया', 'urea'), ('DAP', 'डीएपी', 'dap'), ('MOP (potash)', 'एमओपी (पोटॅश)', 'mop')):
+        quantity = computed[key]
+        if quantity >= 0.5:
+            bags = quantity / BAG_KG
+            lines.append(f"• {name_mr}: {quantity:.0f} किलो ({bags:.1f} गोणी)" if marathi
+                         else f"• {name_en}: {quantity:.0f} kg ({bags:.1f} bags of {BAG_KG} kg)")
+
+    if split_nitrogen:
+        lines.append("पेरणी/लागवडीवेळी निम्मे नत्र व संपूर्ण स्फुरद, पालाश द्या; उरलेले नत्र 30-45 दिवसांनी द्या." if marathi
+                     else "Apply half the nitrogen and all the P and K at sowing/planting; give the rest of the nitrogen 30-45 days later.")
+    else:
+        lines.append("संपूर्ण मात्रा पेरणीवेळी द्या." if marathi else "Apply the full dose at sowing.")
+    if not soil_tested:
+        lines.append("ही सर्वसाधारण शिफारस आहे; माती परीक्षण अहवाल असल्यास त्यातील नत्र, स्फुरद, पालाश सांगा." if marathi
+                     else "This is the general recommendation; share your soil-test N, P and K values for an adjusted dose.")
+    return '\n'.join(lines)
+
+
+def plots_to_csv(results: List[Dict[str, Any]]) -> str:
+    """Bulk results as CSV"""
+    columns = ['index', 'id', 'crop', 'area_ha', 'n_kg_ha', 'p2o5_kg_ha', 'k2o_kg_ha',
+               'urea_kg', 'dap_kg', 'mop_kg', 'error']
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(results)
+    return output.getvalue()
+
+
+# Global instance
+fertilizer_calculator = FertilizerCalculator()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fertilizer dose calculator")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    query_parser = subparsers.add_parser('query', help="Answer a fertilizer question")
+    query_parser.add_argument('question')
+    query_parser.add_argument('--language', default='mr', choices=Config.SUPPORTED_LANGUAGES)
+    batch_parser = subparsers.add_parser('batch', help="Calculate doses for a CSV of plots")
+    batch_parser.add_argument('file')
+    batch_parser.add_argument('-o', '--output', help="Write results CSV here (default: stdout)")
+    args = parser.parse_args()
+
+    if np is None:
+        parser.error("numpy is required for the fertilizer calculator (pip install numpy)")
+
+    if args.command == 'query':
+        started = time.perf_counter()
+        answer = fertilizer_calculator.answer(args.question, normalize_text(args.question, stem=False), args.language)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(answer or "Not a fertilizer question for a known crop")
+        print(f"({elapsed:.2f} ms)")
+    else:
+        with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+            records = list(csv.DictReader(f))
+        started = time.perf_counter()
+        results = fertilizer_calculator.calculate_batch(records)
+        elapsed = time.perf_counter() - started
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                f.write(plots_to_csv(results))
+        else:
+            print(plots_to_csv(results), end='')
+        print(f"Calculated {len(results)} plots in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
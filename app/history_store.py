@@ -0,0 +1,241 @@
+"""
+Conversation history store
+
+Every answered chat message is kept in SQLite (WAL mode, indexed by
+session and time) so a farmer's past conversation can be fetched without
+reading the chat logs:
+
+- Requests only enqueue the message; a background writer inserts queued
+  messages in batches (HISTORY_BATCH_SIZE rows per transaction, at least
+  every HISTORY_FLUSH_SECONDS). If the queue is full the message is dropped
+  from history (it is still in the chat logs) rather than delaying the reply.
+- Retention: messages older than HISTORY_RETENTION_DAYS are deleted hourly,
+  and each session keeps at most HISTORY_MAX_PER_SESSION messages.
+- Pages are read newest first with keyset pagination on the message id
+  (`before` cursor), so every page is one indexed range scan however long
+  the history is.
+
+The chat logs remain the source for analytics (app.log_analytics); this
+store serves /api/session/history.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    user_input TEXT NOT NULL,
+    bot_response TEXT NOT NULL,
+    language TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+"""
+
+_COLUMNS = ('id', 'timestamp', 'user_input', 'bot_response', 'language', 'status')
+
+PRUNE_INTERVAL = 3600       # Seconds between retention passes
+PRUNE_CHUNK = 5000          # Rows deleted per transaction, so readers and writers are not held up
+
+
+class HistoryStore:
+    """Persistent per-session conversation history with a batched background writer"""
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_seconds: float = 1.0,
+                 queue_size: int = 10000, retention_days: int = 90, max_per_session: int = 500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retention_days = retention_days
+        self.max_per_session = max_per_session
+        self._queue: 'queue.Queue[Tuple[str, str, str, str, str, str]]' = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.pruned = 0
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def record(self, session_id: str, user_input: str, bot_response: str, language: str = None,
+               status: str = None, timestamp: str = None):
+        """Queue a message for the writer (never blocks the request)"""
+        if not self.running or not session_id:
+            return
+        try:
+            self._queue.put_nowait((session_id, timestamp or datetime.now().isoformat(), user_input,
+                                    bot_response, language, status))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, batch: List[Tuple[str, str, str, str, str, str]]):
+        """Insert a batch in one transaction and trim the sessions it touched"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                "INSERT INTO messages (session_id, timestamp, user_input, bot_response, language, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            if self.max_per_session > 0:
+                for session_id in {row[0] for row in batch}:
+                    connection.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                        "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (session_id, session_id, self.max_per_session)
+                    )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        self.written += len(batch)
+
+    def flush(self) -> int:
+        """Write everything queued so far in the calling thread; returns rows written"""
+        written = 0
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+
+    def _drain(self, block: bool) -> List[Tuple[str, str, str, str, str, str]]:
+        """Up to batch_size queued messages, waiting up to flush_seconds for the first if block"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_seconds) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def prune(self) -> int:
+        """Delete messages older than the retention period; returns rows deleted"""
+        self._last_prune = time.time()
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        connection = self._connection()
+        deleted = 0
+        while True:
+            cursor = connection.execute(
+                "DELETE FROM messages WHERE id IN (SELECT id FROM messages WHERE timestamp < ? LIMIT ?)",
+                (cutoff, PRUNE_CHUNK)
+            )
+            deleted += cursor.rowcount
+            if cursor.rowcount < PRUNE_CHUNK:
+                break
+        if deleted:
+            logger.info("Pruned %d history messages older than %d days", deleted, self.retention_days)
+        self.pruned += deleted
+        return deleted
+
+    def _writer(self):
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            try:
+                if batch:
+                    self._write(batch)
+                if time.time() - self._last_prune > PRUNE_INTERVAL:
+                    self.prune()
+            except sqlite3.Error as e:
+                logger.error("History write failed (%d messages lost): %s", len(batch), e)
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.error("History flush at shutdown failed: %s", e)
+
+    def start(self):
+        """Start the background writer (idempotent)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._writer, name='history-writer', daemon=True)
+        self._thread.start()
+        logger.info("History store started (%s)", self.db_path)
+
+    def stop(self):
+        """Stop the writer after writing what is queued"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def page(self, session_id: str, before: int = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        One page of a session's history, newest page first, messages in
+        chronological order. Pass next_before back as `before` for the
+        previous page; it is None when there are no older messages.
+        """
+        query = "SELECT id, timestamp, user_input, bot_response, language, status FROM messages WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)  # One extra row tells whether an older page exists
+
+        rows = self._connection().execute(query, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [{column: row[column] for column in _COLUMNS} for row in reversed(rows)]
+        return {
+            'messages': messages,
+            'next_before': rows[-1]['id'] if more else None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'pruned': self.pruned
+        }
+
+
+# Global instance
+history_store = HistoryStore(
+    Config.HISTORY_DB,
+    batch_size=Config.HISTORY_BATCH_SIZE,
+    flush_seconds=Config.HISTORY_FLUSH_SECONDS,
+    queue_size=Config.HISTORY_QUEUE_SIZE,
+    retention_days=Config.HISTORY_RETENTION_DAYS,
+    max_per_session=Config.HISTORY_MAX_PER_SESSION
+)
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.cache import make_cache
+from app.config import Config
+from app.messages import message_catalog
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 128
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request"""
+
+
+class IdempotencyInProgress(Exception):
+    """Raised when the original request is still running after the duplicate's time budget"""
+
+
+def _storable(result: Tuple[str, Dict[str, Any], int]) -> bool:
+    """Only real answers are kept: errors and canned fallbacks (load shed, Gemini failure) are retried"""
+    _, payload, status_code = result
+    if status_code >= 400 or payload.get('status') == 'error':
+        return False
+    answer = payload.get('answer', payload.get('response'))
+    return not (isinstance(answer, str) and message_catalog.is_canned(answer))
+
+
+class IdempotencyStore:
+    """Bounded store of recent responses keyed by (endpoint, session, idempotency key).
+
+    A duplicate of a completed request gets the stored response; a duplicate
+    that arrives while the original is still running attaches to it (via the
+    cache's single-flight computation) instead of generating again, for at
+    most its own time budget. Error and canned fallback responses are not
+    stored, so a retry after a failure or overload recomputes.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600):
+        self._cache = make_cache(max_size, ttl, 'idempotency')
+        self.replays = 0
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        """Fingerprint of the request body, to detect keys reused for other requests"""
+        return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+    def run(self, endpoint: str, session_id: Optional[str], key: str, fingerprint: str,
+            compute: Callable[[], Tuple[Dict[str, Any], int]],
+            timeout: float = None) -> Tuple[Dict[str, Any], int, bool]:
+        """
+        Run compute() at most once per key. A duplicate waits at most
+        `timeout` seconds for a still-running original (IdempotencyInProgress).
+        Returns: (payload, status_code, replayed)
+        """
+        computed = []
+
+        def compute_once():
+            computed.append(True)
+            payload, status_code = compute()
+            return fingerprint, payload, status_code
+
+        try:
+            stored_fingerprint, payload, status_code = self._cache.get_or_compute(
+                (endpoint, session_id or '', key),
+                compute_once,
+                cache_if=_storable,
+                wait_timeout=timeout
+            )
+        except TimeoutError:
+            if computed:
+                raise  # Raised by this request's own computation
+            raise IdempotencyInProgress(f"Request with idempotency key {key!r} is still being processed")
+
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyConflict(f"Idempotency key {key!r} was already used for a different request")
+
+        replayed = not computed
+        if replayed:
+            self.replays += 1
+            logger.info("Replayed response for idempotency key %s", key)
+        return payload, status_code, replayed
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._cache.stats(), replays=self.replays)
+
+
+def get_idempotency_key(headers, data: Dict[str, Any]) -> Optional[str]:
+    """Idempotency-Key header, or the client message ID in the body"""
+    key = headers.get('Idempotency-Key') or data.get('message_id')
+    if key is None:
+        return None
+    key = str(key).strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency key must be 1-{MAX_KEY_LENGTH} characters")
+    return key
+
+
+# Global instance
+idempotency_store = IdempotencyStore(Config.IDEMPOTENCY_STORE_SIZE, Config.IDEMPOTENCY_TTL)
@@ -0,0 +1,335 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from app.config import Config
+from app.logging_setup import SAMPLED
+from app.utils import validate_input
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    callback_url TEXT,
+    callback_status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority DESC, available_at);
+"""
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'  # Dead-lettered after exhausting retries
+
+CALLBACK_ATTEMPTS = 3
+
+
+class JobRejected(Exception):
+    """Raised by a handler for a job that can never succeed; stored as done with the error, not retried"""
+
+
+class JobQueue:
+    """Persistent SQLite-backed job queue with a local worker pool.
+
+    Jobs are claimed highest priority first, retried with exponential
+    backoff, and dead-lettered after max_attempts (an attempt lost with a
+    crashed worker counts too). Results are stored for polling and
+    optionally POSTed to a callback URL by a separate callback pool, so a
+    slow partner endpoint never holds up job workers.
+    """
+
+    def __init__(self, db_path: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 workers: int = 2, max_attempts: int = 3, retry_delay: float = 5.0,
+                 visibility_timeout: float = 300.0, callback_workers: int = 2):
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.callback_workers = callback_workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._callbacks = None
+        self._last_requeue = 0.0
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def submit(self, payload: Dict[str, Any], priority: int = 0, callback_url: str = None,
+               max_attempts: int = None) -> str:
+        """Enqueue a job and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO jobs (id, payload, priority, status, max_attempts, available_at, created_at, updated_at, callback_url) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(payload, ensure_ascii=False), priority, QUEUED,
+             max_attempts or self.max_attempts, now, now, now, callback_url)
+        )
+        self._wakeup.set()
+        logger.info("Job %s queued (priority %d)", job_id, priority, extra=SAMPLED)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job status and result"""
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'callback_status': row['callback_status'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Atomically claim the next ready job (the returned row counts this attempt)"""
+        connection = self._connection()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? AND available_at <= ? "
+                "ORDER BY priority DESC, available_at LIMIT 1",
+                (QUEUED, now)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, row['id'])
+                )
+                row = connection.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+            connection.execute('COMMIT')
+            return row
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _finish(self, row: sqlite3.Row, result: Dict[str, Any] = None, error: str = None, retry: bool = True):
+        """Record success, schedule a retry, or dead-letter the job"""
+        attempts = row['attempts']
+        now = time.time()
+
+        if error is None or not retry:
+            status, available_at = DONE, now
+        elif attempts < row['max_attempts']:
+            status, available_at = QUEUED, now + self.retry_delay * (2 ** (attempts - 1))
+        else:
+            status, available_at = DEAD, now
+
+        callback_status = 'pending' if status in (DONE, DEAD) and row['callback_url'] else None
+        # Only the attempt that still owns the job may finish it; a run that
+        # outlived the visibility timeout has already been re-queued
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, available_at = ?, updated_at = ?, result = ?, error = ?, callback_status = ? "
+            "WHERE id = ? AND status = ? AND attempts = ?",
+            (status, available_at, now, json.dumps(result, ensure_ascii=False) if result else None, error,
+             callback_status, row['id'], RUNNING, attempts)
+        )
+        if not cursor.rowcount:
+            logger.warning("Job %s attempt %d finished after it was re-queued; result discarded", row['id'], attempts)
+            return
+
+        if status == DEAD:
+            logger.error("Job %s dead-lettered after %d attempts: %s", row['id'], attempts, error)
+        elif status == QUEUED:
+            logger.warning("Job %s failed (attempt %d), retrying: %s", row['id'], attempts, error)
+
+        if callback_status:
+            self._schedule_callback(row['id'], row['callback_url'])
+
+    def _schedule_callback(self, job_id: str, callback_url: str):
+        """Hand a callback to the callback pool; while stopped it stays pending until the next start"""
+        callbacks = self._callbacks
+        if callbacks is not None:
+            callbacks.submit(self._send_callback, job_id, callback_url)
+
+    def _send_callback(self, job_id: str, callback_url: str):
+        """POST the final job state to its callback URL"""
+        job = self.get(job_id)
+        callback_status = 'failed'
+        for attempt in range(CALLBACK_ATTEMPTS):
+            try:
+                response = requests.post(callback_url, json=job, timeout=10)
+                if response.status_code < 400:
+                    callback_status = 'delivered'
+                    break
+                logger.warning("Callback for job %s returned %s", job_id, response.status_code)
+            except Exception as e:
+                logger.warning("Callback for job %s failed: %s", job_id, e)
+            if attempt + 1 < CALLBACK_ATTEMPTS and self._stopping.wait(2 ** attempt):
+                return  # Shutting down: left pending for the next start
+
+        self._connection().execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (callback_status, job_id))
+
+    def _requeue_stale(self):
+        """Retry or dead-letter jobs left running by a crashed worker; the lost run counts as an attempt"""
+        self._last_requeue = time.time()
+        cutoff = self._last_requeue - self.visibility_timeout
+        rows = self._connection().execute(
+            "SELECT * FROM jobs WHERE status = ? AND updated_at < ?",
+            (RUNNING, cutoff)
+        ).fetchall()
+        for row in rows:
+            self._finish(row, error=f"Worker lost during attempt {row['attempts']}")
+        if rows:
+            logger.warning("Recovered %d stale jobs", len(rows))
+
+    def _resume_callbacks(self):
+        """Deliver callbacks that were still pending when the process stopped"""
+        rows = self._connection().execute(
+            "SELECT id, callback_url FROM jobs WHERE callback_status = 'pending'"
+        ).fetchall()
+        for row in rows:
+            self._schedule_callback(row['id'], row['callback_url'])
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except sqlite3.OperationalError as e:
+                logger.warning("Job claim failed: %s", e)
+                row = None
+
+            if row is None:
+                if time.time() - self._last_requeue > self.visibility_timeout:
+                    self._requeue_stale()
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+
+            try:
+                result = self.handler(json.loads(row['payload']))
+                self._finish(row, result=result)
+            except JobRejected as e:
+                self._finish(row, error=str(e), retry=False)
+            except Exception as e:
+                self._finish(row, error=str(e))
+
+    def start(self):
+        """Start the worker and callback pools (idempotent)"""
+        if self._threads:
+            return
+        self._stopping.clear()
+        self._callbacks = ThreadPoolExecutor(max_workers=self.callback_workers, thread_name_prefix='job-callback')
+        self._resume_callbacks()
+        self._requeue_stale()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Job queue started with %d workers", self.workers)
+
+    def stop(self):
+        """Stop the worker pool"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self._callbacks is not None:
+            self._callbacks.shutdown(wait=False)
+            self._callbacks = None
+
+    def stats(self) -> Dict[str, int]:
+        """Get job counts by status"""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+
+def process_chat_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued chat question through the chatbot pipeline"""
+    from app.chatbot import chatbot
+
+    # Invalid input fails the same way on every attempt - reject it once
+    is_valid, validation_message = validate_input(payload.get('message') or '')
+    if not is_valid:
+        raise JobRejected(validation_message)
+
+    result = chatbot.process_query(payload['message'], payload.get('session_id'), payload.get('language'))
+    if result['status'] == 'error':
+        raise RuntimeError('Chat pipeline returned an error')
+    return result
+
+
+def _endpoint(url: str):
+    """(scheme, host, port, path) of an http(s) URL, or None if it is not one"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+    except ValueError:
+        return None
+    if parts.scheme not in ('http', 'https') or not parts.hostname or parts.username or parts.password:
+        return None
+    if '..' in parts.path.split('/'):
+        return None  # Would escape the allowed path once the server normalizes it
+    return parts.scheme, parts.hostname, port, parts.path or '/'
+
+
+def is_allowed_callback(callback_url: str) -> bool:
+    """
+    Only POST results to configured partner endpoints: scheme, host and port
+    must equal an allowed entry's and the path must be within its path.
+    """
+    target = _endpoint(callback_url) if isinstance(callback_url, str) else None
+    if target is None:
+        return False
+    for prefix in Config.JOB_CALLBACK_ALLOWED_PREFIXES:
+        allowed = _endpoint(prefix)
+        if allowed is None or target[:3] != allowed[:3]:
+            continue
+        path = allowed[3]
+        if target[3] == path or target[3].startswith(path if path.endswith('/') else path + '/'):
+            return True
+    return False
+
+
+# Global instance
+job_queue = JobQueue(
+    Config.JOB_QUEUE_DB,
+    process_chat_job,
+    workers=Config.JOB_WORKERS,
+    max_attempts=Config.JOB_MAX_ATTEMPTS,
+    retry_delay=Config.JOB_RETRY_DELAY,
+    callback_workers=Config.JOB_CALLBACK_WORKERS
+)
@@ -0,0 +1,153 @@
+import logging
+import math
+import re
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Precompiled patterns (compiled once per process)
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Characters and words that are common in Marathi but rare in Hindi
+_MARATHI_MARKERS = re.compile(r'ळ|आहे|आहेत|नाही|काय|कसे|कुठे|केव्हा|कोण|च्या|मला|तुम्ही')
+_HINDI_MARKERS = re.compile(r'है|हैं|क्या|कैसे|कहाँ|नहीं|में|मुझे|आप')
+
+# Small training corpora for the romanized character n-gram model.
+# Kept agriculture-focused since that is what our users type.
+_TRAINING_TEXT = {
+    'mr': """
+        kanda pikala pani kiti dyave majhya shetat kay karave aahe aahet nahi mala
+        tumhi kasa kase kuthe kevha kon shetkari shetkaryanna shet sheti pik pike
+        piku paus pavsala bhav bajar bajarbhav khat biyane kapus us oos soyabin
+        tur harbhara gahu jwari bajri bhat tandul mati jamin vihir thibak sinchan
+        kid rog favarni aushadh yojana anudan karj vima kapni lagvad perni
+        kadhi yeil zale jhala zhala hoil kartat karaycha karayche ahe ka kay ho
+        majha majhi majhe aamhi aaplya tyachya tyanchya shetatil pikanna pikala
+        pikache kandyache kapsache pavsache panyache kiti divsat ekar guntha
+        sangaa sanga kasa karu kay karu changla changle nuksan bharpai milel
+        """,
+    'hi': """
+        kya kaise kab kitna kitni kahan hai hain nahi mein mujhe aap hum kheti
+        kisan fasal fasalon barish baarish mausam paani pani bhav mandi daam keemat
+        khad beej kapas gehun dhan chawal mitti zameen sinchai keet rog dawai
+        yojana sabsidi karz bima katai buvai ke liye ki ko se par aur bhi karna
+        chahiye hoga hogi milega batao bataiye kaun sa kaunsa achha nuksan muavza
+        mera meri mere hamara hamari unka unki acre bigha din mahine saal
+        """,
+    'en': """
+        how much water should i give my onion crop what is the price of cotton
+        when will it rain which fertilizer is best for wheat and rice the farmer
+        field soil seed seeds harvest irrigation drip pest disease spray market
+        government scheme subsidy loan insurance weather forecast today tomorrow
+        yield season kharif rabi plant planting sowing growing cultivation best
+        control methods how to improve soil health please tell me about this that
+        with for from can you help need want should would could does do is are
+        """,
+}
+
+# Whole-word hints that are strong evidence on their own
+_LEXICON = {
+    'mr': {'aahe', 'ahe', 'aahet', 'kay', 'kasa', 'kase', 'kuthe', 'kevha', 'mala',
+           'tumhi', 'majha', 'majhi', 'majhya', 'pikala', 'shetat', 'kiti', 'paus', 'karave'},
+    'hi': {'hai', 'hain', 'kya', 'kaise', 'kab', 'kitna', 'mujhe', 'mein', 'kahan',
+           'chahiye', 'kisan', 'fasal', 'barish', 'liye'},
+    'en': {'the', 'is', 'are', 'what', 'how', 'when', 'which', 'should', 'my', 'for',
+           'price', 'crop', 'water', 'please', 'and', 'of', 'to', 'in'},
+}
+
+_LEXICON_WEIGHT = 2.0
+
+
+class LanguageDetector:
+    """Fast local language detector returning a language code and confidence.
+
+    Devanagari text is classified by script ratio and Marathi/Hindi markers.
+    Latin-script text is scored with a character trigram model so romanized
+    Marathi ("kanda pikala pani kiti") is not mistaken for English.
+    """
+
+    def __init__(self, training_text: Dict[str, str] = None):
+        self._models = {}
+        self._unseen = {}
+        for language, text in (training_text or _TRAINING_TEXT).items():
+            self._models[language], self._unseen[language] = self._build_model(text)
+        self._languages = tuple(self._models)
+
+    @staticmethod
+    def _trigrams(word: str):
+        padded = f" {word} "
+        return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    def _build_model(self, text: str) -> Tuple[Dict[str, float], float]:
+        """Build add-one smoothed trigram log-probabilities"""
+        counts: Dict[str, int] = {}
+        for word in _WORD_RE.findall(text.lower()):
+            for gram in self._trigrams(word):
+                counts[gram] = counts.get(gram, 0) + 1
+        total = sum(counts.values()) + len(counts) + 1
+        model = {gram: math.log((count + 1) / total) for gram, count in counts.items()}
+        return model, math.log(1 / total)
+
+    def detect(self, text: str) -> Tuple[str, float]:
+        """
+        Detect the language of text.
+        Returns: (language, confidence) where language is 'mr', 'hi' or 'en'
+        """
+        if not text or not text.strip():
+            return 'mr', 0.0
+
+        # Single pass over the text to compute script ratios
+        devanagari = latin = 0
+        for char in text:
+            if 'ऀ' <= char <= 'ॿ':
+                devanagari += 1
+            elif char.isascii() and char.isalpha():
+                latin += 1
+
+        letters = devanagari + latin
+        if letters == 0:
+            return 'mr', 0.0
+
+        if devanagari:
+            return self._detect_devanagari(text, devanagari / letters)
+
+        return self._detect_romanized(text)
+
+    def _detect_devanagari(self, text: str, ratio: float) -> Tuple[str, float]:
+        """Classify Devanagari text as Marathi or Hindi"""
+        marathi_hits = len(_MARATHI_MARKERS.findall(text))
+        hindi_hits = len(_HINDI_MARKERS.findall(text))
+
+        language = 'hi' if hindi_hits > marathi_hits else 'mr'
+        # Script ratio dominates; mixed-script text gets proportionally less confidence
+        confidence = 0.5 + 0.49 * ratio
+        return language, round(confidence, 3)
+
+    def _detect_romanized(self, text: str) -> Tuple[str, float]:
+        """Score Latin-script text with the trigram model and lexicon hints"""
+        scores = dict.fromkeys(self._languages, 0.0)
+        words = _WORD_RE.findall(text.lower())
+        grams = 0
+
+        for word in words:
+            for language in self._languages:
+                if word in _LEXICON.get(language, ()):
+                    scores[language] += _LEXICON_WEIGHT
+            for gram in self._trigrams(word):
+                grams += 1
+                for language in self._languages:
+                    scores[language] += self._models[language].get(gram, self._unseen[language])
+
+        if not grams:
+            return 'en', 0.0
+
+        # Scale by trigram count so long texts are not overconfident, then softmax
+        peak = max(scores.values())
+        exps = {lang: math.exp((score - peak) / math.sqrt(grams)) for lang, score in scores.items()}
+        total = sum(exps.values())
+        language = max(exps, key=exps.get)
+        return language, round(exps[language] / total, 3)
+
+
+# Create a singleton instance
+language_detector = LanguageDetector()
@@ -0,0 +1,299 @@
+"""
+Chat log analytics
+
+Streams over current, rotated and legacy chat logs (JSON Lines or the old
+JSON array, optionally gzip-compressed) and computes usage aggregates in
+constant memory:
+
+- language mix and share of non-agricultural queries
+- answer/question length statistics (Welford running mean/variance)
+- approximate distinct sessions and questions (HyperLogLog)
+- top questions and deepest sessions (Space-Saving heavy hitters)
+
+Large files are split into byte ranges and processed across cores; every
+aggregate is mergeable, so partial results combine exactly (or within the
+sketch error bounds).
+
+Usage:
+    python -m app.log_analytics
+    python -m app.log_analytics data/archive/*.jsonl.gz --workers 8 --json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple, Iterator, Optional
+
+from app.messages import faq_key
+from app.utils import chat_log_files, iter_chat_logs
+
+# Byte-range size for splitting large uncompressed JSON Lines files
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (~1.6% standard error at p=12)"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: str):
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)  # Small-range correction
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Space-Saving top-k heavy hitters with bounded memory"""
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, str] = {}
+
+    def add(self, key: str, sample: str = None, weight: int = 1):
+        if key in self.counts:
+            self.counts[key] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = weight
+            self.samples[key] = sample or key
+        else:
+            # Replace the minimum, inheriting its count as the error bound
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            self.samples.pop(victim, None)
+            self.counts[key] = floor + weight
+            self.samples[key] = sample or key
+
+    def merge(self, other: 'SpaceSaving'):
+        for key, count in other.counts.items():
+            self.add(key, other.samples.get(key), count)
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.samples.get(key, key), count) for key, count in ranked]
+
+
+class RunningStats:
+    """Mergeable running count/mean/variance/min/max (Welford / Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'RunningStats'):
+        if not other.count:
+            return
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> Dict[str, Any]:
+        stddev = math.sqrt(self.m2 / self.count) if self.count else 0.0
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 1),
+            'stddev': round(stddev, 1),
+            'min': self.min,
+            'max': self.max
+        }
+
+
+class ChatLogAggregate:
+    """All chat log aggregates; built per chunk and merged"""
+
+    def __init__(self, top_capacity: int = 200):
+        self.total = 0
+        self.errors = 0
+        self.non_agriculture = 0
+        self.languages = Counter()
+        self.answer_lengths = RunningStats()
+        self.question_lengths = RunningStats()
+        self.sessions = HyperLogLog()
+        self.questions = HyperLogLog()
+        self.top_questions = SpaceSaving(top_capacity)
+        self.top_sessions = SpaceSaving(top_capacity)
+
+    def add(self, entry: Dict[str, Any]):
+        question = entry.get('user_input') or ''
+        answer = entry.get('bot_response') or ''
+        session_id = entry.get('session_id')
+
+        self.total += 1
+        self.languages[entry.get('language', 'unknown')] += 1
+        if not entry.get('is_agriculture_related', True):
+            self.non_agriculture += 1
+        if answer.startswith('ERROR:'):
+            self.errors += 1
+        else:
+            self.answer_lengths.add(len(answer))
+
+        self.question_lengths.add(len(question))
+        key = faq_key(question)
+        self.questions.add(key)
+        self.top_questions.add(key, question)
+        if session_id:
+            self.sessions.add(session_id)
+            self.top_sessions.add(session_id)
+
+    def merge(self, other: 'ChatLogAggregate'):
+        self.total += other.total
+        self.errors += other.errors
+        self.non_agriculture += other.non_agriculture
+        self.languages.update(other.languages)
+        self.answer_lengths.merge(other.answer_lengths)
+        self.question_lengths.merge(other.question_lengths)
+        self.sessions.merge(other.sessions)
+        self.questions.merge(other.questions)
+        self.top_questions.merge(other.top_questions)
+        self.top_sessions.merge(other.top_sessions)
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        distinct_sessions = self.sessions.count()
+        return {
+            'total_entries': self.total,
+            'errors': self.errors,
+            'language_distribution': dict(self.languages),
+            'non_agriculture_share': round(self.non_agriculture / self.total, 4) if self.total else 0.0,
+            'answer_length': self.answer_lengths.summary(),
+            'question_length': self.question_lengths.summary(),
+            'distinct_questions_approx': self.questions.count(),
+            'distinct_sessions_approx': distinct_sessions,
+            'avg_session_depth': round(self.total / distinct_sessions, 2) if distinct_sessions else 0.0,
+            'top_questions': [{'question': q, 'count': c} for q, c in self.top_questions.top(top)],
+            'deepest_sessions': [{'session_id': s, 'turns': c} for s, c in self.top_sessions.top(top)]
+        }
+
+
+def _iter_jsonl_range(path: str, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    """Iterate over JSON lines whose first byte lies in [start, end)"""
+    with open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()  # Skip the line owned by the previous chunk
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def plan_tasks(paths: List[str], chunk_bytes: int = CHUNK_BYTES) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """Split inputs into (path, start, end) tasks; plain JSON Lines files are split by byte range"""
+    tasks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if path.endswith('.jsonl') or ('.jsonl.' in path and not path.endswith('.gz')):
+            for start in range(0, max(size, 1), chunk_bytes):
+                tasks.append((path, start, min(start + chunk_bytes, size)))
+        else:
+            tasks.append((path, None, None))
+    return tasks
+
+
+def iter_task_entries(task: Tuple[str, Optional[int], Optional[int]]) -> Iterator[Dict[str, Any]]:
+    """Iterate over the entries of one task (a whole file or a byte range of a JSON Lines file)"""
+    path, start, end = task
+    return iter_chat_logs(path) if start is None else _iter_jsonl_range(path, start, end)
+
+
+def aggregate_task(task: Tuple[str, Optional[int], Optional[int]]) -> ChatLogAggregate:
+    """Aggregate one task"""
+    aggregate = ChatLogAggregate()
+    for entry in iter_task_entries(task):
+        aggregate.add(entry)
+    return aggregate
+
+
+def analyze(paths: List[str], workers: int = None) -> ChatLogAggregate:
+    """Analyze chat logs, in parallel across processes when there are several tasks"""
+    tasks = plan_tasks(paths)
+    result = ChatLogAggregate()
+
+    if len(tasks) <= 1 or workers == 1:
+        for task in tasks:
+            result.merge(aggregate_task(task))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(aggregate_task, tasks):
+            result.merge(partial)
+    return result
+
+
+def _print_report(report: Dict[str, Any]):
+    print(f"Entries:              {report['total_entries']} ({report['errors']} errors)")
+    print(f"Languages:            {report['language_distribution']}")
+    print(f"Non-agriculture:      {report['non_agriculture_share']:.1%}")
+    print(f"Distinct sessions:    ~{report['distinct_sessions_approx']} (avg depth {report['avg_session_depth']})")
+    print(f"Distinct questions:   ~{report['distinct_questions_approx']}")
+    print(f"Answer length:        {report['answer_length']}")
+    print(f"Question length:      {report['question_length']}")
+    print("Top questions:")
+    for item in report['top_questions']:
+        print(f"  {item['count']:>6}  {item['question'][:80]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat log analytics")
+    parser.add_argument('paths', nargs='*', help="Log files (default: all current, rotated and legacy logs)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--top', type=int, default=20, help="Number of top questions/sessions to report")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    paths = args.paths or chat_log_files()
+    report = analyze(paths, args.workers).report(args.top)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == '__main__':
+    main()
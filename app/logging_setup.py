@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# Per-request logging context: request ID and stage timings
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar('request_context', default=None)
+
+# Pass as `extra=SAMPLED` on high-volume INFO events so they are subject to sampling
+SAMPLED = {'sampled': True}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def start_request(request_id: str = None) -> Dict[str, Any]:
+    """Start a logging context for the current request"""
+    context = {
+        'request_id': request_id or uuid.uuid4().hex,
+        'started': time.perf_counter(),
+        'timings': {}
+    }
+    _request_context.set(context)
+    return context
+
+
+def end_request() -> Optional[Dict[str, Any]]:
+    """End the current request context and return it"""
+    context = _request_context.get()
+    _request_context.set(None)
+    return context
+
+
+def get_request_id() -> Optional[str]:
+    """Get the current request ID, if any"""
+    context = _request_context.get()
+    return context['request_id'] if context else None
+
+
+def request_timestamp() -> str:
+    """ISO timestamp of the current request, formatted once and reused by every caller"""
+    context = _request_context.get()
+    if context is None:
+        return datetime.now().isoformat()
+    timestamp = context.get('timestamp')
+    if timestamp is None:
+        timestamp = context['timestamp'] = datetime.now().isoformat()
+    return timestamp
+
+
+def get_stage_timings() -> Dict[str, float]:
+    """Get stage timings (ms) recorded for the current request"""
+    context = _request_context.get()
+    return dict(context['timings']) if context else {}
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the duration of a pipeline stage in the current request context"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context = _request_context.get()
+        if context is not None:
+            context['timings'][stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = get_request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records marked as sampled; warnings and errors always pass"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, 'sampled', False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON"""
+
+    EXTRA_FIELDS = ('timings', 'status', 'path', 'method', 'duration_ms', 'session_id')
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None)
+        }
+        for field in self.EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats records before enqueueing so they can be
+    pickled; our queue is in-process, so the request thread only enqueues.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(log_level: str = 'INFO', log_file: str = None, log_format: str = 'json',
+                  max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5,
+                  sample_rate: float = 1.0) -> logging.Logger:
+    """
+    Setup non-blocking application logging.
+
+    Request threads only put records on a queue; a listener thread formats
+    them and writes to the console and a rotating log file. Safe to call
+    more than once - only the first call installs handlers.
+    """
+    global _listener
+
+    if _listener is None:
+        if log_format == 'json':
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+        handlers = [logging.StreamHandler()]  # Console output
+        if log_file:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RequestContextFilter())
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    logging.getLogger().setLevel(getattr(logging, log_level.upper()))
+    return logging.getLogger('app.utils')
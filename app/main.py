@@ -1,13 +1,30 @@
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, send_from_directory, url_for
 from flask_cors import CORS
-import logging
+import csv
+import io
+import mimetypes
 import os
-import uuid
-from datetime import datetime
+import time
 
 from app.config import Config
+from app.cache import response_cache, translation_cache
 from app.chatbot import chatbot
-from app.utils import setup_logging
+from app.deadline import Deadline
+from app.job_queue import job_queue, is_allowed_callback
+from app.pipeline import run_in_background
+from app.sharding import session_router
+from app.stats import chat_stats
+from app.idempotency import IdempotencyConflict, IdempotencyInProgress, get_idempotency_key, idempotency_store
+from app.fertilizer import fertilizer_calculator, plots_to_csv
+from app.history_store import history_store
+from app.market_prices import price_engine
+from app.schemes import results_to_csv, scheme_engine
+from app.weather import weather_engine
+from app.warmup import cache_warmer
+from app.utils import setup_logging, validate_input
+from app.logging_setup import SAMPLED, start_request, end_request, request_timestamp
+from app.assets import DIST_DIR, fingerprinted_path
+from app.serialization import FastJSONProvider, compress_response, dumps, etag_for
 
 # Initialize Flask app
 app = Flask(__name__, 
@@ -16,12 +33,15 @@ app = Flask(__name__,
 
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 
+# Compact UTF-8 JSON for every jsonify() response (orjson when installed)
+app.json = FastJSONProvider(app)
+
 # Enable CORS for API endpoints
 CORS(app, resources={
     r"/api/*": {
         "origins": ["http://localhost:3000", "http://127.0.0.1:5000"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "X-Request-Timeout", "Idempotency-Key"]
     }
 })
 
@@ -33,6 +53,60 @@ logger.info("Initializing AI Agriculture Chatbot...")
 logger.info(f"Environment: {Config.FLASK_ENV}")
 logger.info(f"Debug mode: {Config.DEBUG}")
 
+# Start background workers for queued (SMS/IVR) jobs
+if Config.JOB_WORKERS > 0:
+    job_queue.start()
+
+# Batched writer for the conversation history store
+if Config.HISTORY_ENABLED:
+    history_store.start()
+
+# Follow cluster membership changes made by any worker (or deploy tooling);
+# sessions that changed owner are moved in the background
+session_router.on_change = lambda: run_in_background('rebalance_sessions', chatbot.rebalance_sessions)
+if Config.CLUSTER_SELF:
+    session_router.watch()
+
+# Warm caches and indexes from historical traffic; health reports warming until done
+if Config.WARMUP_ENABLED:
+    cache_warmer.start()
+
+@app.context_processor
+def asset_helpers():
+    """Template helper: fingerprinted build asset URL, or the plain static file if not built"""
+    def asset_url(path: str) -> str:
+        fingerprinted = fingerprinted_path(path)
+        if fingerprinted:
+            return url_for('asset_file', filename=fingerprinted)
+        return url_for('static', filename=path)
+    return {'asset_url': asset_url}
+
+@app.route('/assets/<path:filename>')
+def asset_file(filename):
+    """Serve fingerprinted build assets, precompressed, cached forever"""
+    mimetype = mimetypes.guess_type(filename)[0]
+    filename_on_disk, encoding = filename, None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(DIST_DIR, filename + suffix)):
+            filename_on_disk, encoding = filename + suffix, candidate
+            break
+    
+    response = send_from_directory(DIST_DIR, filename_on_disk, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The content hash is in the file name, so a URL's content never changes
+    response.headers['Cache-Control'] = f'public, max-age={Config.ASSET_CACHE_MAX_AGE}, immutable'
+    return response
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker, served from the root so its scope covers the whole app"""
+    response = send_from_directory(app.static_folder, 'js/sw.js', mimetype='text/javascript')
+    # Browsers must see a new worker promptly after a deploy
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/')
 def index():
     """Serve the main chat interface"""
@@ -69,36 +143,335 @@ def chat_api():
                 'status': 'error'
             }), 400
         
-        # Process the query using direct Gemini integration
-        from app.answer_generator import answer_generator
-        language = data.get('language', 'mr')  # Default to Marathi
+        language = data.get('language')  # None: reply in the detected language of the query
         
-        # Generate response
-        answer = answer_generator.generate_response(user_input, language)
+        # Clients may shorten (never extend) the time budget via X-Request-Timeout
+        deadline = Deadline.from_header(
+            request.headers.get('X-Request-Timeout'),
+            Config.CHAT_DEADLINE,
+            Config.CHAT_DEADLINE
+        )
         
-        # Create response
-        response = {
-            'answer': answer,
-            'status': 'success',
-            'session_id': session_id or str(uuid.uuid4()),
-            'timestamp': datetime.now().isoformat()
-        }
+        def run_chat():
+            # Process the query through the chatbot pipeline
+            result = chatbot.process_query(user_input, session_id, language, deadline)
+            
+            # Create response
+            return {
+                'answer': result['response'],
+                'language': result['language'],
+                'status': result['status'],
+                'session_id': result['session_id'],
+                'timestamp': result['timestamp']
+            }, 200
+        
+        # Retried questions (same Idempotency-Key / message_id) are generated once
+        try:
+            idempotency_key = get_idempotency_key(request.headers, data)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error'
+            }), 400
+        
+        replayed = False
+        if idempotency_key:
+            response, status_code, replayed = idempotency_store.run(
+                'chat', session_id, idempotency_key,
+                idempotency_store.fingerprint(user_input, language),
+                run_chat,
+                timeout=deadline.remaining()
+            )
+        else:
+            response, status_code = run_chat()
         
         # Add session ID to Flask session for web interface
         if 'session_id' not in session:
             session['session_id'] = response.get('session_id')
         
-        logger.info(f"Chat API - Query processed successfully")
-        return jsonify(response)
+        logger.info("Chat API - Query processed successfully", extra=SAMPLED)
+        result = jsonify(response)
+        if replayed:
+            result.headers['Idempotent-Replayed'] = 'true'
+        return result, status_code
         
+    except IdempotencyConflict as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 422
+    except IdempotencyInProgress as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 409, {'Retry-After': '1'}
     except Exception as e:
-        logger.error(f"Chat API error: {e}", exc_info=True)
+        logger.error("Chat API error: %s", e, exc_info=True)
         return jsonify({
             'error': 'Internal server error',
             'status': 'error',
             'message': 'काहीतरी चूक झाली. कृपया पुन्हा प्रयत्न करा.'
         }), 500
 
+@app.route('/api/chat/batch', methods=['POST', 'OPTIONS'])
+def chat_batch_api():
+    """Batch chat API - process many questions in one request"""
+    
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json()
+        items = data.get('messages') if data else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'error': 'messages must be a non-empty list',
+                'status': 'error'
+            }), 400
+        
+        if len(items) > Config.BATCH_MAX_ITEMS:
+            return jsonify({
+                'error': f'Too many messages. Maximum {Config.BATCH_MAX_ITEMS} per batch',
+                'status': 'error'
+            }), 400
+        
+        if not all(isinstance(item, dict) for item in items):
+            return jsonify({
+                'error': 'Each message must be an object',
+                'status': 'error'
+            }), 400
+        
+        results = chatbot.process_batch(items, data.get('language'))
+        
+        logger.info("Chat batch API - %d queries processed", len(results), extra=SAMPLED)
+        return jsonify({
+            'results': [
+                {
+                    'index': result['index'],
+                    'id': result.get('id'),
+                    'answer': result['response'],
+                    'language': result['language'],
+                    'status': result['status'],
+                    'session_id': result.get('session_id'),
+                    'error': result.get('error')
+                }
+                for result in results
+            ],
+            'count': len(results),
+            'status': 'success',
+            'timestamp': request_timestamp()
+        })
+        
+    except Exception as e:
+        logger.error("Chat batch API error: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Internal server error',
+            'status': 'error'
+        }), 500
+
+@app.route('/api/schemes/eligibility', methods=['POST', 'OPTIONS'])
+def scheme_eligibility_api():
+    """Check many farmer profiles against all schemes (JSON, or a CSV body for extension officers)"""
+    
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        as_csv = request.mimetype == 'text/csv'
+        if as_csv:
+            profiles = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+        else:
+            data = request.get_json(silent=True)
+            profiles = data.get('profiles') if isinstance(data, dict) else None
+        
+        if not isinstance(profiles, list) or not profiles:
+            return jsonify({
+                'error': 'profiles must be a non-empty list (JSON) or CSV rows',
+                'status': 'error'
+            }), 400
+        
+        if len(profiles) > Config.SCHEME_BATCH_MAX_PROFILES:
+            return jsonify({
+                'error': f'Too many profiles. Maximum {Config.SCHEME_BATCH_MAX_PROFILES} per request',
+                'status': 'error'
+            }), 400
+        
+        if not all(isinstance(profile, dict) for profile in profiles):
+            return jsonify({
+                'error': 'Each profile must be an object',
+                'status': 'error'
+            }), 400
+        
+        started = time.perf_counter()
+        results = scheme_engine.evaluate_batch(profiles)
+        logger.info("Scheme eligibility API - %d profiles in %.1f ms",
+                    len(results), (time.perf_counter() - started) * 1000, extra=SAMPLED)
+        
+        if as_csv:
+            return Response(results_to_csv(results), mimetype='text/csv')
+        return jsonify({
+            'results': results,
+            'schemes': {scheme.id: scheme.name for scheme in scheme_engine.schemes},
+            'count': len(results),
+            'status': 'success',
+            'timestamp': request_timestamp()
+        })
+        
+    except Exception as e:
+        logger.error("Scheme eligibility API error: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Internal server error',
+            'status': 'error'
+        }), 500
+
+@app.route('/api/fertilizer/batch', methods=['POST', 'OPTIONS'])
+def fertilizer_batch_api():
+    """Fertilizer doses for many plots (JSON, or a CSV body for extension officers)"""
+    
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if not fertilizer_calculator.stats()['enabled']:
+        return jsonify({
+            'error': 'Fertilizer calculator is not available (numpy is not installed)',
+            'status': 'error'
+        }), 503
+    
+    try:
+        as_csv = request.mimetype == 'text/csv'
+        if as_csv:
+            plots = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+        else:
+            data = request.get_json(silent=True)
+            plots = data.get('plots') if isinstance(data, dict) else None
+        
+        if not isinstance(plots, list) or not plots:
+            return jsonify({
+                'error': 'plots must be a non-empty list (JSON) or CSV rows',
+                'status': 'error'
+            }), 400
+        
+        if len(plots) > Config.FERTILIZER_BATCH_MAX_PLOTS:
+            return jsonify({
+                'error': f'Too many plots. Maximum {Config.FERTILIZER_BATCH_MAX_PLOTS} per request',
+                'status': 'error'
+            }), 400
+        
+        if not all(isinstance(plot, dict) for plot in plots):
+            return jsonify({
+                'error': 'Each plot must be an object',
+                'status': 'error'
+            }), 400
+        
+        started = time.perf_counter()
+        results = fertilizer_calculator.calculate_batch(plots)
+        logger.info("Fertilizer batch API - %d plots in %.1f ms",
+                    len(results), (time.perf_counter() - started) * 1000, extra=SAMPLED)
+        
+        if as_csv:
+            return Response(plots_to_csv(results), mimetype='text/csv')
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'status': 'success',
+            'timestamp': request_timestamp()
+        })
+        
+    except Exception as e:
+        logger.error("Fertilizer batch API error: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Internal server error',
+            'status': 'error'
+        }), 500
+
+@app.route('/api/jobs', methods=['POST', 'OPTIONS'])
+def submit_job_api():
+    """Submit a chat question for asynchronous processing"""
+    
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json()
+        
+        if not data or not str(data.get('message', '')).strip():
+            return jsonify({
+                'error': 'Empty message',
+                'status': 'error'
+            }), 400
+        
+        # Reject input the pipeline would refuse now rather than queueing a job that cannot succeed
+        is_valid, validation_message = validate_input(data['message']) if isinstance(data['message'], str) \
+            else (False, 'message must be a string')
+        if not is_valid:
+            return jsonify({
+                'error': validation_message,
+                'status': 'error'
+            }), 400
+        
+        callback_url = data.get('callback_url')
+        if callback_url and not is_allowed_callback(callback_url):
+            return jsonify({
+                'error': 'callback_url is not an allowed callback endpoint',
+                'status': 'error'
+            }), 400
+        
+        priority = max(0, min(9, int(data.get('priority', 0))))
+        job_id = job_queue.submit(
+            {
+                'message': data['message'].strip(),
+                'session_id': data.get('session_id'),
+                'language': data.get('language')
+            },
+            priority=priority,
+            callback_url=callback_url
+        )
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"/api/jobs/{job_id}",
+            'timestamp': request_timestamp()
+        }), 202
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'error': f'Invalid job request: {e}',
+            'status': 'error'
+        }), 400
+    except Exception as e:
+        logger.error("Job submit API error: %s", e, exc_info=True)
+        return jsonify({
+            'error': 'Failed to queue job',
+            'status': 'error'
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status_api(job_id):
+    """Poll the status and result of an asynchronous job"""
+    try:
+        job = job_queue.get(job_id)
+        
+        if not job:
+            return jsonify({
+                'error': 'Job not found',
+                'status': 'error'
+            }), 404
+        
+        return jsonify(job)
+        
+    except Exception as e:
+        logger.error("Job status API error: %s", e)
+        return jsonify({
+            'error': 'Failed to get job status',
+            'status': 'error'
+        }), 500
+
 @app.route('/api/welcome', methods=['GET'])
 def welcome_api():
     """Get welcome message"""
@@ -107,8 +480,9 @@ def welcome_api():
         session_id = request.args.get('session_id') or session.get('session_id')
         
         # Create a new session if none exists
-        if not session_id:
-            session_id = str(uuid.uuid4())
+        new_session = not session_id
+        if new_session:
+            session_id = session_router.new_session_id()
         
         # Get appropriate welcome message
         from app.utils import get_welcome_message
@@ -117,16 +491,26 @@ def welcome_api():
         response = {
             'message': welcome_msg,
             'language': language,
-            'status': 'success',
-            'session_id': session_id,
-            'timestamp': datetime.now().isoformat()
+            'status': 'success'
         }
         
-        # Store session ID
-        if 'session_id' not in session:
-            session['session_id'] = response.get('session_id')
+        if new_session:
+            # The client has to learn its new session ID - not cacheable
+            response['session_id'] = session_id
+            response['timestamp'] = request_timestamp()
+            session['session_id'] = session_id
+            result = jsonify(response)
+            result.headers['Cache-Control'] = 'no-store'
+            return result
         
-        return jsonify(response)
+        # Otherwise the body depends only on the language: revalidate with ETag / 304
+        if 'session_id' not in session:
+            session['session_id'] = session_id
+        body = dumps(response)
+        result = app.response_class(body, mimetype='application/json')
+        result.set_etag(etag_for(body))
+        result.headers['Cache-Control'] = f'private, max-age={Config.WELCOME_CACHE_MAX_AGE}'
+        return result.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Welcome API error: {e}")
@@ -167,15 +551,109 @@ def session_info_api():
             'status': 'error'
         }), 500
 
+@app.route('/api/session/history', methods=['GET'])
+def session_history_api():
+    """
+    Get a session's conversation history, newest page first.
+    Query: session_id, limit, before (next_before from the previous page).
+    A browser with a session cookie may only read its own session.
+    """
+    cookie_session_id = session.get('session_id')
+    session_id = request.args.get('session_id') or cookie_session_id
+    if not session_id:
+        return jsonify({'error': 'No session found', 'status': 'error'}), 404
+    if cookie_session_id and session_id != cookie_session_id:
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    
+    try:
+        limit = int(request.args.get('limit', Config.HISTORY_PAGE_SIZE))
+        before = request.args.get('before')
+        before = int(before) if before else None
+    except ValueError:
+        return jsonify({'error': 'limit and before must be integers', 'status': 'error'}), 400
+    limit = max(1, min(limit, Config.HISTORY_MAX_PAGE_SIZE))
+    
+    try:
+        page = history_store.page(session_id, before, limit)
+    except Exception as e:
+        logger.error(f"Session history API error: {e}")
+        return jsonify({'error': 'Failed to get session history', 'status': 'error'}), 500
+    
+    return jsonify(dict(page, session_id=session_id, status='success'))
+
+@app.route('/api/cluster', methods=['GET'])
+def cluster_api():
+    """Cluster membership and routing counters"""
+    return jsonify(dict(session_router.stats(), local_sessions=len(chatbot.session_data), status='success'))
+
+@app.route('/api/cluster/nodes', methods=['PUT'])
+def cluster_nodes_api():
+    """
+    Change membership (internal). The new list is written to the membership
+    file, so every worker of this node applies it; sessions that changed
+    owner are moved in the background.
+    """
+    if not session_router.authorized(request.headers):
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    nodes = data.get('nodes')
+    if not isinstance(nodes, list) or not all(isinstance(node, str) and node for node in nodes):
+        return jsonify({
+            'error': 'nodes must be a list of node base URLs',
+            'status': 'error'
+        }), 400
+    
+    try:
+        session_router.publish_nodes(nodes)
+    except OSError as e:
+        logger.error("Writing cluster membership failed: %s", e)
+        return jsonify({'error': 'Failed to save cluster membership', 'status': 'error'}), 500
+    return jsonify(dict(session_router.stats(), status='success'))
+
+@app.route('/api/cluster/sessions', methods=['POST'])
+def cluster_sessions_api():
+    """Receive sessions handed over by another node (internal)"""
+    if not session_router.authorized(request.headers):
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    sessions = data.get('sessions')
+    if not isinstance(sessions, dict):
+        return jsonify({'error': 'sessions must be an object', 'status': 'error'}), 400
+    
+    imported = chatbot.import_sessions({
+        str(session_id): info for session_id, info in sessions.items() if isinstance(info, dict)
+    })
+    return jsonify({'imported': imported, 'status': 'success'})
+
 @app.route('/api/stats', methods=['GET'])
 def stats_api():
-    """Get chatbot statistics (for admin/monitoring)"""
+    """Get chatbot statistics (for admin/monitoring; constant time in the number of sessions)"""
     try:
+        from app.answer_generator import gemini_limiter, gemini_hedger
+        from app.translator import translate_hedger
         stats = chatbot.get_stats()
         return jsonify({
             'stats': stats,
+            'upstream': {
+                'gemini': dict(gemini_limiter.metrics(), hedging=gemini_hedger.metrics()),
+                'translate': {'hedging': translate_hedger.metrics()}
+            },
+            'caches': {
+                'response': response_cache.stats(),
+                'translation': translation_cache.stats()
+            },
+            'idempotency': idempotency_store.stats(),
+            'market_prices': price_engine.stats(),
+            'weather': weather_engine.stats(),
+            'schemes': scheme_engine.stats(),
+            'fertilizer': fertilizer_calculator.stats(),
+            'warmup': cache_warmer.status(),
+            'cluster': session_router.stats(),
+            'history': history_store.stats(),
             'status': 'success',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': request_timestamp()
         })
         
     except Exception as e:
@@ -192,7 +670,7 @@ def health_check():
         # Basic health checks
         health_status = {
             'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': request_timestamp(),
             'version': '1.0.0',
             'components': {
                 'chatbot': 'healthy',
@@ -206,6 +684,11 @@ def health_check():
             health_status['status'] = 'unhealthy'
             health_status['components']['answer_generator'] = 'missing_api_key'
         
+        # Not ready for traffic until the cache warm-up has finished
+        health_status['components']['warmup'] = cache_warmer.state
+        if not cache_warmer.ready and health_status['status'] == 'healthy':
+            health_status['status'] = 'warming'
+        
         status_code = 200 if health_status['status'] == 'healthy' else 503
         return jsonify(health_status), status_code
         
@@ -214,7 +697,7 @@ def health_check():
         return jsonify({
             'status': 'unhealthy',
             'error': str(e),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': request_timestamp()
         }), 503
 
 @app.route('/generate', methods=['POST'])
@@ -231,17 +714,41 @@ def generate_response():
         if not user_input:
             return jsonify({'error': 'No prompt provided'}), 400
         
-        logger.info(f"Processing prompt: {user_input[:50]}...")
+        logger.debug("Processing prompt: %.50s...", user_input)
+        
+        def run_generate():
+            # Generate response using Gemini
+            from app.answer_generator import answer_generator
+            return {'response': answer_generator.generate_response(user_input, 'mr')}, 200
+        
+        try:
+            idempotency_key = get_idempotency_key(request.headers, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Generate response using Gemini
-        from app.answer_generator import answer_generator
-        response_text = answer_generator.generate_response(user_input, 'mr')
+        replayed = False
+        if idempotency_key:
+            response, status_code, replayed = idempotency_store.run(
+                'generate', data.get('session_id'), idempotency_key,
+                idempotency_store.fingerprint(user_input),
+                run_generate,
+                timeout=Config.GEMINI_TIMEOUT
+            )
+        else:
+            response, status_code = run_generate()
         
-        logger.info("Response generated successfully")
-        return jsonify({'response': response_text})
+        logger.info("Response generated successfully", extra=SAMPLED)
+        result = jsonify(response)
+        if replayed:
+            result.headers['Idempotent-Replayed'] = 'true'
+        return result, status_code
         
+    except IdempotencyConflict as e:
+        return jsonify({'error': str(e)}), 422
+    except IdempotencyInProgress as e:
+        return jsonify({'error': str(e)}), 409, {'Retry-After': '1'}
     except Exception as e:
-        logger.error(f"Error generating response: {str(e)}", exc_info=True)
+        logger.error("Error generating response: %s", e, exc_info=True)
         return jsonify({
             'error': 'Internal server error',
             'message': 'माफ करा, काहीतरी चूक झाली आहे. कृपया पुन्हा प्रयत्न करा.'
@@ -255,6 +762,9 @@ def not_found(error):
             'error': 'API endpoint not found',
             'status': 'error'
         }), 404
+    elif request.path.startswith('/assets/'):
+        # A missing build file must not be answered (and cached) as the page
+        return 'Asset not found', 404, {'Cache-Control': 'no-store'}
     else:
         return render_template('index.html')  # Serve SPA for non-API routes
 
@@ -274,6 +784,13 @@ def internal_error(error):
 @app.before_request
 def before_request():
     """Run before each request"""
+    start_request(request.headers.get('X-Request-ID'))
+    
+    # Session-scoped requests for sessions owned by another node are served there
+    forwarded = session_router.forward(request)
+    if forwarded is not None:
+        return forwarded
+    
     # Clean up old sessions periodically (every 100th request approximately)
     import random
     if random.randint(1, 100) == 1:
@@ -287,6 +804,29 @@ def after_request(response):
     response.headers['X-Frame-Options'] = 'DENY'
     response.headers['X-XSS-Protection'] = '1; mode=block'
     
+    # gzip/brotli for larger bodies (most of the cost for users on 2G links)
+    response = compress_response(response, request.accept_encodings)
+    
+    # Per-endpoint request rates for /api/stats (by route pattern, not raw path)
+    chat_stats.record_request(request.url_rule.rule if request.url_rule else 'unmatched', response.status_code)
+    
+    # Structured access log with per-stage timings
+    context = end_request()
+    if context:
+        response.headers['X-Request-ID'] = context['request_id']
+        logger.info(
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra=dict(
+                SAMPLED,
+                request_id=context['request_id'],
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+                duration_ms=round((time.perf_counter() - context['started']) * 1000, 2),
+                timings=context['timings']
+            )
+        )
+    
     return response
 
 if __name__ == '__main__':
@@ -0,0 +1,408 @@
+"""
+Mandi (APMC) market price engine
+
+Ingests APMC daily price CSV dumps (data.gov.in "Current Daily Price of
+Various Commodities" layout) into an indexed SQLite store and answers price
+questions such as "today's onion price in Lasalgaon" or "लासलगाव कांदा भाव"
+locally, without calling the model.
+
+Usage:
+    python -m app.market_prices ingest data/prices/*.csv
+    python -m app.market_prices query "onion price in lasalgaon" --language en
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.logging_setup import SAMPLED
+from app.normalizer import lookup_prefix, normalize_text
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    commodity_key TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    market_key TEXT NOT NULL,
+    market TEXT NOT NULL,
+    district TEXT,
+    variety TEXT NOT NULL DEFAULT '',
+    arrival_date TEXT NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    modal_price REAL,
+    PRIMARY KEY (commodity, market, variety, arrival_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prices_lookup ON prices (commodity_key, market_key, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_prices_commodity ON prices (commodity_key, arrival_date);
+"""
+
+# Commodity key -> (English name, Marathi name, aliases). Aliases are matched
+# against normalized query tokens and APMC commodity names; Marathi oblique
+# forms (कांद्याचा -> कांद्या) are listed so suffixed words still match.
+COMMODITIES = {
+    'onion': ('Onion', 'कांदा', ['onion', 'kanda', 'कांदा', 'कांद्या']),
+    'tomato': ('Tomato', 'टोमॅटो', ['tomato', 'टोमॅटो', 'टोमाटो']),
+    'potato': ('Potato', 'बटाटा', ['potato', 'batata', 'बटाटा', 'बटाट्या']),
+    'wheat': ('Wheat', 'गहू', ['wheat', 'gahu', 'गहू', 'गव्हा']),
+    'rice': ('Rice', 'तांदूळ', ['rice', 'तांदूळ', 'तांदळा']),
+    'paddy': ('Paddy', 'भात', ['paddy', 'dhan', 'भात', 'धान']),
+    'cotton': ('Cotton', 'कापूस', ['cotton', 'kapas', 'kapus', 'कापूस', 'कापसा']),
+    'soybean': ('Soybean', 'सोयाबीन', ['soyabean', 'soybean', 'सोयाबीन']),
+    'tur': ('Tur', 'तूर', ['arhar', 'tur', 'तूर', 'तुरी']),
+    'gram': ('Gram', 'हरभरा', ['bengal gram', 'gram', 'chana', 'हरभरा', 'हरभऱ्या']),
+    'jowar': ('Jowar', 'ज्वारी', ['jowar', 'sorghum', 'ज्वारी']),
+    'bajra': ('Bajra', 'बाजरी', ['bajra', 'pearl millet', 'बाजरी']),
+    'maize': ('Maize', 'मका', ['maize', 'corn', 'मका', 'मक्या']),
+    'groundnut': ('Groundnut', 'भुईमूग', ['groundnut', 'भुईमूग', 'शेंगदाणा', 'शेंगदाण्या']),
+    'grapes': ('Grapes', 'द्राक्षे', ['grapes', 'grape', 'द्राक्ष']),
+    'pomegranate': ('Pomegranate', 'डाळिंब', ['pomegranate', 'डाळिंब']),
+    'banana': ('Banana', 'केळी', ['banana', 'केळी', 'केळ्या', 'केळ']),
+    'sugarcane': ('Sugarcane', 'ऊस', ['sugarcane', 'ऊस']),
+}
+
+# Marathi names of major APMC markets -> market key (normalized English base name)
+MARKET_ALIASES = {
+    'लासलगाव': 'lasalgaon', 'पिंपळगाव': 'pimpalgaon', 'नाशिक': 'nashik', 'पुणे': 'pune',
+    'मुंबई': 'mumbai', 'नागपूर': 'nagpur', 'सोलापूर': 'solapur', 'कोल्हापूर': 'kolhapur',
+    'औरंगाबाद': 'aurangabad', 'अहमदनगर': 'ahmednagar', 'जळगाव': 'jalgaon', 'लातूर': 'latur',
+    'अमरावती': 'amravati', 'सांगली': 'sangli', 'सातारा': 'satara', 'अकोला': 'akola',
+    'येवला': 'yeola', 'मनमाड': 'manmad', 'बारामती': 'baramati', 'जालना': 'jalna',
+}
+
+# Words that always mark a price question (matched as token prefixes: भावाने, किंमती)
+PRICE_WORDS = ('price', 'bhav', 'bajarbhav', 'भाव', 'बाजारभाव', 'किंमत')
+# 'rate'/'दर' also mean seed rate, and दर- starts दररोज, दरवर्षी, दरम्यान: these
+# count only as whole tokens, and only with a market named or a market word
+RATE_WORDS = ('rate', 'rates', 'दर')
+MARKET_WORDS = ('market', 'mandi', 'apmc', 'bazar', 'quintal', 'today',
+                'मंडी', 'बाजार', 'क्विंटल', 'आज')
+# How/why/should questions ("how to get a better price for onion") need advice, not a table
+ADVICE_WORDS = frozenset(normalize_text(word, stem=False) for word in (
+    'how', 'why', 'should', 'when', 'store', 'storage', 'sell', 'selling', 'better', 'increase',
+    'improve', 'advice', 'tips', 'कसे', 'कशी', 'कसा', 'कसं', 'का', 'केव्हा', 'कधी', 'करावे',
+    'करावी', 'करावा', 'सल्ला'
+))
+ADVICE_PREFIXES = ('साठव', 'मिळण्या', 'वाढव', 'विक्री')
+# Words after 'in'/'at' that are not a market name ("onion price in the market today")
+NOT_PLACES = frozenset(('the', 'my', 'our', 'local', 'today', 'market', 'mandi', 'apmc', 'bazar',
+                        'rupees', 'rs', 'kg', 'quintal', 'maharashtra', 'india'))
+
+
+def is_price_question(tokens: List[str]) -> bool:
+    """Whether normalized tokens ask for a price (without looking up market names)"""
+    if any(token.startswith(PRICE_WORDS) for token in tokens):
+        return True
+    return (any(token in RATE_WORDS for token in tokens)
+            and any(token.startswith(MARKET_WORDS) for token in tokens))
+
+
+def is_advice_question(tokens: List[str]) -> bool:
+    """Whether normalized tokens ask what to do rather than what the price is"""
+    return any(token in ADVICE_WORDS or token.startswith(ADVICE_PREFIXES) for token in tokens)
+
+
+def _market_key(market: str) -> str:
+    """'Lasalgaon(Niphad)' and 'Lasalgaon(Vinchur)' both belong to 'lasalgaon'"""
+    return normalize_text(market.split('(')[0], stem=False)
+
+
+def _parse_date(value: str) -> str:
+    """APMC dumps use dd/mm/yyyy; accept ISO dates too"""
+    value = value.strip()
+    for date_format in ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def _parse_price(value: str) -> Optional[float]:
+    value = (value or '').strip().replace(',', '')
+    return float(value) if value else None
+
+
+class MarketPriceEngine:
+    """Indexed SQLite store of mandi prices with local question answering"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._commodity_index = {
+            normalize_text(alias, stem=False): key
+            for key, (_, _, aliases) in COMMODITIES.items()
+            for alias in aliases
+        }
+        self._market_index: Dict[str, str] = {}
+        # Every place we know by name, stored or not, to tell "Nashik" apart from no market at all
+        self._place_index = {normalize_text(alias, stem=False): key for alias, key in MARKET_ALIASES.items()}
+        self._place_index.update({key: key for key in MARKET_ALIASES.values()})
+        self._market_names: Dict[str, str] = {}  # market key -> display name
+        self._loaded_at = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread SQLite connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def commodity_key(self, name: str) -> Optional[str]:
+        """Map an APMC commodity name ('Arhar (Tur/Red Gram)(Whole)') to a commodity key"""
+        normalized = normalize_text(name, stem=False)
+        words = normalized.split()
+        for size in (2, 1):
+            for start in range(len(words) - size + 1):
+                key = self._commodity_index.get(' '.join(words[start:start + size]))
+                if key:
+                    return key
+        return None
+
+    def ingest_csv(self, path: str) -> int:
+        """Load one APMC CSV dump (upserting existing rows); returns rows stored"""
+        rows = []
+        skipped = 0
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            # 'Min_x0020_Price' (data.gov.in XML export) and 'Min Price' both become 'min_price'
+            reader.fieldnames = [
+                name.replace('_x0020_', '_').replace(' ', '_').strip().lower()
+                for name in reader.fieldnames or []
+            ]
+            for record in reader:
+                try:
+                    commodity = record['commodity'].strip()
+                    key = self.commodity_key(commodity)
+                    if key is None:
+                        skipped += 1
+                        continue
+                    market = record['market'].strip()
+                    rows.append((
+                        key, commodity, _market_key(market), market,
+                        (record.get('district') or '').strip(),
+                        (record.get('variety') or '').strip(),
+                        _parse_date(record['arrival_date']),
+                        _parse_price(record.get('min_price')),
+                        _parse_price(record.get('max_price')),
+                        _parse_price(record.get('modal_price'))
+                    ))
+                except (KeyError, ValueError) as e:
+                    skipped += 1
+                    logger.debug("Skipping price row in %s: %s", path, e)
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO prices (commodity_key, commodity, market_key, market, district, variety, "
+                "arrival_date, min_price, max_price, modal_price) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._load_markets()
+        logger.info("Ingested %d price rows from %s (%d skipped)", len(rows), path, skipped)
+        return len(rows)
+
+    def refresh(self, force: bool = False):
+        """Reload the market index (at most every MARKET_PRICE_RELOAD_SECONDS)"""
+        if force or not self._loaded_at or time.monotonic() - self._loaded_at > Config.MARKET_PRICE_RELOAD_SECONDS:
+            self._load_markets()
+
+    def _load_markets(self):
+        """Build the market name index from the store plus the Marathi aliases"""
+        rows = self._connection().execute("SELECT DISTINCT market_key, market FROM prices").fetchall()
+        names = {}
+        for row in rows:
+            names.setdefault(row['market_key'], row['market'].split('(')[0].strip())
+        index = {key: key for key in names}
+        for alias, key in MARKET_ALIASES.items():
+            if key in names:
+                index[normalize_text(alias, stem=False)] = key
+        self._market_index, self._market_names = index, names
+        self._loaded_at = time.monotonic()
+
+    def parse_query(self, normalized_text: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Find (commodity key, market key or None) in a price question, or None if not one"""
+        tokens = normalized_text.split()
+        price_word = any(token.startswith(PRICE_WORDS) for token in tokens)
+        if not price_word and not any(token in RATE_WORDS for token in tokens):
+            return None
+        if is_advice_question(tokens):
+            return None
+
+        self.refresh()
+
+        commodity = market = None
+        for index, token in enumerate(tokens):
+            bigram = ' '.join(tokens[index:index + 2])
+            if commodity is None:
+                commodity = self._commodity_index.get(bigram) or lookup_prefix(token, self._commodity_index)
+            if market is None:
+                market = self._market_index.get(bigram) or lookup_prefix(token, self._market_index)
+
+        if commodity is None:
+            return None
+        # A market we have no prices for must not fall back to the all-market average
+        if market is None and self._names_unknown_market(tokens):
+            return None
+        # A bare 'rate'/'दर' needs a market: "onion rate in Lasalgaon", not "seed rate of wheat"
+        if not price_word and market is None and not any(token.startswith(MARKET_WORDS) for token in tokens):
+            return None
+        return commodity, market
+
+    def _names_unknown_market(self, tokens: List[str]) -> bool:
+        """Whether the question names a market that is not in the store"""
+        for index, token in enumerate(tokens):
+            if lookup_prefix(token, self._place_index):
+                return True
+            if token in ('in', 'at'):
+                following = [word for word in tokens[index + 1:index + 3] if word != 'the']
+                place = following[0] if following else None
+                if (place and place.isalpha() and place not in NOT_PLACES
+                        and lookup_prefix(place, self._commodity_index) is None
+                        and not place.startswith(PRICE_WORDS)):
+                    return True
+        return False
+
+    def lookup(self, commodity: str, market: str = None) -> Optional[Dict[str, Any]]:
+        """Latest min/max/modal prices and the 7-day modal price trend"""
+        connection = self._connection()
+        where = "commodity_key = ?" + (" AND market_key = ?" if market else "")
+        params = (commodity, market) if market else (commodity,)
+
+        latest = connection.execute(f"SELECT MAX(arrival_date) FROM prices WHERE {where}", params).fetchone()[0]
+        if latest is None:
+            return None
+
+        summary = connection.execute(
+            f"SELECT MIN(min_price), MAX(max_price), AVG(modal_price), COUNT(DISTINCT market) "
+            f"FROM prices WHERE {where} AND arrival_date = ?",
+            params + (latest,)
+        ).fetchone()
+        daily = connection.execute(
+            f"SELECT arrival_date, AVG(modal_price) FROM prices WHERE {where} "
+            f"AND arrival_date >= date(?, '-7 day') GROUP BY arrival_date ORDER BY arrival_date",
+            params + (latest,)
+        ).fetchall()
+
+        trend = None
+        if len(daily) >= 2 and daily[0][1]:
+            trend = (daily[-1][1] - daily[0][1]) / daily[0][1]
+
+        return {
+            'commodity': commodity,
+            'market': self._market_names.get(market) if market else None,
+            'date': latest,
+            'min_price': summary[0],
+            'max_price': summary[1],
+            'modal_price': summary[2],
+            'markets': summary[3],
+            'trend': trend
+        }
+
+    def answer(self, text: str, normalized_text: str, language: str) -> Optional[str]:
+        """Answer a market price question locally, or None if it is not one we can answer"""
+        # Suffix matching needs unstemmed tokens
+        if Config.QUERY_STEMMING:
+            normalized_text = normalize_text(text, stem=False)
+        
+        parsed = self.parse_query(normalized_text)
+        if parsed is None:
+            return None
+
+        result = self.lookup(*parsed)
+        if result is None:
+            return None
+
+        logger.info("Answered price query locally: %s/%s", result['commodity'], result['market'], extra=SAMPLED)
+        return format_price_answer(result, language)
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT market_key), MAX(arrival_date) FROM prices"
+        ).fetchone()
+        return {'rows': row[0], 'markets': row[1], 'latest_date': row[2]}
+
+
+def _rupees(value: Optional[float]) -> str:
+    return f"₹{value:,.0f}" if value is not None else '-'
+
+
+def format_price_answer(result: Dict[str, Any], language: str) -> str:
+    """Bilingual answer text for a price lookup"""
+    english_name, marathi_name, _ = COMMODITIES[result['commodity']]
+    trend = result['trend']
+
+    if language == 'mr':
+        if result['market']:
+            place = f"{result['market']} बाजारात"
+        else:
+            place = f"{result['markets']} बाजारात" if result['markets'] == 1 else f"{result['markets']} बाजारांमध्ये"
+        answer = (f"{place} {marathi_name} दर ({result['date']}):\n"
+                  f"• किमान: {_rupees(result['min_price'])}\n"
+                  f"• कमाल: {_rupees(result['max_price'])}\n"
+                  f"• सर्वसाधारण (मोडल): {_rupees(result['modal_price'])} प्रति क्विंटल")
+        if trend is not None:
+            direction = 'वाढ' if trend > 0 else 'घट'
+            answer += f"\nमागील 7 दिवसांत सर्वसाधारण दरात {abs(trend):.0%} {direction}."
+        return answer
+
+    if result['market']:
+        place = f"at {result['market']} APMC"
+    else:
+        place = f"across {result['markets']} market{'s' if result['markets'] != 1 else ''}"
+    answer = (f"{english_name} prices {place} ({result['date']}):\n"
+              f"• Minimum: {_rupees(result['min_price'])}\n"
+              f"• Maximum: {_rupees(result['max_price'])}\n"
+              f"• Modal: {_rupees(result['modal_price'])} per quintal")
+    if trend is not None:
+        direction = 'up' if trend > 0 else 'down'
+        answer += f"\nModal price is {direction} {abs(trend):.0%} over the last 7 days."
+    return answer
+
+
+# Global instance
+price_engine = MarketPriceEngine(Config.MARKET_PRICES_DB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mandi price store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help="Load APMC price CSV files")
+    ingest_parser.add_argument('files', nargs='+')
+    query_parser = subparsers.add_parser('query', help="Answer a price question")
+    query_parser.add_argument('question')
+    query_parser.add_argument('--language', default='mr', choices=Config.SUPPORTED_LANGUAGES)
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        total = sum(price_engine.ingest_csv(path) for path in args.files)
+        print(f"Stored {total} rows in {Config.MARKET_PRICES_DB}: {price_engine.stats()}")
+    else:
+        started = time.perf_counter()
+        answer = price_engine.answer(args.question, normalize_text(args.question, stem=False), args.language)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(answer or "No local price answer for this question")
+        print(f"({elapsed:.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import logging
+import json
+import os
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import Config
+from app.normalizer import canonical_key
+
+logger = logging.getLogger(__name__)
+
+# Canned bilingual messages. The catalog builder compiles these (plus
+# precomputed FAQ translations) into Config.MESSAGE_CATALOG_FILE.
+DEFAULT_MESSAGES = {
+    'welcome': {
+        'mr': 'नमस्कार मित्रा! मी कोती आहे. मी तुमच्या शेतीसंबंधी सर्व प्रश्नांची उत्तरे देण्यासाठी इथे आहे. पिके, हवामान, बाजारभाव, सरकारी योजना - काहीही विचारा!',
+        'en': 'Hello friend! I am Koti. I am here to answer all your agriculture-related questions. Ask me about crops, weather, market prices, government schemes - anything!'
+    },
+    'error': {
+        'mr': 'माफ करा, काहीतरी चूक झाली आहे. कृपया पुन्हा प्रयत्न करा.',
+        'en': 'Sorry, something went wrong. Please try again.'
+    },
+    'redirect': {
+        'mr': """मी कोती आहे - तुमचा शेती सहायक! 🌾
+
+मी फक्त शेतीशी संबंधित प्रश्नांची उत्तरे देतो:
+• पिकांची माहिती (भात, गहू, कापूस, ऊस इ.)
+• हवामान आणि हंगामी सल्ले
+• बाजारभाव आणि विक्री
+• सरकारी योजना आणि अनुदान
+• मातीची काळजी आणि खते
+• कीटक आणि रोग व्यवस्थापन
+
+कृपया मला शेतीबद्दल विचारा! 🚜""",
+        'en': """I am Koti - your agriculture assistant! 🌾
+
+I only answer agriculture-related questions about:
+• Crop information (Rice, Wheat, Cotton, Sugarcane etc.)
+• Weather and seasonal advice
+• Market prices and sales
+• Government schemes and subsidies
+• Soil care and fertilizers
+• Pest and disease management
+
+Please ask me about farming! 🚜"""
+    },
+    'redirect_short': {
+        'en': "I specialize in helping farmers with agricultural questions. Please ask me about farming, crops, weather, market prices, or government schemes for farmers.",
+        'mr': "मी शेतकऱ्यांना शेतीच्या प्रश्नांमध्ये मदत करण्यात तज्ञ आहे. कृपया मला शेती, पिके, हवामान, बाजारभाव किंवा शेतकऱ्यांसाठी सरकारी योजनांबद्दल विचारा."
+    },
+    'fallback': {
+        'en': "I apologize, but I'm having trouble processing your query right now. Please try rephrasing your question or contact our support team.",
+        'mr': "माफ करा, सध्या मला तुमच्या प्रश्नाची उत्तरे देण्यात अडचण येत आहे. कृपया तुमचा प्रश्न पुन्हा विचारा किंवा आमच्या सहाय्यता टीमशी संपर्क साधा."
+    },
+    'api_key_missing': {
+        'en': "The AI service is currently unavailable. The system administrator needs to set up the API key. Please contact support for assistance.",
+        'mr': "AI सेवा सध्या उपलब्ध नाही. सिस्टम प्रशासकाने API की सेट करणे आवश्यक आहे. कृपया मदतीसाठी सपोर्टशी संपर्क साधा."
+    },
+    'crop_rice': {
+        'en': "Rice is a major Kharif crop in Maharashtra. Best planted during June-July with monsoon rains. Requires adequate water and fertile soil.",
+        'mr': "भात हे महाराष्ट्रातील प्रमुख खरीप पीक आहे. जून-जुलैमध्ये पावसाळ्यात लावले जाते. पुरेसे पाणी आणि सुपीक मातीची गरज असते."
+    },
+    'crop_cotton': {
+        'en': "Cotton is an important cash crop in Maharashtra. Planted during Kharif season. Requires warm climate and moderate rainfall.",
+        'mr': "कापूस हे महाराष्ट्रातील महत्वाचे नगदी पीक आहे. खरीप हंगामात लावले जाते. उष्ण हवामान आणि मध्यम पावसाची गरज असते."
+    },
+    'contact_extension_officer': {
+        'en': "For specific agricultural advice, please contact your local agriculture extension officer or visit the nearest Krishi Vigyan Kendra.",
+        'mr': "विशिष्ट शेती सल्ल्यासाठी, कृपया तुमच्या स्थानिक कृषी विस्तार अधिकाऱ्याशी संपर्क साधा किंवा जवळच्या कृषी विज्ञान केंद्राला भेट द्या."
+    },
+}
+
+
+def faq_key(question: str) -> str:
+    """Lookup key for a FAQ question (the shared canonical query key)"""
+    return canonical_key(question)
+
+
+class MessageCatalog:
+    """Read-only catalog of canned messages and precomputed FAQ answers.
+
+    Loaded once per worker; every lookup is a single dict access.
+    """
+
+    def __init__(self, catalog_file: str = None):
+        self.catalog_file = catalog_file or Config.MESSAGE_CATALOG_FILE
+        self._messages: Dict[Tuple[str, str], str] = {}
+        self._faq_index: Dict[str, int] = {}
+        self._faq_answers = []
+        self._canned = frozenset()
+        self.load()
+
+    def load(self):
+        """Load the compiled artifact, falling back to the built-in messages"""
+        artifact = {}
+        try:
+            if os.path.exists(self.catalog_file):
+                with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                    artifact = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load message catalog: {e}")
+
+        messages = dict(DEFAULT_MESSAGES)
+        messages.update(artifact.get('messages', {}))
+
+        self._messages = {
+            (key, language): text
+            for key, translations in messages.items()
+            for language, text in translations.items()
+        }
+        self._faq_index = artifact.get('faq_index', {})
+        self._faq_answers = artifact.get('faq_answers', [])
+        self._canned = frozenset(self._messages.values())
+        logger.info(f"Message catalog loaded: {len(messages)} messages, {len(self._faq_answers)} FAQ answers")
+
+    def get(self, key: str, language: str = 'mr', default_language: str = 'mr') -> str:
+        """Get a canned message in the requested language"""
+        message = self._messages.get((key, language))
+        if message is None:
+            message = self._messages.get((key, default_language), '')
+        return message
+
+    def is_canned(self, text: str) -> bool:
+        """Check whether text is one of the canned messages"""
+        return text in self._canned
+
+    def get_faq_answer(self, question: str, language: str, key: str = None) -> Optional[str]:
+        """Get a precomputed FAQ answer, if the question is a known FAQ"""
+        index = self._faq_index.get(key or faq_key(question))
+        if index is None:
+            return None
+        return self._faq_answers[index].get(language)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get catalog statistics"""
+        return {
+            'messages': len(self._messages),
+            'faq_questions': len(self._faq_index),
+            'faq_answers': len(self._faq_answers)
+        }
+
+
+# Global instance (loaded once per worker)
+message_catalog = MessageCatalog()
+
+
+def get_message(key: str, language: str = 'mr', default_language: str = 'mr') -> str:
+    """Convenience function to get a canned message"""
+    return message_catalog.get(key, language, default_language)
@@ -0,0 +1,151 @@
+"""
+Query normalization for Marathi/English text
+
+Produces one canonical form of a query so that caches, the agriculture
+classifier and FAQ/retrieval lookups agree on what "the same question" is:
+
+    NFC -> drop zero-width chars -> fold nukta forms -> fold digits
+        -> fold punctuation -> casefold -> collapse whitespace
+        -> (optional) strip common Marathi suffixes
+
+All character-level folds are done by one precomputed str.translate table.
+
+Benchmark:
+    python -m app.normalizer --bench
+"""
+
+import argparse
+import hashlib
+import sys
+import timeit
+import unicodedata
+from typing import Dict, Optional
+
+from app.config import Config
+
+# Zero-width and invisible formatting characters (ZWSP, ZWNJ, ZWJ, WJ, BOM, soft hyphen)
+_INVISIBLE = '​‌‍⁠﻿­'
+
+# Devanagari nukta and the precomposed nukta letters that survive NFC
+_NUKTA = '़'
+_NUKTA_LETTERS = {'ऩ': 'न', 'ऱ': 'र', 'ऴ': 'ळ'}
+
+# Common Marathi case/postposition suffixes, longest first
+_MARATHI_SUFFIXES = (
+    'ांच्या', 'ाच्या', 'ांमध्ये', 'ामध्ये', 'मध्ये', 'ांना', 'ांनी', 'ातील',
+    'च्या', 'ाला', 'ाने', 'ाचा', 'ाची', 'ाचे', 'ात', 'चा', 'ची', 'चे', 'ला', 'ना', 'ने',
+)
+_MIN_STEM_LENGTH = 2
+
+
+def _build_fold_table() -> Dict[int, Optional[str]]:
+    """Build the single translate table used for all character folds"""
+    table: Dict[int, Optional[str]] = {}
+
+    # Punctuation and symbols (ASCII, Latin-1, general punctuation, Devanagari danda, fullwidth)
+    for codepoint in list(range(0x3000)) + list(range(0xFF00, 0xFFF0)):
+        category = unicodedata.category(chr(codepoint))
+        if category[0] in ('P', 'S'):
+            table[codepoint] = ' '
+
+    # Unicode digits (Devanagari ०-९ and friends) to ASCII
+    for codepoint in range(0x3000):
+        char = chr(codepoint)
+        if unicodedata.category(char) == 'Nd' and not char.isascii():
+            table[codepoint] = str(unicodedata.digit(char))
+
+    for char in _INVISIBLE + _NUKTA:
+        table[ord(char)] = None
+    for char, folded in _NUKTA_LETTERS.items():
+        table[ord(char)] = folded
+
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+_INVISIBLE_TABLE = dict.fromkeys(map(ord, _INVISIBLE), None)
+
+
+def _stem_token(token: str) -> str:
+    """Strip one common Marathi suffix from a Devanagari token"""
+    if not ('ऀ' <= token[0] <= 'ॿ'):
+        return token
+    for suffix in _MARATHI_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def normalize_text(text: str, stem: bool = None) -> str:
+    """Normalize text to its canonical form for matching and cache keys"""
+    if not text:
+        return ""
+
+    if stem is None:
+        stem = Config.QUERY_STEMMING
+
+    text = unicodedata.normalize('NFC', text)
+    text = text.translate(_FOLD_TABLE).casefold()
+    tokens = text.split()
+
+    if stem:
+        tokens = [_stem_token(token) for token in tokens]
+
+    return ' '.join(tokens)
+
+
+def clean_display_text(text: str) -> str:
+    """Light cleanup that keeps text readable: NFC, no invisible chars, single spaces"""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(text.translate(_INVISIBLE_TABLE).split())
+
+
+def lookup_prefix(token: str, index: Dict[str, str], min_length: int = 3) -> Optional[str]:
+    """Match a token, or its longest prefix, against an alias index (strips Marathi suffixes)"""
+    if token.isascii():
+        return index.get(token)
+    for end in range(len(token), min_length - 1, -1):
+        value = index.get(token[:end])
+        if value is not None:
+            return value
+    return None
+
+
+def canonical_key(text: str, normalized: bool = False) -> str:
+    """Stable (cross-process) key for a query, shared by caches and lookups"""
+    normalized = text if normalized else normalize_text(text)
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _benchmark(number: int = 100000):
+    samples = [
+        "उन्हाळ्यात पाणी कमी पडलं तर कांद्याच्या पिकाला कसे वाचवू?",
+        "What is today's onion price in Lasalgaon?",
+        "kanda pikala pani kiti dyave",
+        "कापसाला १० किलो खत‍ द्यावे का?",
+    ]
+    for sample in samples:
+        for name, func in (('normalize_text', normalize_text), ('canonical_key', canonical_key)):
+            seconds = timeit.timeit(lambda: func(sample), number=number)
+            print(f"{name:<15} {seconds / number * 1e6:6.2f} us  {sample[:40]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query normalization")
+    parser.add_argument('text', nargs='*', help="Text to normalize")
+    parser.add_argument('--bench', action='store_true', help="Run the micro-benchmark")
+    args = parser.parse_args()
+
+    if args.bench:
+        _benchmark()
+        return
+
+    text = ' '.join(args.text) or sys.stdin.read()
+    print(normalize_text(text))
+    print(canonical_key(text))
+
+
+if __name__ == '__main__':
+    main()
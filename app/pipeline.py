@@ -0,0 +1,62 @@
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import Config
+from app.logging_setup import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Independent stages of a single request (e.g. language detection next to the
+# local classifier) run here; post-response work runs on its own pool so a
+# slow log disk can never hold up a stage a reply is waiting on. When every
+# stage worker is busy the stage runs on the request thread instead of
+# queueing, so stage capacity grows with the number of request threads.
+_stage_executor = ThreadPoolExecutor(max_workers=Config.PIPELINE_STAGE_WORKERS, thread_name_prefix='chat-stage')
+_stage_slots = threading.BoundedSemaphore(Config.PIPELINE_STAGE_WORKERS)
+_background_executor = ThreadPoolExecutor(max_workers=Config.PIPELINE_BACKGROUND_WORKERS,
+                                          thread_name_prefix='chat-background')
+
+
+def _timed(stage: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    with stage_timer(stage):
+        return fn(*args, **kwargs)
+
+
+def _run_stage(context: contextvars.Context, stage: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    try:
+        return context.run(_timed, stage, fn, args, kwargs)
+    finally:
+        _stage_slots.release()
+
+
+def start_stage(stage: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Start a pipeline stage concurrently with the caller, or run it on the
+    caller's thread if all stage workers are busy. Callers must wait for the
+    result: the stage records its timing against the current request.
+    """
+    if not _stage_slots.acquire(blocking=False):
+        future = Future()
+        try:
+            future.set_result(_timed(stage, fn, args, kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    context = contextvars.copy_context()
+    return _stage_executor.submit(_run_stage, context, stage, fn, args, kwargs)
+
+
+def _run_background(task: str, fn: Callable[..., Any], args: tuple, kwargs: dict):
+    try:
+        fn(*args, **kwargs)
+    except Exception as e:
+        logger.error("Background task %s failed: %s", task, e)
+
+
+def run_in_background(task: str, fn: Callable[..., Any], *args, **kwargs):
+    """Fire-and-forget post-response work (logging, session bookkeeping); errors are logged, never raised"""
+    context = contextvars.copy_context()
+    _background_executor.submit(context.run, _run_background, task, fn, args, kwargs)
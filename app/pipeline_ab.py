@@ -0,0 +1,243 @@
+"""
+Pipeline mode A/B harness
+
+Replays questions from the chat logs through the answer stage in both
+pipeline modes and compares latency, upstream call count and answer length:
+
+    translate  Marathi -> English -> Gemini (English) -> Marathi
+    direct     Gemini answers in the user's language, no translation hops
+
+By default no network calls are made: Gemini and the Translate API are
+replaced at the transport boundary by stand-ins with simulated latency, and
+the mock model returns the logged answer, so answer lengths are only
+meaningful with --live.
+
+Usage:
+    python -m app.pipeline_ab --limit 200
+    python -m app.pipeline_ab --gemini-latency 1.5 --translate-latency 0.3 --json
+    python -m app.pipeline_ab --live --limit 20    # real Gemini/Translate calls
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List
+
+from app.config import Config
+from app.language_detector import language_detector
+from app.normalizer import canonical_key
+from app.utils import chat_log_files, iter_chat_logs, is_agriculture_related
+
+logger = logging.getLogger(__name__)
+
+MODES = ('translate', 'direct')
+
+
+class UpstreamRecorder:
+    """Counts upstream calls and, in mock mode, simulates their latency"""
+
+    def __init__(self, mock: bool = True, gemini_latency: float = 1.5, translate_latency: float = 0.25,
+                 seed: int = 42):
+        self.mock = mock
+        self.latencies = {'gemini': gemini_latency, 'translate': translate_latency,
+                          'translate_detect': translate_latency}
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.simulated = 0.0
+        self.mock_answer = ''
+
+    def reset(self, mock_answer: str = ''):
+        self.calls = Counter()
+        self.simulated = 0.0
+        self.mock_answer = mock_answer
+
+    def record(self, service: str):
+        self.calls[service] += 1
+        if self.mock:
+            mean = self.latencies[service]
+            self.simulated += max(0.0, self.random.gauss(mean, mean * 0.25))
+
+
+class _MockHTTPResponse:
+    status_code = 200
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+
+    def json(self) -> Dict[str, Any]:
+        return self._data
+
+
+class RecordingRequests:
+    """Stands in for the `requests` module used by the translator"""
+
+    def __init__(self, recorder: UpstreamRecorder, requests_module):
+        self.recorder = recorder
+        self.requests = requests_module
+
+    def post(self, url: str, json: Dict[str, Any] = None, **kwargs):
+        detect = '/detect' in url
+        self.recorder.record('translate_detect' if detect else 'translate')
+        if not self.recorder.mock:
+            return self.requests.post(url, json=json, **kwargs)
+
+        if detect:
+            return _MockHTTPResponse({'data': {'detections': [[{'language': 'mr', 'confidence': 0.9}]]}})
+        texts = json['q'] if isinstance(json['q'], list) else [json['q']]
+        return _MockHTTPResponse({'data': {'translations': [
+            {'translatedText': f"[{json['target']}] {text}"} for text in texts
+        ]}})
+
+
+class _MockModelResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class RecordingModel:
+    """Stands in for the Gemini model object"""
+
+    def __init__(self, recorder: UpstreamRecorder, model=None):
+        self.recorder = recorder
+        self.model = model
+
+    def generate_content(self, prompt: str, **kwargs):
+        self.recorder.record('gemini')
+        if not self.recorder.mock:
+            return self.model.generate_content(prompt, **kwargs)
+        answer = self.recorder.mock_answer or prompt[-200:]
+        if 'respond in English' in prompt and language_detector.detect(answer)[0] != 'en':
+            # Translate mode asks for English: stand in with English text of the same length
+            answer = ('Answer ' * len(answer))[:len(answer)]
+        return _MockModelResponse(answer)
+
+
+def collect_questions(log_files: Iterable[str], limit: int, language: str = None) -> List[Dict[str, str]]:
+    """Distinct agriculture questions (first occurrence) with their logged answer and language"""
+    questions = []
+    seen = set()
+
+    for log_file in log_files:
+        for entry in iter_chat_logs(log_file):
+            question = entry.get('user_input', '')
+            answer = entry.get('bot_response', '')
+            entry_language = entry.get('language', 'mr')
+            if not question or answer.startswith('ERROR:') or not is_agriculture_related(question):
+                continue
+            if language and entry_language != language:
+                continue
+
+            key = canonical_key(question)
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append({'question': question, 'answer': answer, 'language': entry_language})
+            if len(questions) >= limit:
+                return questions
+
+    return questions
+
+
+def _summarize(latencies: List[float], calls: Counter, answer_lengths: List[int]) -> Dict[str, Any]:
+    count = len(latencies)
+    ordered = sorted(latencies)
+    return {
+        'questions': count,
+        'latency_ms': {
+            'mean': round(statistics.mean(ordered) * 1000, 1),
+            'p50': round(ordered[count // 2] * 1000, 1),
+            'p95': round(ordered[min(count - 1, int(count * 0.95))] * 1000, 1)
+        },
+        'upstream_calls': dict(calls),
+        'upstream_calls_per_question': round(sum(calls.values()) / count, 2),
+        'answer_chars_mean': round(statistics.mean(answer_lengths), 1)
+    }
+
+
+def run_ab(questions: List[Dict[str, str]], recorder: UpstreamRecorder) -> Dict[str, Any]:
+    """Answer every question in both modes and summarize each mode"""
+    if not recorder.mock and not Config.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is required for --live runs")
+    if recorder.mock:
+        # The mock never talks to Gemini, but the generator refuses to start without a key
+        Config.GEMINI_API_KEY = Config.GEMINI_API_KEY or 'mock'
+
+    import app.translator as translator
+    from app.answer_generator import answer_generator
+    from app.cache import translation_cache
+    from app.chatbot import chatbot
+    from app.deadline import Deadline
+
+    translator.requests = RecordingRequests(recorder, translator.requests)
+    translator.language_processor.api_key = translator.language_processor.api_key or ('mock' if recorder.mock else None)
+    answer_generator.model = RecordingModel(recorder, answer_generator.model)
+
+    results = {}
+    original_mode = Config.PIPELINE_MODE
+    try:
+        for mode in MODES:
+            Config.PIPELINE_MODE = mode
+            latencies, answer_lengths, calls = [], [], Counter()
+
+            for item in questions:
+                language = item['language'] if item['language'] in Config.SUPPORTED_LANGUAGES else 'mr'
+                # Every question pays its full upstream cost in both modes
+                translation_cache.clear()
+                recorder.reset(item['answer'])
+
+                started = time.perf_counter()
+                detected_language = translator.language_processor.detect_language(item['question'])
+                answer, _ = chatbot._generate_answer(
+                    item['question'], detected_language, language, Deadline(Config.CHAT_DEADLINE)
+                )
+                latencies.append(time.perf_counter() - started + recorder.simulated)
+                answer_lengths.append(len(answer))
+                calls.update(recorder.calls)
+
+            results[mode] = _summarize(latencies, calls, answer_lengths)
+    finally:
+        Config.PIPELINE_MODE = original_mode
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the translate and direct pipeline modes on replayed chat logs")
+    parser.add_argument('--logs', nargs='+', help="Chat log files to replay (default: all current and rotated logs)")
+    parser.add_argument('--limit', type=int, default=200, help="Number of distinct questions to replay")
+    parser.add_argument('--language', choices=Config.SUPPORTED_LANGUAGES, help="Only replay questions in this language")
+    parser.add_argument('--live', action='store_true', help="Call the real Gemini and Translate APIs")
+    parser.add_argument('--gemini-latency', type=float, default=1.5, help="Mock Gemini latency (seconds)")
+    parser.add_argument('--translate-latency', type=float, default=0.25, help="Mock Translate API latency (seconds)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for mock latencies")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    questions = collect_questions(args.logs or chat_log_files(), args.limit, args.language)
+    if not questions:
+        print("No agriculture questions found in the chat logs")
+        return
+
+    recorder = UpstreamRecorder(not args.live, args.gemini_latency, args.translate_latency, args.seed)
+    results = run_ab(questions, recorder)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"Replayed {len(questions)} questions ({'live' if args.live else 'mock'} upstream)\n")
+    print(f"{'mode':<10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'calls/q':>8} {'answer chars':>13}")
+    for mode, summary in results.items():
+        latency = summary['latency_ms']
+        print(f"{mode:<10} {latency['mean']:>9} {latency['p50']:>9} {latency['p95']:>9} "
+              f"{summary['upstream_calls_per_question']:>8} {summary['answer_chars_mean']:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,639 @@
+"""
+Government scheme eligibility rules
+
+Scheme definitions (JSON, or YAML if PyYAML is installed) in SCHEMES_DIR are
+compiled at load time into predicate closures. A farmer profile (landholding,
+category, crop, district, age) is checked against every scheme in one pass;
+attributes the farmer has not stated make a scheme "possibly eligible"
+rather than failing it.
+
+Eligibility is a tree of conditions:
+
+    {"attribute": "land_ha", "min": 0.2, "max": 6}
+    {"attribute": "category", "in": ["sc", "neo_buddhist"]}
+    {"all": [...]}, {"any": [...]}, {"not": {...}}
+
+Chat questions that name a scheme, or state the farmer's details, are
+answered locally; other scheme questions get a compact scheme list as
+Gemini context. Extension officers can evaluate profile files in bulk.
+
+Usage:
+    python -m app.schemes check
+    python -m app.schemes query "मला 2 एकर जमीन आहे, कोणत्या योजना मिळतील?"
+    python -m app.schemes evaluate profiles.csv -o results.csv
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import Config
+from app.logging_setup import SAMPLED
+from app.market_prices import COMMODITIES
+from app.normalizer import lookup_prefix, normalize_text
+from app.utils import HECTARES_PER_ACRE, fold_numbers, parse_area_hectares
+from app.weather import Gazetteer
+
+try:
+    import yaml
+except ImportError:  # Optional - only JSON definitions are loaded
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+Predicate = Callable[[Dict[str, Any]], Optional[bool]]
+
+# Attribute -> (English label, Marathi label, English unit, Marathi unit)
+ATTRIBUTES = {
+    'land_ha': ('landholding', 'जमीन', 'ha', 'हेक्टर'),
+    'age': ('age', 'वय', 'years', 'वर्षे'),
+    'category': ('category', 'प्रवर्ग', '', ''),
+    'crop': ('crop', 'पीक', '', ''),
+    'district': ('district', 'जिल्हा', '', ''),
+}
+_NUMERIC = ('land_ha', 'age')
+
+# Social category -> (English, Marathi)
+CATEGORIES = {
+    'sc': ('SC', 'अनुसूचित जाती'),
+    'st': ('ST', 'अनुसूचित जमाती'),
+    'neo_buddhist': ('Neo-Buddhist', 'नवबौद्ध'),
+    'obc': ('OBC', 'इतर मागास वर्ग'),
+    'vjnt': ('VJ/NT', 'विमुक्त जाती/भटक्या जमाती'),
+    'sbc': ('SBC', 'विशेष मागास प्रवर्ग'),
+    'general': ('General', 'खुला प्रवर्ग'),
+}
+
+# Ways farmers state their category, matched against normalized text
+CATEGORY_ALIASES = {
+    'sc': 'sc', 'scheduled caste': 'sc', 'अनुसूचित जाती': 'sc', 'एससी': 'sc',
+    'st': 'st', 'scheduled tribe': 'st', 'tribal': 'st', 'अनुसूचित जमाती': 'st', 'आदिवासी': 'st', 'एसटी': 'st',
+    'neo buddhist': 'neo_buddhist', 'नवबौद्ध': 'neo_buddhist', 'बौद्ध': 'neo_buddhist',
+    'obc': 'obc', 'ओबीसी': 'obc', 'इतर मागास': 'obc',
+    'vjnt': 'vjnt', 'nt': 'vjnt', 'विमुक्त': 'vjnt', 'भटक्या': 'vjnt',
+    'sbc': 'sbc',
+    'general category': 'general', 'open category': 'general', 'खुला': 'general', 'खुल्या': 'general',
+}
+
+# Scheme nouns that mark a scheme question (matched as token prefixes).
+# 'eligible'/'पात्र' alone is not one: "which insecticide is eligible for cotton"
+SCHEME_WORDS = tuple(normalize_text(word, stem=False) for word in (
+    'scheme', 'yojana', 'subsid', 'anudan', 'loan', 'insurance',
+    'योजना', 'अनुदान', 'कर्ज', 'विमा', 'विम्या', 'सबसिडी',
+))
+
+_AGE = re.compile(r'(?:\bage\b|वय)\D{0,4}(\d{1,3})|(\d{1,3})\s*(?:years? old|वर्षांच[ाी]|वर्षाच[ाी])')
+
+
+def _all(predicates: List[Predicate]) -> Predicate:
+    def predicate(profile):
+        result = True
+        for check in predicates:
+            outcome = check(profile)
+            if outcome is False:
+                return False
+            if outcome is None:
+                result = None
+        return result
+    return predicate
+
+
+def _any(predicates: List[Predicate]) -> Predicate:
+    def predicate(profile):
+        result = False
+        for check in predicates:
+            outcome = check(profile)
+            if outcome:
+                return True
+            if outcome is None:
+                result = None
+        return result
+    return predicate
+
+
+def _not(inner: Predicate) -> Predicate:
+    def predicate(profile):
+        outcome = inner(profile)
+        return None if outcome is None else not outcome
+    return predicate
+
+
+def _canonical_value(attribute: str, value: Any) -> Any:
+    """Form a condition value is compared in: floats, or normalized text ('neo_buddhist', 'nashik')"""
+    if attribute in _NUMERIC:
+        return float(value)
+    value = normalize_text(str(value), stem=False)
+    return value.replace(' ', '_') if attribute == 'category' else value
+
+
+def _compile_leaf(node: Dict[str, Any]) -> Tuple[Predicate, Set[str]]:
+    attribute = node['attribute']
+    if attribute not in ATTRIBUTES:
+        raise ValueError(f"Unknown attribute {attribute!r}")
+    unknown = set(node) - {'attribute', 'min', 'max', 'in', 'not_in', 'equals'}
+    if unknown:
+        raise ValueError(f"Unknown condition {sorted(unknown)} on {attribute!r}")
+
+    checks = []
+    if 'min' in node:
+        minimum = float(node['min'])
+        checks.append(lambda value: value >= minimum)
+    if 'max' in node:
+        maximum = float(node['max'])
+        checks.append(lambda value: value <= maximum)
+    if 'in' in node:
+        allowed = frozenset(_canonical_value(attribute, value) for value in node['in'])
+        checks.append(lambda value: value in allowed)
+    if 'not_in' in node:
+        excluded = frozenset(_canonical_value(attribute, value) for value in node['not_in'])
+        checks.append(lambda value: value not in excluded)
+    if 'equals' in node:
+        expected = _canonical_value(attribute, node['equals'])
+        checks.append(lambda value: value == expected)
+
+    def predicate(profile):
+        value = profile.get(attribute)
+        if value is None:
+            return None  # Not stated - cannot decide
+        return all(check(value) for check in checks)
+    return predicate, {attribute}
+
+
+def compile_criteria(node: Dict[str, Any]) -> Tuple[Predicate, Set[str]]:
+    """Compile an eligibility tree into (predicate, attributes it reads)"""
+    if not node:
+        return (lambda profile: True), set()
+    if 'attribute' in node:
+        return _compile_leaf(node)
+    if len(node) != 1:
+        raise ValueError(f"Expected one of all/any/not, got {sorted(node)}")
+
+    operator, operand = next(iter(node.items()))
+    if operator == 'not':
+        inner, attributes = compile_criteria(operand)
+        return _not(inner), attributes
+    if operator in ('all', 'any'):
+        compiled = [compile_criteria(child) for child in operand]
+        attributes = set().union(*(child_attributes for _, child_attributes in compiled))
+        predicates = [predicate for predicate, _ in compiled]
+        return (_all if operator == 'all' else _any)(predicates), attributes
+    raise ValueError(f"Unknown operator {operator!r}")
+
+
+def _value_label(attribute: str, value: Any, language: str) -> str:
+    index = 1 if language == 'mr' else 0
+    if attribute == 'category':
+        return CATEGORIES.get(value, (value, value))[index]
+    if attribute == 'crop' and value in COMMODITIES:
+        return COMMODITIES[value][index]
+    if attribute in _NUMERIC:
+        return f"{value:g}"
+    return str(value).title() if language != 'mr' else str(value)
+
+
+def describe_criteria(node: Dict[str, Any], language: str) -> str:
+    """Human-readable eligibility conditions"""
+    marathi = language == 'mr'
+    if not node:
+        return "सर्व शेतकरी" if marathi else "all farmers"
+
+    if 'attribute' in node:
+        attribute = node['attribute']
+        label_en, label_mr, unit_en, unit_mr = ATTRIBUTES[attribute]
+        label, unit = (label_mr, unit_mr) if marathi else (label_en, unit_en)
+        unit = f" {unit}" if unit else ''
+        parts = []
+        if 'min' in node and 'max' in node:
+            parts.append(f"{label} {node['min']:g}-{node['max']:g}{unit}")
+        elif 'min' in node:
+            parts.append(f"{label} किमान {node['min']:g}{unit}" if marathi else f"{label} at least {node['min']:g}{unit}")
+        elif 'max' in node:
+            parts.append(f"{label} कमाल {node['max']:g}{unit}" if marathi else f"{label} at most {node['max']:g}{unit}")
+        for key, prefix in (('in', ''), ('not_in', 'नाही: ' if marathi else 'not ')):
+            if key in node:
+                values = '/'.join(_value_label(attribute, _canonical_value(attribute, value), language)
+                                  for value in node[key])
+                parts.append(f"{label}: {prefix}{values}")
+        if 'equals' in node:
+            parts.append(f"{label}: {_value_label(attribute, _canonical_value(attribute, node['equals']), language)}")
+        return ', '.join(parts)
+
+    operator, operand = next(iter(node.items()))
+    if operator == 'not':
+        return f"नाही ({describe_criteria(operand, language)})" if marathi else f"not ({describe_criteria(operand, language)})"
+    joiner = ', ' if operator == 'all' else (' किंवा ' if marathi else ' or ')
+    return joiner.join(describe_criteria(child, language) for child in operand)
+
+
+class Scheme:
+    """One compiled scheme definition"""
+
+    def __init__(self, definition: Dict[str, Any]):
+        self.id = definition['id']
+        self.name = definition['name']
+        self.benefit = definition.get('benefit', {})
+        self.conditions = definition.get('conditions', {})
+        self.apply = definition.get('apply', {})
+        self.keywords = definition.get('keywords', [])
+
+        criteria = definition.get('eligibility') or {}
+        self.predicate, self.attributes = compile_criteria(criteria)
+        self.requirements = {language: describe_criteria(criteria, language) for language in ('en', 'mr')}
+
+    def text(self, field: str, language: str) -> str:
+        values = getattr(self, field)
+        return values.get(language) or values.get('en', '')
+
+    def missing(self, profile: Dict[str, Any]) -> List[str]:
+        """Attributes this scheme needs that the profile does not state"""
+        return [attribute for attribute in ATTRIBUTES if attribute in self.attributes and attribute not in profile]
+
+
+def _read_definitions(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+        else:
+            data = yaml.safe_load(f)
+    return data.get('schemes', []) if isinstance(data, dict) else data or []
+
+
+def _match_phrases(tokens: List[str], index: Dict[str, Any], max_words: int) -> List[Any]:
+    """Values of the longest alias phrases found in the tokens (Marathi suffixes allowed)"""
+    found = []
+    for start in range(len(tokens)):
+        for size in range(min(max_words, len(tokens) - start), 0, -1):
+            value = lookup_prefix(' '.join(tokens[start:start + size]), index)
+            if value is not None:
+                found.append(value)
+                break
+    return found
+
+
+def _phrase_index(aliases: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    index = {normalize_text(alias, stem=False): value for alias, value in aliases.items()}
+    return index, max((key.count(' ') + 1 for key in index), default=1)
+
+
+class SchemeEngine:
+    """Compiled scheme rules, profile extraction and eligibility answers"""
+
+    def __init__(self, schemes_dir: str):
+        self.schemes_dir = schemes_dir
+        self._category_index, self._category_words = _phrase_index(CATEGORY_ALIASES)
+        self._crop_index = {
+            normalize_text(alias, stem=False): key
+            for key, (_, _, aliases) in COMMODITIES.items()
+            for alias in aliases
+        }
+        # (schemes, keyword index, longest keyword in words), replaced as a whole on reload
+        self._snapshot: Tuple[List[Scheme], Dict[str, List[Scheme]], int] = ([], {}, 1)
+        self._signature = None
+        self._gazetteer: Optional[Gazetteer] = None
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def refresh(self, force: bool = False):
+        """Recompile the definitions if a file changed (checked every SCHEME_RELOAD_SECONDS)"""
+        if not force and self._checked_at and time.monotonic() - self._checked_at < Config.SCHEME_RELOAD_SECONDS:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # Another request is reloading; use the current rules
+        try:
+            self._checked_at = time.monotonic()
+            extensions = ('.json',) + (('.yaml', '.yml') if yaml is not None else ())
+            try:
+                paths = sorted(os.path.join(self.schemes_dir, name) for name in os.listdir(self.schemes_dir)
+                               if name.endswith(extensions))
+                signature = tuple((path, os.path.getmtime(path)) for path in paths)
+            except OSError as e:
+                logger.warning("Scheme definitions unavailable: %s", e)
+                return
+            if signature == self._signature and not force:
+                return
+
+            schemes: Dict[str, Scheme] = {}
+            for path in paths:
+                try:
+                    definitions = _read_definitions(path)
+                except (OSError, ValueError) as e:
+                    logger.warning("Skipping scheme file %s: %s", path, e)
+                    continue
+                for definition in definitions:
+                    try:
+                        scheme = Scheme(definition)
+                    except (KeyError, TypeError, ValueError) as e:
+                        logger.warning("Skipping scheme %s in %s: %s", definition.get('id'), path, e)
+                        continue
+                    schemes[scheme.id] = scheme  # Later files override earlier ones
+
+            keywords: Dict[str, List[Scheme]] = {}
+            for scheme in schemes.values():
+                for keyword in scheme.keywords:
+                    keywords.setdefault(normalize_text(keyword, stem=False), []).append(scheme)
+            max_words = max((key.count(' ') + 1 for key in keywords), default=1)
+
+            self._snapshot = (list(schemes.values()), keywords, max_words)
+            self._signature = signature
+            logger.info("Compiled %d scheme definitions from %s", len(schemes), self.schemes_dir)
+        finally:
+            self._refresh_lock.release()
+
+    @property
+    def schemes(self) -> List[Scheme]:
+        self.refresh()
+        return self._snapshot[0]
+
+    def _places(self) -> Gazetteer:
+        if self._gazetteer is None:
+            self._gazetteer = Gazetteer(Config.WEATHER_GAZETTEER)
+        return self._gazetteer
+
+    def extract_profile(self, text: str, tokens: List[str]) -> Dict[str, Any]:
+        """Farmer attributes stated in a chat message"""
+        profile = {}
+        folded = fold_numbers(text)
+
+        land_ha = parse_area_hectares(folded, folded=True)
+        if land_ha is not None:
+            profile['land_ha'] = land_ha
+
+        age = _AGE.search(folded)
+        if age:
+            profile['age'] = float(age.group(1) or age.group(2))
+
+        categories = _match_phrases(tokens, self._category_index, self._category_words)
+        if categories:
+            profile['category'] = categories[0]
+
+        crops = [lookup_prefix(token, self._crop_index) for token in tokens]
+        crop = next((crop for crop in crops if crop), None)
+        if crop:
+            profile['crop'] = crop
+
+        gazetteer = self._places()
+        place = gazetteer.resolve(tokens)
+        if place is not None:
+            profile['district'] = normalize_text(gazetteer.districts[place], stem=False)
+        return profile
+
+    def parse_profile(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Canonical profile from a bulk record (land_ha or land_acres, category, crop, district, age)"""
+        profile = {}
+        values = {key.strip().lower(): value for key, value in raw.items() if key}
+
+        def present(key):
+            value = values.get(key)
+            return value is not None and str(value).strip() != ''
+
+        if present('land_ha'):
+            profile['land_ha'] = float(values['land_ha'])
+        elif present('land_acres'):
+            profile['land_ha'] = round(float(values['land_acres']) * HECTARES_PER_ACRE, 2)
+        if present('age'):
+            profile['age'] = float(values['age'])
+        if present('category'):
+            category = normalize_text(str(values['category']), stem=False)
+            profile['category'] = self._category_index.get(category, category.replace(' ', '_'))
+        if present('crop'):
+            crop = normalize_text(str(values['crop']), stem=False)
+            profile['crop'] = self._crop_index.get(crop, crop)
+        if present('district'):
+            district = normalize_text(str(values['district']), stem=False)
+            gazetteer = self._places()
+            place = gazetteer.index.get(district)
+            profile['district'] = normalize_text(gazetteer.districts[place], stem=False) if place is not None else district
+        return profile
+
+    def evaluate(self, profile: Dict[str, Any], schemes: List[Scheme] = None) -> List[Tuple[Scheme, Optional[bool]]]:
+        """Check a profile against every scheme in one pass: True, False or None (not enough information)"""
+        return [(scheme, scheme.predicate(profile)) for scheme in (schemes if schemes is not None else self.schemes)]
+
+    def evaluate_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Eligible and possibly eligible scheme IDs for each bulk record"""
+        schemes = self.schemes
+        results = []
+        for index, record in enumerate(records):
+            result = {'index': index, 'id': record.get('id')}
+            try:
+                profile = self.parse_profile(record)
+            except (TypeError, ValueError) as e:
+                result['error'] = f"Invalid profile: {e}"
+                results.append(result)
+                continue
+            result['eligible'] = []
+            result['possible'] = []
+            for scheme in schemes:
+                outcome = scheme.predicate(profile)
+                if outcome:
+                    result['eligible'].append(scheme.id)
+                elif outcome is None:
+                    result['possible'].append(scheme.id)
+            results.append(result)
+        return results
+
+    def _named_schemes(self, tokens: List[str]) -> List[Scheme]:
+        _, keywords, max_words = self._snapshot
+        named = []
+        for matches in _match_phrases(tokens, keywords, max_words):
+            named.extend(scheme for scheme in matches if scheme not in named)
+        return named
+
+    def is_scheme_question(self, normalized_text: str) -> bool:
+        """Whether a question names a scheme or uses a scheme noun"""
+        self.refresh()
+        tokens = normalized_text.split()
+        return any(token.startswith(SCHEME_WORDS) for token in tokens) or bool(self._named_schemes(tokens))
+
+    def _parse_question(self, text: str, normalized_text: str):
+        tokens = normalized_text.split()
+        named = self._named_schemes(tokens)
+        if not named and not any(token.startswith(SCHEME_WORDS) for token in tokens):
+            return None
+        return named, self.extract_profile(text, tokens)
+
+    def answer(self, text: str, normalized_text: str, language: str) -> Optional[str]:
+        """Answer a scheme question locally when it names a scheme or states the farmer's details"""
+        # Suffix matching needs unstemmed tokens
+        if Config.QUERY_STEMMING:
+            normalized_text = normalize_text(text, stem=False)
+
+        self.refresh()
+        parsed = self._parse_question(text, normalized_text)
+        if parsed is None:
+            return None
+        named, profile = parsed
+
+        if named:
+            logger.info("Answered scheme question locally: %s", [scheme.id for scheme in named], extra=SAMPLED)
+            return format_scheme_answer(self.evaluate(profile, named[:3]), profile, language)
+        # A crop mention alone is not a farmer profile ("crop insurance for cotton")
+        if any(attribute != 'crop' for attribute in profile):
+            logger.info("Answered scheme eligibility locally for %s", sorted(profile), extra=SAMPLED)
+            return format_eligibility_answer(self.evaluate(profile), profile, language)
+        return None
+
+    def context(self, query: str, language: str) -> Optional[str]:
+        """Context provider for GeminiAnswerGenerator: the scheme list, for general scheme questions"""
+        self.refresh()
+        tokens = normalize_text(query, stem=False).split()
+        if not any(token.startswith(SCHEME_WORDS) for token in tokens):
+            return None
+        schemes = self._snapshot[0]
+        if not schemes:
+            return None
+
+        marathi = language == 'mr'
+        lines = ["महाराष्ट्रातील शेतकऱ्यांसाठी प्रमुख योजना:" if marathi else "Main schemes for farmers in Maharashtra:"]
+        for scheme in schemes:
+            who = "पात्रता" if marathi else "who"
+            lines.append(f"- {scheme.text('name', language)}: {scheme.text('benefit', language)} "
+                         f"({who}: {scheme.requirements[language]})")
+        lines.append("उत्तर देताना फक्त या योजनांची माहिती वापरा." if marathi
+                     else "Use only these schemes when answering.")
+        return '\n'.join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        schemes = self.schemes
+        return {'schemes': len(schemes), 'yaml': yaml is not None}
+
+
+def _describe_profile(profile: Dict[str, Any], language: str) -> str:
+    parts = []
+    for attribute, (label_en, label_mr, unit_en, unit_mr) in ATTRIBUTES.items():
+        if attribute in profile:
+            label, unit = (label_mr, unit_mr) if language == 'mr' else (label_en, unit_en)
+            value = _value_label(attribute, profile[attribute], language)
+            parts.append(f"{label} {value}{' ' + unit if unit else ''}")
+    return ', '.join(parts)
+
+
+def _missing_labels(scheme: Scheme, profile: Dict[str, Any], language: str) -> str:
+    index = 1 if language == 'mr' else 0
+    return ', '.join(ATTRIBUTES[attribute][index] for attribute in scheme.missing(profile))
+
+
+def _footer(language: str) -> str:
+    if language == 'mr':
+        return "नियम वेळोवेळी बदलतात; अर्ज करण्यापूर्वी कृषी सहाय्यक किंवा महाडीबीटी पोर्टलवर खात्री करा."
+    return "Rules change from time to time; confirm with your Krishi Sahayak or on the MahaDBT portal before applying."
+
+
+def format_scheme_answer(results: List[Tuple[Scheme, Optional[bool]]], profile: Dict[str, Any], language: str) -> str:
+    """Details and eligibility for the schemes a question named"""
+    marathi = language == 'mr'
+    sections = []
+    for scheme, outcome in results:
+        if outcome:
+            verdict = ("✓ तुम्ही दिलेल्या माहितीनुसार तुम्ही पात्र दिसता." if marathi
+                       else "✓ From what you have told me, you appear eligible.")
+        elif outcome is False:
+            verdict = ("✗ तुम्ही दिलेल्या माहितीनुसार तुम्ही पात्र दिसत नाही." if marathi
+                       else "✗ From what you have told me, you do not appear eligible.")
+        else:
+            missing = _missing_labels(scheme, profile, language)
+            verdict = (f"? पात्रता तपासण्यासाठी तुमची माहिती सांगा: {missing}." if marathi
+                       else f"? To check your eligibility, tell me your {missing}.")
+
+        requirements = scheme.requirements[language]
+        conditions = scheme.text('conditions', language)
+        sections.append('\n'.join([
+            scheme.text('name', language),
+            f"{'लाभ' if marathi else 'Benefit'}: {scheme.text('benefit', language)}",
+            f"{'पात्रता' if marathi else 'Who can apply'}: {requirements}. {conditions}".strip(),
+            verdict,
+            f"{'अर्ज' if marathi else 'How to apply'}: {scheme.text('apply', language)}",
+        ]))
+    sections.append(_footer(language))
+    return '\n\n'.join(sections)
+
+
+def format_eligibility_answer(results: List[Tuple[Scheme, Optional[bool]]], profile: Dict[str, Any], language: str) -> str:
+    """Schemes a farmer appears eligible for, from the details they stated"""
+    marathi = language == 'mr'
+    eligible = [scheme for scheme, outcome in results if outcome]
+    possible = [scheme for scheme, outcome in results if outcome is None]
+
+    lines = [f"तुमच्या माहितीनुसार ({_describe_profile(profile, language)}):" if marathi
+             else f"Based on your details ({_describe_profile(profile, language)}):"]
+    if eligible:
+        lines.append("✓ पात्र योजना:" if marathi else "✓ Schemes you appear eligible for:")
+        lines.extend(f"• {scheme.text('name', language)} - {scheme.text('benefit', language)}" for scheme in eligible)
+    if possible:
+        lines.append("? अधिक माहिती लागेल:" if marathi else "? Need more details:")
+        lines.extend(f"• {scheme.text('name', language)} ({_missing_labels(scheme, profile, language)})"
+                     for scheme in possible)
+    if not eligible and not possible:
+        lines.append("माझ्याकडील योजनांपैकी कोणतीही योजना जुळत नाही." if marathi
+                     else "None of the schemes I know of match these details.")
+    lines.append("")
+    lines.append(_footer(language))
+    return '\n'.join(lines)
+
+
+def results_to_csv(results: List[Dict[str, Any]]) -> str:
+    """Bulk results as CSV: index, id, eligible, possible (scheme IDs separated by ';'), error"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['index', 'id', 'eligible', 'possible', 'error'])
+    for result in results:
+        writer.writerow([
+            result['index'], result.get('id') or '',
+            ';'.join(result.get('eligible', [])), ';'.join(result.get('possible', [])),
+            result.get('error', '')
+        ])
+    return output.getvalue()
+
+
+# Global instance
+scheme_engine = SchemeEngine(Config.SCHEMES_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Government scheme eligibility rules")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('check', help="Compile the scheme definitions and list them")
+    query_parser = subparsers.add_parser('query', help="Answer a scheme question")
+    query_parser.add_argument('question')
+    query_parser.add_argument('--language', default='mr', choices=Config.SUPPORTED_LANGUAGES)
+    evaluate_parser = subparsers.add_parser('evaluate', help="Evaluate a CSV of farmer profiles")
+    evaluate_parser.add_argument('file')
+    evaluate_parser.add_argument('-o', '--output', help="Write results CSV here (default: stdout)")
+    args = parser.parse_args()
+
+    scheme_engine.refresh(force=True)
+    if args.command == 'check':
+        for scheme in scheme_engine.schemes:
+            print(f"{scheme.id:<24} {scheme.requirements['en']}")
+        print(f"\n{len(scheme_engine.schemes)} schemes compiled from {Config.SCHEMES_DIR}")
+    elif args.command == 'query':
+        started = time.perf_counter()
+        answer = scheme_engine.answer(args.question, normalize_text(args.question, stem=False), args.language)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(answer or scheme_engine.context(args.question, args.language) or "Not a scheme question")
+        print(f"({elapsed:.2f} ms)")
+    else:
+        with open(args.file, 'r', encoding='utf-8-sig', newline='') as f:
+            records = list(csv.DictReader(f))
+        started = time.perf_counter()
+        results = scheme_engine.evaluate_batch(records)
+        elapsed = time.perf_counter() - started
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                f.write(results_to_csv(results))
+        else:
+            print(results_to_csv(results), end='')
+        print(f"Evaluated {len(results)} profiles against {len(scheme_engine.schemes)} schemes "
+              f"in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
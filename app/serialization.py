@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+from app.config import Config
+
+try:
+    import orjson
+except ImportError:  # Optional speedup - fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional - gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON (Marathi stays as UTF-8 instead of \\u escapes)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. non-string dict keys - let the stdlib handle it
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider used by jsonify: orjson when available, compact output"""
+
+    ensure_ascii = False
+    compact = True
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def etag_for(data: bytes) -> str:
+    """Strong ETag for a response body"""
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def compress_response(response: Response, accept_encodings) -> Response:
+    """Compress a response body with brotli or gzip when the client accepts it"""
+    if (response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or not 200 <= response.status_code < 300):
+        return response
+
+    data = response.get_data()
+    if len(data) < Config.COMPRESSION_MIN_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # The encoded bytes differ from the identity body the ETag was computed for
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+    logger.debug("Compressed %s response %d -> %d bytes", encoding, len(data), len(compressed))
+    return response
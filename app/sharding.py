@@ -0,0 +1,286 @@
+"""
+Session-affinity sharding across nodes
+
+Session state (AgriChatbot.session_data) lives in one node's memory. With
+several nodes, every session_id is owned by one node, chosen by consistent
+hashing (CLUSTER_VNODES virtual points per node), and session-scoped
+requests that land elsewhere are forwarded to the owner over HTTP:
+
+- The session ID is read from the JSON body, the query string or the Flask
+  session cookie. Requests without one are served locally, and new session
+  IDs are minted so that they hash to the node that creates them.
+- Forwarded requests carry X-Cluster-Forwarded and are always served where
+  they arrive, so nodes with different membership views cannot loop.
+- If the owner is unreachable, the request is served locally and the node
+  is skipped for CLUSTER_RETRY_SECONDS. Sessions are written through to the
+  shared cache, so the fallback node still sees the session only when that
+  cache spans nodes (CACHE_BACKEND=redis); CACHE_BACKEND=shm is shared by
+  the workers of one host only.
+- Membership lives in CLUSTER_NODES_FILE, which every worker process of a
+  node watches (CLUSTER_NODES is the initial value). PUT /api/cluster/nodes
+  rewrites the file (or deploy tooling does); each worker applies the new
+  ring within CLUSTER_RELOAD_SECONDS and pushes only the sessions whose owner
+  changed to their new owners.
+
+Try it with several local processes:
+
+    CLUSTER_NODES=http://127.0.0.1:5001,http://127.0.0.1:5002,http://127.0.0.1:5003 \\
+    CLUSTER_SELF=http://127.0.0.1:5001 PORT=5001 python run_new.py
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Any, List, Optional
+
+import requests
+from flask import Response, jsonify, session
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADER = 'X-Cluster-Forwarded'
+SECRET_HEADER = 'X-Cluster-Secret'
+
+# Session-scoped routes that must be served by the session's owner
+SESSION_ROUTES = ('/api/chat', '/api/session/info', '/api/session/history')
+
+# Not copied between client, forwarding node and owner
+_HOP_HEADERS = {'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding',
+                'accept-encoding', 'content-encoding', 'upgrade', 'te', 'trailer'}
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        self.nodes = sorted(set(nodes))
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node owning a key (the first virtual point clockwise from its hash)"""
+        if not self._points:
+            return None
+        index = bisect.bisect_right(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class SessionRouter:
+    """Routes session-scoped requests to the owning node"""
+
+    def __init__(self, nodes: List[str] = None, self_url: str = None, vnodes: int = None,
+                 secret: str = None, nodes_file: str = None):
+        self.self_url = (self_url if self_url is not None else Config.CLUSTER_SELF).rstrip('/')
+        self.vnodes = vnodes or Config.CLUSTER_VNODES
+        self.secret = secret if secret is not None else Config.CLUSTER_SECRET
+        self.nodes_file = nodes_file if nodes_file is not None else Config.CLUSTER_NODES_FILE
+        self._http = requests.Session()
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._nodes_mtime: Optional[float] = None
+        self._watcher = None
+        # Called after this worker applies a membership change (e.g. to move sessions)
+        self.on_change: Optional[Callable[[], None]] = None
+        self.forwarded = 0
+        self.fallbacks = 0
+        self.moved = 0
+        self.set_nodes(Config.CLUSTER_NODES if nodes is None else nodes)
+        self.reload()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.ring.nodes) > 1 and self.self_url in self.ring.nodes
+
+    def set_nodes(self, nodes: List[str]):
+        """Replace the membership (the ring is swapped as a whole)"""
+        self.ring = HashRing([node.rstrip('/') for node in nodes], self.vnodes)
+        logger.info("Cluster membership: %s (self %s)", self.ring.nodes, self.self_url or 'unset')
+
+    def publish_nodes(self, nodes: List[str]):
+        """Write the membership file watched by every worker of this node, and apply it here"""
+        os.makedirs(os.path.dirname(self.nodes_file) or '.', exist_ok=True)
+        tmp_file = f"{self.nodes_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'nodes': [node.rstrip('/') for node in nodes]}, f, indent=2)
+        os.replace(tmp_file, self.nodes_file)
+        self.reload()
+
+    def reload(self) -> bool:
+        """Apply the membership file if it changed; returns True if the ring changed"""
+        try:
+            mtime = os.path.getmtime(self.nodes_file)
+        except OSError:
+            return False
+        with self._reload_lock:
+            if mtime == self._nodes_mtime:
+                return False
+            self._nodes_mtime = mtime  # A bad file is reported once, not on every check
+            try:
+                with open(self.nodes_file, 'r', encoding='utf-8') as f:
+                    nodes = json.load(f)['nodes']
+                if not isinstance(nodes, list) or not all(isinstance(node, str) and node for node in nodes):
+                    raise ValueError("nodes must be a list of node base URLs")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error("Ignoring cluster membership file %s: %s", self.nodes_file, e)
+                return False
+            if sorted({node.rstrip('/') for node in nodes}) == self.ring.nodes:
+                return False
+            self.set_nodes(nodes)
+
+        if self.on_change:
+            self.on_change()
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(Config.CLUSTER_RELOAD_SECONDS)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error("Cluster membership reload failed: %s", e)
+
+    def watch(self):
+        """Start following the membership file in the background (idempotent)"""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='cluster-membership', daemon=True)
+            self._watcher.start()
+
+    def owner(self, session_id: str) -> str:
+        return self.ring.owner(session_id) if self.enabled else self.self_url
+
+    def is_local(self, session_id: str) -> bool:
+        return not self.enabled or self.ring.owner(session_id) == self.self_url
+
+    def new_session_id(self) -> str:
+        """A new session ID owned by this node (about N tries for N nodes)"""
+        while True:
+            session_id = str(uuid.uuid4())
+            if self.is_local(session_id):
+                return session_id
+
+    def authorized(self, headers) -> bool:
+        """Internal cluster calls must carry the shared secret"""
+        return bool(self.secret) and headers.get(SECRET_HEADER) == self.secret
+
+    @staticmethod
+    def session_key(request) -> Optional[str]:
+        """Session ID of a request: JSON body, query string or session cookie"""
+        data = request.get_json(silent=True) if request.is_json else None
+        session_id = (data.get('session_id') if isinstance(data, dict) else None) or request.args.get('session_id')
+        if not session_id:
+            session_id = session.get('session_id')
+        return str(session_id) if session_id else None
+
+    def _available(self, node: str) -> bool:
+        with self._lock:
+            return self._down_until.get(node, 0.0) <= time.monotonic()
+
+    def _mark_down(self, node: str):
+        with self._lock:
+            self._down_until[node] = time.monotonic() + Config.CLUSTER_RETRY_SECONDS
+
+    def forward(self, request) -> Optional[Response]:
+        """
+        Forward a session-scoped request to its owner.
+        Returns the owner's response, or None to serve the request locally.
+        """
+        if not self.enabled or request.method == 'OPTIONS' or request.path not in SESSION_ROUTES:
+            return None
+        if request.headers.get(FORWARDED_HEADER):
+            return None  # Already forwarded once; never forward again
+
+        session_id = self.session_key(request)
+        if not session_id:
+            return None
+        owner = self.ring.owner(session_id)
+        if owner == self.self_url or not self._available(owner):
+            if owner != self.self_url:
+                self.fallbacks += 1
+            return None
+
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in _HOP_HEADERS}
+        headers[FORWARDED_HEADER] = self.self_url
+        try:
+            upstream = self._http.request(
+                request.method,
+                owner + request.full_path.rstrip('?'),
+                headers=headers,
+                data=request.get_data(),
+                timeout=(Config.CLUSTER_CONNECT_TIMEOUT, Config.CHAT_DEADLINE + 5),
+                allow_redirects=False
+            )
+        except requests.ConnectionError as e:
+            # Owner down: serve here (sessions fall back to the shared store)
+            logger.warning("Cluster node %s unreachable (%s); serving session %s locally", owner, e, session_id)
+            self._mark_down(owner)
+            self.fallbacks += 1
+            return None
+        except requests.RequestException as e:
+            logger.error("Forwarding to %s failed: %s", owner, e)
+            response = jsonify({'error': 'Session owner node did not respond', 'status': 'error'})
+            response.status_code = 504
+            return response
+
+        self.forwarded += 1
+        response_headers = [(name, value) for name, value in upstream.headers.items()
+                            if name.lower() not in _HOP_HEADERS]
+        return Response(upstream.content, upstream.status_code, response_headers)
+
+    def plan_moves(self, session_ids: List[str]) -> Dict[str, List[str]]:
+        """Local sessions that belong to another node under the current ring, by new owner"""
+        moves: Dict[str, List[str]] = {}
+        if not self.enabled:
+            return moves
+        for session_id in session_ids:
+            owner = self.ring.owner(session_id)
+            if owner != self.self_url:
+                moves.setdefault(owner, []).append(session_id)
+        return moves
+
+    def send_sessions(self, node: str, sessions: Dict[str, Dict[str, Any]]) -> bool:
+        """Hand sessions over to their new owner"""
+        try:
+            response = self._http.post(
+                f"{node}/api/cluster/sessions",
+                json={'sessions': sessions},
+                headers={SECRET_HEADER: self.secret, FORWARDED_HEADER: self.self_url},
+                timeout=(Config.CLUSTER_CONNECT_TIMEOUT, 30)
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error("Moving %d sessions to %s failed: %s", len(sessions), node, e)
+            return False
+        self.moved += len(sessions)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            down = [node for node, until in self._down_until.items() if until > now]
+        return {
+            'enabled': self.enabled,
+            'self': self.self_url,
+            'nodes': self.ring.nodes,
+            'unreachable': down,
+            'forwarded': self.forwarded,
+            'fallbacks': self.fallbacks,
+            'sessions_moved': self.moved
+        }
+
+
+# Global instance
+session_router = SessionRouter()
@@ -0,0 +1,507 @@
+"""
+Shared cache tier for multi-process deployments
+
+With N worker processes, per-process caches are each cold and hold the same
+entries, so hit rates drop by the worker count. These caches are shared by
+every worker on a host and have the same interface as app.cache.TTLCache:
+
+- SharedMemoryCache: a fixed-size slot table in POSIX shared memory.
+  Slots are grouped into small buckets (set-associative); a full bucket
+  evicts its least recently used entry, expired entries are reused first.
+  Each bucket is guarded by a byte-range file lock (between processes) and
+  a striped thread lock (within a process). Values are marshal-encoded
+  straight into the slot and decoded from a memoryview of it, with no
+  intermediate copies. The segment outlives worker restarts.
+- RedisCache: entries in a local Redis-compatible daemon. TTLs use PX
+  expiry; size-based LRU eviction is the daemon's `maxmemory-policy
+  allkeys-lru`. Any client with the redis-py get/set/delete/pttl/
+  scan_iter methods can be passed in (e.g. a test stand-in).
+
+get_or_compute is single-flight across processes as well as threads: the
+first caller claims the key (a pending slot / a SET NX lock, both with a
+lease of SHARED_CACHE_LEASE_SECONDS), the others wait for its value.
+
+Select with CACHE_BACKEND=shm or CACHE_BACKEND=redis (see app.cache.make_cache).
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import os
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    import fcntl
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # Optional - shared memory backend needs POSIX
+    fcntl = None
+
+try:
+    import redis
+except ImportError:  # Optional - only needed for CACHE_BACKEND=redis
+    redis = None
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Lookup outcomes
+HIT, CLAIMED, PENDING = 'hit', 'claimed', 'pending'
+
+# Slot states
+_EMPTY, _READY, _PENDING = 0, 1, 2
+
+# state, key hash, expires at (lease end while pending), last used, key length, value length
+_SLOT_HEADER = struct.Struct('<B7xQddII')
+_WAYS = 8                   # Slots per bucket
+_LOCK_STRIPES = 64          # Thread locks per cache
+_POLL_SECONDS = 0.02        # Wait between checks for another worker's result
+
+
+def _encode_key(key: Hashable) -> bytes:
+    """Deterministic key bytes (identical in every process)"""
+    if isinstance(key, str):
+        return key.encode('utf-8')
+    return json.dumps(key, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_key(data: bytes) -> Hashable:
+    text = bytes(data).decode('utf-8')
+    if not text.startswith('['):
+        return text
+    return _to_tuple(json.loads(text))
+
+
+def _to_tuple(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(_to_tuple(item) for item in value)
+    return value
+
+
+def _key_hash(key_bytes: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little')
+
+
+class SharedCache:
+    """Single-flight get_or_compute and statistics shared by the backends.
+
+    Subclasses implement get, set, delete, clear, items, _get_or_claim and
+    _release.
+    """
+
+    def __init__(self, max_size: int, ttl: float, name: str, lease: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self.lease = lease or Config.SHARED_CACHE_LEASE_SECONDS
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._flight_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Callers that waited for a computation in this or another worker
+        self.errors = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        raise NotImplementedError
+
+    def _get_or_claim(self, key: Hashable) -> Tuple[str, Any]:
+        """(HIT, value), (CLAIMED, None) if this caller must compute, or (PENDING, None)"""
+        raise NotImplementedError
+
+    def _release(self, key: Hashable):
+        """Drop this caller's claim without storing a value"""
+        raise NotImplementedError
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: float = None,
+                       cache_if: Callable[[Any], bool] = None, wait_timeout: float = None) -> Any:
+        """
+        Get a cached value or compute it once across all workers. Results
+        rejected by cache_if are returned but not stored; exceptions propagate
+        to the threads of this worker waiting on the same key. A caller
+        waiting on another's computation raises TimeoutError after
+        wait_timeout seconds.
+        """
+        wait_until = time.time() + wait_timeout if wait_timeout is not None else None
+        with self._flight_lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result(timeout=wait_timeout)
+
+        try:
+            value = self._get_or_compute_shared(key, compute, ttl, cache_if, wait_until)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._flight_lock:
+                self._in_flight.pop(key, None)
+
+    def _get_or_compute_shared(self, key: Hashable, compute: Callable[[], Any], ttl: float,
+                               cache_if: Callable[[Any], bool], wait_until: float = None) -> Any:
+        give_up_at = time.time() + self.lease
+        waited = False
+        while True:
+            outcome, value = self._get_or_claim(key)
+            if outcome == HIT:
+                return value
+            if outcome == CLAIMED or time.time() >= give_up_at:
+                break
+            if wait_until is not None and time.time() >= wait_until:
+                raise TimeoutError(f"{self.name} cache: gave up waiting for another worker's computation")
+            if not waited:
+                waited = True
+                self.shared += 1
+            time.sleep(_POLL_SECONDS)
+
+        claimed = outcome == CLAIMED
+        try:
+            value = compute()
+        except BaseException:
+            if claimed:
+                self._release(key)
+            raise
+        if value is not None and (cache_if is None or cache_if(value)):
+            self.set(key, value, ttl)
+        elif claimed:
+            self._release(key)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics (hits and misses are this worker's). There is no
+        'size': counting scans the whole slot table or keyspace, so use len().
+        """
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'backend': self.backend,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_in_flight': self.shared,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SharedMemoryCache(SharedCache):
+    """LRU/TTL cache in a shared-memory slot table, shared by all workers on the host"""
+
+    backend = 'shm'
+
+    def __init__(self, max_size: int, ttl: float, name: str, slot_bytes: int = None,
+                 prefix: str = None, lease: float = None):
+        if fcntl is None:
+            raise RuntimeError("shared memory cache needs a POSIX system")
+        super().__init__(max_size, ttl, name, lease)
+        self.slot_bytes = slot_bytes or Config.SHARED_CACHE_SLOT_BYTES
+        self.buckets = max(1, -(-max_size // _WAYS))
+        self.slots = self.buckets * _WAYS
+        self.oversize = 0
+
+        # Geometry is part of the name, so a changed configuration gets a new segment
+        segment = f"{prefix or Config.SHARED_CACHE_PREFIX}-{name}-{self.slots}x{self.slot_bytes}"
+        self._shm = self._attach(segment, self.slots * self.slot_bytes)
+        self._buffer = self._shm.buf
+        self._lock_fd = os.open(os.path.join(tempfile.gettempdir(), f"{segment}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    @staticmethod
+    def _attach(segment: str, size: int) -> 'SharedMemory':
+        for create in (True, False):
+            try:
+                try:
+                    return SharedMemory(segment, create=create, size=size, track=False)  # Python 3.13+
+                except TypeError:
+                    shm = SharedMemory(segment, create=create, size=size)
+                    # Keep the segment when a worker exits; it is shared and survives restarts
+                    resource_tracker.unregister(shm._name, 'shared_memory')
+                    return shm
+            except FileExistsError:
+                continue
+        raise RuntimeError(f"could not attach shared memory segment {segment}")
+
+    def _bucket(self, key_bytes: bytes) -> Tuple[int, int]:
+        key_hash = _key_hash(key_bytes)
+        return key_hash, key_hash % self.buckets
+
+    @contextmanager
+    def _locked(self, bucket: int):
+        """Hold a bucket against other threads (stripe lock) and other processes (byte-range lock)"""
+        with self._thread_locks[bucket % _LOCK_STRIPES]:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, bucket)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, bucket)
+
+    def _find(self, bucket: int, key_hash: int, key_bytes: bytes, now: float) -> Tuple[Optional[int], int]:
+        """(offset of the key's live slot or None, offset of the slot to write a new entry to)"""
+        buffer = self._buffer
+        free = victim = None
+        victim_rank = None
+        for slot in range(bucket * _WAYS, (bucket + 1) * _WAYS):
+            offset = slot * self.slot_bytes
+            state, slot_hash, expires_at, last_used, key_length, _ = _SLOT_HEADER.unpack_from(buffer, offset)
+            if state == _EMPTY or expires_at <= now:
+                if free is None:
+                    free = offset
+                continue
+            if slot_hash == key_hash:
+                start = offset + _SLOT_HEADER.size
+                if buffer[start:start + key_length] == key_bytes:
+                    return offset, offset
+            # Evict the least recently used ready entry; pending claims only as a last resort
+            rank = (state == _PENDING, last_used)
+            if victim_rank is None or rank < victim_rank:
+                victim, victim_rank = offset, rank
+        return None, free if free is not None else victim
+
+    def _read_value(self, offset: int) -> Any:
+        _, _, _, _, key_length, value_length = _SLOT_HEADER.unpack_from(self._buffer, offset)
+        start = offset + _SLOT_HEADER.size + key_length
+        return marshal.loads(self._buffer[start:start + value_length])
+
+    def _write(self, offset: int, state: int, key_hash: int, key_bytes: bytes, value_bytes: bytes,
+               expires_at: float, now: float):
+        start = offset + _SLOT_HEADER.size
+        self._buffer[start:start + len(key_bytes)] = key_bytes
+        start += len(key_bytes)
+        self._buffer[start:start + len(value_bytes)] = value_bytes
+        _SLOT_HEADER.pack_into(self._buffer, offset, state, key_hash, expires_at, now,
+                               len(key_bytes), len(value_bytes))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired"""
+        outcome, value = self._lookup(key, claim=False)
+        return value if outcome == HIT else None
+
+    def _get_or_claim(self, key: Hashable) -> Tuple[str, Any]:
+        return self._lookup(key, claim=True)
+
+    def _lookup(self, key: Hashable, claim: bool) -> Tuple[str, Any]:
+        key_bytes = _encode_key(key)
+        key_hash, bucket = self._bucket(key_bytes)
+        if claim and _SLOT_HEADER.size + len(key_bytes) > self.slot_bytes:
+            self.misses += 1
+            return CLAIMED, None  # Key alone does not fit; compute without sharing
+        now = time.time()
+        with self._locked(bucket):
+            found, target = self._find(bucket, key_hash, key_bytes, now)
+            if found is not None:
+                state = self._buffer[found]
+                if state == _READY:
+                    struct.pack_into('<d', self._buffer, found + 24, now)  # last used
+                    self.hits += 1
+                    return HIT, self._read_value(found)
+                if not claim:
+                    self.misses += 1
+                return PENDING, None
+            self.misses += 1
+            if claim:
+                self._write(target, _PENDING, key_hash, key_bytes, b'', now + self.lease, now)
+                return CLAIMED, None
+        return PENDING, None
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """Store a value, evicting the bucket's least recently used entry if full"""
+        key_bytes = _encode_key(key)
+        try:
+            value_bytes = marshal.dumps(value)
+        except ValueError as e:
+            self.errors += 1
+            logger.error("Cannot store %s cache value: %s", self.name, e)
+            self.delete(key)
+            return
+        if _SLOT_HEADER.size + len(key_bytes) + len(value_bytes) > self.slot_bytes:
+            self.oversize += 1
+            self.delete(key)
+            return
+
+        key_hash, bucket = self._bucket(key_bytes)
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        with self._locked(bucket):
+            _, target = self._find(bucket, key_hash, key_bytes, now)
+            self._write(target, _READY, key_hash, key_bytes, value_bytes, expires_at, now)
+
+    def delete(self, key: Hashable):
+        key_bytes = _encode_key(key)
+        key_hash, bucket = self._bucket(key_bytes)
+        with self._locked(bucket):
+            found, _ = self._find(bucket, key_hash, key_bytes, time.time())
+            if found is not None:
+                self._buffer[found] = _EMPTY
+
+    _release = delete
+
+    def clear(self):
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                for slot in range(bucket * _WAYS, (bucket + 1) * _WAYS):
+                    self._buffer[slot * self.slot_bytes] = _EMPTY
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Live entries as (key, value, remaining TTL)"""
+        entries = []
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                now = time.time()
+                for slot in range(bucket * _WAYS, (bucket + 1) * _WAYS):
+                    offset = slot * self.slot_bytes
+                    state, _, expires_at, _, key_length, _ = _SLOT_HEADER.unpack_from(self._buffer, offset)
+                    if state == _READY and expires_at > now:
+                        start = offset + _SLOT_HEADER.size
+                        key = _decode_key(self._buffer[start:start + key_length])
+                        entries.append((key, self._read_value(offset), expires_at - now))
+        return entries
+
+    def __len__(self) -> int:
+        now = time.time()
+        count = 0
+        for slot in range(self.slots):
+            state, _, expires_at, _, _, _ = _SLOT_HEADER.unpack_from(self._buffer, slot * self.slot_bytes)
+            count += state == _READY and expires_at > now
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), slot_bytes=self.slot_bytes, oversize=self.oversize)
+
+
+class RedisCache(SharedCache):
+    """TTL cache in a local Redis-compatible daemon, shared by all workers"""
+
+    backend = 'redis'
+
+    def __init__(self, max_size: int, ttl: float, name: str, client=None, prefix: str = None,
+                 lease: float = None):
+        super().__init__(max_size, ttl, name, lease)
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis package is not installed")
+            client = redis.Redis.from_url(Config.CACHE_REDIS_URL)
+            client.ping()
+        self.client = client
+        self.namespace = f"{prefix or Config.SHARED_CACHE_PREFIX}:{name}:"
+
+    def _name(self, key: Hashable) -> Tuple[str, str]:
+        key_text = _encode_key(key).decode('utf-8')
+        return self.namespace + hashlib.blake2b(key_text.encode('utf-8'), digest_size=16).hexdigest(), key_text
+
+    def _decode(self, raw: Optional[bytes], key_text: str) -> Tuple[bool, Any]:
+        if raw is None:
+            return False, None
+        stored_key, value = marshal.loads(raw)
+        return stored_key == key_text, value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if missing, expired or the daemon is unreachable"""
+        name, key_text = self._name(key)
+        try:
+            found, value = self._decode(self.client.get(name), key_text)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared %s cache get failed: %s", self.name, e)
+            found, value = False, None
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return None
+
+    def _get_or_claim(self, key: Hashable) -> Tuple[str, Any]:
+        name, _ = self._name(key)
+        value = self.get(key)
+        if value is not None:
+            return HIT, value
+        try:
+            if self.client.set(f"{name}:lock", b'1', px=int(self.lease * 1000), nx=True):
+                return CLAIMED, None
+            return PENDING, None
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared %s cache claim failed: %s", self.name, e)
+            return CLAIMED, None  # Compute locally
+
+    def _release(self, key: Hashable):
+        name, _ = self._name(key)
+        try:
+            self.client.delete(f"{name}:lock")
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared %s cache release failed: %s", self.name, e)
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        """Store a value with PX expiry (and drop any claim on the key)"""
+        name, key_text = self._name(key)
+        ttl = ttl if ttl is not None else self.ttl
+        try:
+            self.client.set(name, marshal.dumps((key_text, value)), px=max(int(ttl * 1000), 1))
+            self.client.delete(f"{name}:lock")
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared %s cache set failed: %s", self.name, e)
+
+    def delete(self, key: Hashable):
+        name, _ = self._name(key)
+        try:
+            self.client.delete(name)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared %s cache delete failed: %s", self.name, e)
+
+    def _names(self) -> List[str]:
+        names = (name if isinstance(name, str) else name.decode('utf-8')
+                 for name in self.client.scan_iter(match=f"{self.namespace}*"))
+        return [name for name in names if not name.endswith(':lock')]
+
+    def clear(self):
+        for name in self.client.scan_iter(match=f"{self.namespace}*"):
+            self.client.delete(name)
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Live entries as (key, value, remaining TTL)"""
+        entries = []
+        for name in self._names():
+            raw, ttl_ms = self.client.get(name), self.client.pttl(name)
+            if raw is None or ttl_ms is None or ttl_ms <= 0:
+                continue
+            key_text, value = marshal.loads(raw)
+            entries.append((_decode_key(key_text.encode('utf-8')), value, ttl_ms / 1000))
+        return entries
+
+    def __len__(self) -> int:
+        try:
+            return len(self._names())
+        except Exception:
+            return 0
+
+
+def create_shared_cache(backend: str, max_size: int, ttl: float, name: str) -> SharedCache:
+    """Shared cache on the given backend ('shm' or 'redis')"""
+    if backend == 'shm':
+        return SharedMemoryCache(max_size, ttl, name)
+    if backend == 'redis':
+        return RedisCache(max_size, ttl, name)
+    raise ValueError(f"Unknown cache backend {backend!r} (expected memory, shm or redis)")
@@ -0,0 +1,133 @@
+"""
+Incremental statistics for /api/stats
+
+Everything /api/stats reports is kept as running counters, updated when a
+session is created, updated or expired and when a query or request
+finishes, so a monitoring scrape costs the same with ten sessions or a
+million and never walks shared state.
+
+Windowed rates use a ring buffer of per-second buckets (one hour) plus a
+running sum per window, so both recording and reading are O(1) amortized.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Tuple
+
+WINDOWS: Tuple[Tuple[str, int], ...] = (('1m', 60), ('5m', 300), ('1h', 3600))
+_SPAN = 3600  # Seconds kept in the ring buffer (the longest window)
+
+
+class RateCounter:
+    """Event counter with totals and 1m/5m/1h windows (per-second ring buffer)"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._buckets = [0] * _SPAN
+        self._sums = [0] * len(WINDOWS)
+        self._second = int(clock())
+        self.total = 0
+
+    def _advance(self, second: int):
+        if second - self._second >= _SPAN:
+            # Idle for longer than the longest window: everything has expired
+            self._buckets = [0] * _SPAN
+            self._sums = [0] * len(WINDOWS)
+            self._second = second
+            return
+        while self._second < second:
+            self._second += 1
+            for index, (_, window) in enumerate(WINDOWS):
+                self._sums[index] -= self._buckets[(self._second - window) % _SPAN]
+            self._buckets[self._second % _SPAN] = 0
+
+    def add(self, count: int = 1):
+        self._advance(int(self._clock()))
+        self._buckets[self._second % _SPAN] += count
+        for index in range(len(self._sums)):
+            self._sums[index] += count
+        self.total += count
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._advance(int(self._clock()))
+        return {
+            'total': self.total,
+            'per_minute': {
+                name: round(self._sums[index] * 60 / window, 2) for index, (name, window) in enumerate(WINDOWS)
+            }
+        }
+
+
+class ChatStats:
+    """Running session aggregates plus per-language, per-status and per-endpoint rates"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sessions = 0
+        self.conversations = 0  # Sum of conversation_count over live sessions
+        self.session_languages: Dict[str, int] = {'mr': 0, 'en': 0}
+        self.created = RateCounter()
+        self.expired = RateCounter()
+        self.by_language: Dict[str, RateCounter] = {}
+        self.by_status: Dict[str, RateCounter] = {}
+        self.by_endpoint: Dict[str, RateCounter] = {}
+
+    def session_added(self, session: Dict[str, Any], new: bool = False):
+        with self._lock:
+            self.sessions += 1
+            self.conversations += session.get('conversation_count', 0)
+            language = session.get('preferred_language', 'mr')
+            self.session_languages[language] = self.session_languages.get(language, 0) + 1
+            if new:
+                self.created.add()
+
+    def session_removed(self, session: Dict[str, Any], expired: bool = False):
+        with self._lock:
+            self.sessions -= 1
+            self.conversations -= session.get('conversation_count', 0)
+            language = session.get('preferred_language', 'mr')
+            self.session_languages[language] = self.session_languages.get(language, 0) - 1
+            if expired:
+                self.expired.add()
+
+    def _counter(self, counters: Dict[str, RateCounter], key: str) -> RateCounter:
+        counter = counters.get(key)
+        if counter is None:
+            counter = counters[key] = RateCounter()
+        return counter
+
+    def record_query(self, language: str, status: str):
+        """A processed chat query (status: success, redirect or error)"""
+        with self._lock:
+            self._counter(self.by_language, language or 'unknown').add()
+            self._counter(self.by_status, status or 'unknown').add()
+
+    def record_request(self, endpoint: str, status_code: int):
+        """A finished HTTP request, by route and status class"""
+        with self._lock:
+            self._counter(self.by_endpoint, endpoint).add()
+            if status_code >= 500:
+                self._counter(self.by_endpoint, f"{endpoint} 5xx").add()
+
+    def sessions_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'total_sessions': self.sessions,
+                'total_conversations': self.conversations,
+                'language_distribution': dict(self.session_languages),
+                'active_sessions': self.sessions,
+                'sessions_created': self.created.snapshot(),
+                'sessions_expired': self.expired.snapshot()
+            }
+
+    def traffic_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queries_by_language': {key: counter.snapshot() for key, counter in self.by_language.items()},
+                'queries_by_status': {key: counter.snapshot() for key, counter in self.by_status.items()},
+                'requests_by_endpoint': {key: counter.snapshot() for key, counter in self.by_endpoint.items()}
+            }
+
+
+# Global instance
+chat_stats = ChatStats()
@@ -1,10 +1,13 @@
 import logging
-from typing import Tuple, Optional
-import re
+from typing import Tuple, List
 import requests
-import json
 import os
 from app.config import Config
+from app.cache import translation_cache
+from app.concurrency import Hedger
+from app.deadline import Deadline
+from app.language_detector import language_detector
+from app.logging_setup import SAMPLED
 
 logger = logging.getLogger(__name__)
 
@@ -14,132 +17,168 @@ class LanguageProcessor:
     def __init__(self):
         self.api_key = Config.GOOGLE_TRANSLATE_API_KEY or os.environ.get('GOOGLE_TRANSLATE_API_KEY')
         self.base_url = "https://translation.googleapis.com/language/translate/v2"
-        self.marathi_patterns = [
-            # Devanagari script detection
-            r'[\u0900-\u097F]',
-            # Common Marathi words
-            r'\b(आहे|आहेत|मी|तुम्ही|काय|कसे|कुठे|केव्हा|का|कोण)\b'
-        ]
     
-    def detect_language(self, text: str) -> str:
+    def detect_language(self, text: str, deadline: Deadline = None) -> str:
         """
         Enhanced language detection with fallback mechanisms
         Returns: 'mr' for Marathi, 'en' for English
         """
+        return self.detect_language_with_confidence(text, deadline)[0]
+    
+    def detect_language_with_confidence(self, text: str, deadline: Deadline = None) -> Tuple[str, float]:
+        """
+        Detect language locally, calling the Google Translate API only for
+        low-confidence results (and only if the deadline leaves time for it).
+        Returns: (language, confidence) with language 'mr' or 'en'
+        """
         if not text or not text.strip():
-            return 'mr'  # Default to Marathi
+            return 'mr', 0.0  # Default to Marathi
         
         try:
-            # First, check for Devanagari script (Marathi)
-            if any(re.search(pattern, text) for pattern in self.marathi_patterns):
-                logger.info("Detected Marathi based on script/patterns")
-                return 'mr'
+            detected_lang, confidence = language_detector.detect(text)
             
-            # If no API key, use pattern-based detection only
-            if not self.api_key:
-                logger.warning("No Google Translate API key provided, using pattern-based detection only")
-                return 'en'  # Default to English if no Devanagari detected
+            # Confident local result (or nothing better available) - skip the network
+            if (confidence >= Config.LANGUAGE_DETECTION_MIN_CONFIDENCE or not self.api_key
+                    or (deadline and not deadline.has(Config.MIN_TRANSLATE_BUDGET))):
+                logger.debug("Local detector: %s (confidence: %s)", detected_lang, confidence)
+                return self._map_language(detected_lang), confidence
             
-            # Use Google Translate API for detection
+            # Use Google Translate API for low-confidence cases
             url = f"{self.base_url}/detect?key={self.api_key}"
             payload = {
                 "q": text
             }
-            response = requests.post(url, json=payload)
+            response = requests.post(url, json=payload, timeout=self._timeout(deadline))
             
             if response.status_code == 200:
                 result = response.json()
                 detected_lang = result["data"]["detections"][0][0]["language"]
                 confidence = result["data"]["detections"][0][0]["confidence"]
                 
-                logger.info(f"Google Translate API detected language: {detected_lang} (confidence: {confidence})")
-                
-                # Map detected language to our supported languages
-                if detected_lang in ['mr', 'hi']:  # Marathi or Hindi (close languages)
-                    return 'mr'
-                else:
-                    return 'en'
+                logger.info("Google Translate API detected language: %s (confidence: %s)", detected_lang, confidence, extra=SAMPLED)
+                return self._map_language(detected_lang), confidence
             else:
-                logger.warning(f"Google Translate API detection failed: {response.status_code}")
-                return 'en'  # Default to English
+                logger.warning("Google Translate API detection failed: %s", response.status_code)
+                return self._map_language(detected_lang), confidence
                 
         except Exception as e:
-            logger.error(f"Language detection failed: {e}")
-            return 'en'  # Default to English on errors
+            logger.error("Language detection failed: %s", e)
+            return 'en', 0.0  # Default to English on errors
+    
+    @staticmethod
+    def _timeout(deadline: Deadline = None) -> float:
+        """Per-call timeout for Translate API requests"""
+        return deadline.timeout(Config.TRANSLATE_TIMEOUT) if deadline else Config.TRANSLATE_TIMEOUT
     
-    def translate_to_english(self, text: str) -> str:
+    @staticmethod
+    def _map_language(detected_lang: str) -> str:
+        """Map a detected language to our supported languages"""
+        if detected_lang in ['mr', 'hi']:  # Marathi or Hindi (close languages)
+            return 'mr'
+        return 'en'
+    
+    def translate_to_english(self, text: str, deadline: Deadline = None) -> str:
         """Translate Marathi text to English"""
         if not text or not text.strip():
             return ""
-            
-        try:
-            # No need to translate if already in English
-            if self.detect_language(text) == 'en':
-                return text
-                
-            # If no API key, return original text
-            if not self.api_key:
-                logger.warning("No Google Translate API key provided, returning original text")
-                return text
-                
-            url = f"{self.base_url}?key={self.api_key}"
-            payload = {
-                "q": text,
-                "source": "mr",
-                "target": "en",
-                "format": "text"
-            }
-            
-            response = requests.post(url, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                translated_text = result["data"]["translations"][0]["translatedText"]
-                return translated_text
-            else:
-                logger.error(f"Translation to English failed: {response.status_code}")
-                return text  # Return original text on API error
-                
-        except Exception as e:
-            logger.error(f"Translation to English failed: {e}")
-            return text  # Return original text on error
+        
+        # No need to translate if already in English
+        if self.detect_language(text, deadline) == 'en':
+            return text
+        
+        return self._translate(text, 'mr', 'en', deadline)
     
-    def translate_to_marathi(self, text: str) -> str:
+    def translate_to_marathi(self, text: str, deadline: Deadline = None) -> str:
         """Translate English text to Marathi"""
         if not text or not text.strip():
             return ""
-            
+        
+        # No need to translate if already in Marathi
+        if self.detect_language(text, deadline) == 'mr':
+            return text
+        
+        return self._translate(text, 'en', 'mr', deadline)
+    
+    def _translate(self, text: str, source: str, target: str, deadline: Deadline = None) -> str:
+        """Translate text (cached), returning the original on failure or when out of time"""
+        key = (source, target, text)
+        
+        # Out of budget: a cached translation is still fine, a network call is not
+        if deadline and not deadline.has(Config.MIN_TRANSLATE_BUDGET):
+            cached = translation_cache.get(key)
+            if cached is None:
+                logger.warning("Skipping translation to %s: deadline budget exhausted", target)
+            return cached or text
+        
+        try:
+            return translation_cache.get_or_compute(
+                key,
+                lambda: translate_hedger.call(
+                    lambda: self._translate_batch_uncached([text], source, target, deadline)[0],
+                    timeout=self._timeout(deadline)
+                ),
+                cache_if=lambda translated: translated != text
+            )
+        except TimeoutError:
+            logger.warning("Translation to %s timed out; using the original text", target)
+            return text
+    
+    def _translate_batch_uncached(self, texts: List[str], source: str, target: str,
+                                  deadline: Deadline = None) -> List[str]:
+        """Call the Google Translate API, returning the originals on failure"""
+        target_name = 'English' if target == 'en' else 'Marathi'
+        
         try:
-            # No need to translate if already in Marathi
-            if self.detect_language(text) == 'mr':
-                return text
-                
             # If no API key, return original text
             if not self.api_key:
                 logger.warning("No Google Translate API key provided, returning original text")
-                return text
+                return list(texts)
                 
             url = f"{self.base_url}?key={self.api_key}"
             payload = {
-                "q": text,
-                "source": "en",
-                "target": "mr",
+                "q": texts,
+                "source": source,
+                "target": target,
                 "format": "text"
             }
             
-            response = requests.post(url, json=payload)
+            response = requests.post(url, json=payload, timeout=self._timeout(deadline))
             
             if response.status_code == 200:
                 result = response.json()
-                translated_text = result["data"]["translations"][0]["translatedText"]
-                return translated_text
+                return [item["translatedText"] for item in result["data"]["translations"]]
             else:
-                logger.error(f"Translation to Marathi failed: {response.status_code}")
-                return text  # Return original text on API error
+                logger.error("Translation to %s failed: %s", target_name, response.status_code)
+                return list(texts)  # Return original text on API error
                 
         except Exception as e:
-            logger.error(f"Translation to Marathi failed: {e}")
-            return text  # Return original text on error
+            logger.error("Translation to %s failed: %s", target_name, e)
+            return list(texts)  # Return original text on error
+    
+    def process_query(self, text: str, deadline: Deadline = None,
+                      detected_language: str = None) -> Tuple[str, str, str]:
+        """
+        Prepare a user query for the model (pass `detected_language` if already known).
+        Returns: (english_text, detected_language, original_text)
+        """
+        detected_language = detected_language or self.detect_language(text, deadline)
+        
+        if detected_language == 'mr':
+            return self._translate(text, 'mr', 'en', deadline), detected_language, text
+        return text, detected_language, text
+    
+    def process_response(self, text: str, language: str, deadline: Deadline = None) -> str:
+        """Translate a model response (English) into the user's language"""
+        if language == 'mr':
+            return self.translate_to_marathi(text, deadline)
+        return text
+
+# Hedged duplicate calls for slow Translate API requests (translation is idempotent)
+translate_hedger = Hedger(
+    'translate',
+    enabled=Config.HEDGING_ENABLED,
+    percentile=Config.HEDGE_PERCENTILE
+)
 
 # Create a singleton instance
 language_processor = LanguageProcessor()
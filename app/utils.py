@@ -1,64 +1,75 @@
 import logging
+import gzip
+import itertools
 import json
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
+import re
+import threading
+import unicodedata
+from typing import Dict, Any, Optional, Iterator, List
+
+from app.config import Config
+from app.logging_setup import setup_logging as _setup_logging, request_timestamp
+from app.messages import get_message
+from app.normalizer import clean_display_text, normalize_text
 
 def setup_logging(log_level: str = 'INFO', log_file: str = None):
-    """Setup application logging"""
-    
-    # Create logs directory if it doesn't exist
-    if log_file:
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
-    # Configure logging format
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    
-    # Setup logging
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(),  # Console output
-            logging.FileHandler(log_file) if log_file else logging.NullHandler()
-        ]
+    """Setup application logging (queue-based, structured, rotating)"""
+    return _setup_logging(
+        log_level,
+        log_file,
+        log_format=Config.LOG_FORMAT,
+        max_bytes=Config.LOG_MAX_BYTES,
+        backup_count=Config.LOG_BACKUP_COUNT,
+        sample_rate=Config.LOG_SAMPLE_RATE
     )
-    
-    return logging.getLogger(__name__)
 
 def clean_text(text: str) -> str:
-    """Clean and normalize text input"""
-    if not text:
-        return ""
-    
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    
-    # Remove special characters that might cause issues
-    text = text.strip()
-    
-    return text
+    """Clean text input for display and logging (NFC, no invisible chars, single spaces)"""
+    return clean_display_text(text)
+
+# Keywords are normalized once so matching works on normalized queries
+AGRICULTURE_KEYWORDS = tuple(normalize_text(keyword, stem=False) for keyword in [
+    # English keywords
+    'crop', 'farm', 'agriculture', 'plant', 'seed', 'harvest', 'soil', 'fertilizer',
+    'pesticide', 'irrigation', 'weather', 'rain', 'drought', 'yield', 'market', 'price',
+    'government', 'scheme', 'subsidy', 'loan', 'insurance', 'cultivation', 'farming',
+    
+    # Marathi keywords
+    'शेती', 'पीक', 'बियाणे', 'खत', 'कीटकनाशक', 'पाणी', 'पाऊस', 'हवामान', 'बाजार', 'भाव',
+    'सरकार', 'योजना', 'अनुदान', 'कर्ज', 'विमा', 'लागवड', 'शेतकरी', 'माती', 'कापणी'
+])
 
-def is_agriculture_related(text: str) -> bool:
+def is_agriculture_related(text: str, normalized: bool = False) -> bool:
     """Check if query is agriculture-related"""
-    agriculture_keywords = [
-        # English keywords
-        'crop', 'farm', 'agriculture', 'plant', 'seed', 'harvest', 'soil', 'fertilizer',
-        'pesticide', 'irrigation', 'weather', 'rain', 'drought', 'yield', 'market', 'price',
-        'government', 'scheme', 'subsidy', 'loan', 'insurance', 'cultivation', 'farming',
-        
-        # Marathi keywords
-        'शेती', 'पीक', 'बियाणे', 'खत', 'कीटकनाशक', 'पाणी', 'पाऊस', 'हवामान', 'बाजार', 'भाव',
-        'सरकार', 'योजना', 'अनुदान', 'कर्ज', 'विमा', 'लागवड', 'शेतकरी', 'माती', 'कापणी'
-    ]
-    
-    text_lower = text.lower()
-    return any(keyword.lower() in text_lower for keyword in agriculture_keywords)
+    text_normalized = text if normalized else normalize_text(text, stem=False)
+    return any(keyword in text_normalized for keyword in AGRICULTURE_KEYWORDS)
+
+HECTARES_PER_ACRE = 0.4047
+_HECTARES_PER_UNIT = {'acre': HECTARES_PER_ACRE, 'एकर': HECTARES_PER_ACRE,
+                      'guntha': HECTARES_PER_ACRE / 40, 'गुंठ': HECTARES_PER_ACRE / 40}
+_AREA = re.compile(r'(\d+(?:\.\d+)?)\s*(acres?|एकर|hectares?|ha\b|हेक्टर|gunthas?|गुंठ[ेा])')
+_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+def fold_numbers(text: str) -> str:
+    """NFC, casefolded text with ASCII digits, keeping decimal points (for extracting numbers)"""
+    return unicodedata.normalize('NFC', text).casefold().translate(_DIGITS)
+
+def parse_area_hectares(text: str, folded: bool = False) -> Optional[float]:
+    """Land area stated in a message ('2 एकर', '1.5 ha', '20 गुंठे'), in hectares"""
+    match = _AREA.search(text if folded else fold_numbers(text))
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), match.group(2)
+    factor = next((value for prefix, value in _HECTARES_PER_UNIT.items() if unit.startswith(prefix)), 1.0)
+    return round(amount * factor, 2)
+
+_chat_log_lock = threading.Lock()
 
 def log_conversation(user_input: str, bot_response: str, language: str, session_id: str = None):
-    """Log conversation for analysis and improvement"""
+    """Log conversation for analysis and improvement (one JSON object per line)"""
     log_entry = {
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': request_timestamp(),
         'session_id': session_id,
         'user_input': user_input,
         'bot_response': bot_response,
@@ -66,31 +77,86 @@ def log_conversation(user_input: str, bot_response: str, language: str, session_
         'is_agriculture_related': is_agriculture_related(user_input)
     }
     
-    log_file = 'data/logs/chat_logs.json'
+    log_file = Config.CHAT_LOG_FILE
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
     
     try:
-        # Read existing logs
-        if os.path.exists(log_file):
-            with open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-        else:
-            logs = []
-        
-        # Add new log entry
-        logs.append(log_entry)
+        line = json.dumps(log_entry, ensure_ascii=False) + '\n'
         
-        # Keep only last 1000 entries to prevent file from growing too large
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-        
-        # Write back to file
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
+        with _chat_log_lock:
+            # Rotate instead of truncating: chat_logs.jsonl -> .1 -> .2 ...
+            if os.path.exists(log_file) and os.path.getsize(log_file) >= Config.CHAT_LOG_MAX_BYTES:
+                _rotate_chat_log(log_file, Config.CHAT_LOG_BACKUP_COUNT)
+            
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(line)
             
     except Exception as e:
         logging.error(f"Failed to log conversation: {e}")
 
+def _rotate_chat_log(log_file: str, backup_count: int):
+    """Shift rotated chat logs, dropping the oldest"""
+    for index in range(backup_count - 1, 0, -1):
+        source = f"{log_file}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{log_file}.{index + 1}")
+    os.replace(log_file, f"{log_file}.1")
+
+def chat_log_files(log_file: str = None) -> List[str]:
+    """Get existing chat log files, oldest first (legacy JSON array, rotated, current)"""
+    log_file = log_file or Config.CHAT_LOG_FILE
+    candidates = [Config.LEGACY_CHAT_LOG_FILE]
+    candidates += [f"{log_file}.{index}" for index in range(Config.CHAT_LOG_BACKUP_COUNT, 0, -1)]
+    candidates.append(log_file)
+    return [path for path in candidates if os.path.exists(path)]
+
+def iter_chat_logs(log_file: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream chat log entries in constant memory.
+    Supports JSON Lines (current format) and the legacy single JSON array,
+    optionally gzip-compressed (.gz).
+    """
+    log_file = log_file or Config.CHAT_LOG_FILE
+    if not os.path.exists(log_file):
+        return
+    
+    opener = gzip.open if log_file.endswith('.gz') else open
+    with opener(log_file, 'rt', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        
+        if first == '[':
+            yield from _iter_json_array(f)
+        elif first:
+            first_line = first + f.readline()
+            for line in itertools.chain([first_line], f):
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def _iter_json_array(f, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Incrementally decode objects from a JSON array (opening bracket already consumed)"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if buffer.startswith(']', position):
+            return
+        try:
+            entry, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            # Drop the decoded prefix only when reading on, so each entry is not re-copied
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield entry
+
 def load_knowledge_base() -> Dict[str, Any]:
     """Load agricultural knowledge base"""
     knowledge_file = 'data/farming_knowledge.json'
@@ -123,7 +189,7 @@ def create_response_template(message: str, language: str = 'mr', status: str = '
         'response': message,
         'language': language,
         'status': status,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': request_timestamp()
     }
 
 def validate_input(text: str, max_length: int = 1000) -> tuple[bool, str]:
@@ -145,16 +211,8 @@ def validate_input(text: str, max_length: int = 1000) -> tuple[bool, str]:
 
 def format_error_message(language: str = 'mr') -> str:
     """Get error message in appropriate language"""
-    error_messages = {
-        'mr': 'माफ करा, काहीतरी चूक झाली आहे. कृपया पुन्हा प्रयत्न करा.',
-        'en': 'Sorry, something went wrong. Please try again.'
-    }
-    return error_messages.get(language, error_messages['mr'])
+    return get_message('error', language)
 
 def get_welcome_message(language: str = 'mr') -> str:
     """Get welcome message in appropriate language"""
-    welcome_messages = {
-        'mr': 'नमस्कार मित्रा! मी कोती आहे. मी तुमच्या शेतीसंबंधी सर्व प्रश्नांची उत्तरे देण्यासाठी इथे आहे. पिके, हवामान, बाजारभाव, सरकारी योजना - काहीही विचारा!',
-        'en': 'Hello friend! I am Koti. I am here to answer all your agriculture-related questions. Ask me about crops, weather, market prices, government schemes - anything!'
-    }
-    return welcome_messages.get(language, welcome_messages['mr'])
\ No newline at end of file
+    return get_message('welcome', language)
@@ -0,0 +1,241 @@
+"""
+Cache warm-up
+
+After a deploy or worker restart every in-process cache is empty, so the
+first farmers would pay full Translate and Gemini latency. At worker start
+the warmer runs in the background, and /api/health reports "warming" (503)
+until it finishes:
+
+1. Local indexes (market names, weather forecasts, scheme rules) are loaded.
+2. A snapshot of the response and translation caches is loaded if present
+   (no upstream calls).
+3. The top-K historical questions (mined FAQ clusters, else the chat logs)
+   that are still missing are replayed through the pipeline at
+   WARMUP_RATE questions per second, so warm-up never bursts the quota.
+
+The snapshot is built once per deploy, before workers fork, so N workers do
+not each replay the same questions:
+
+    python -m app.warmup build --top 100
+    python -m app.warmup show
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Hashable
+
+from app.cache import response_cache, translation_cache
+from app.catalog_builder import collect_top_questions
+from app.chatbot import chatbot
+from app.concurrency import TokenBucket
+from app.config import Config
+from app.faq_miner import load_faq_clusters
+from app.market_prices import price_engine
+from app.schemes import scheme_engine
+from app.utils import chat_log_files
+from app.weather import weather_engine
+
+logger = logging.getLogger(__name__)
+
+IDLE, WARMING, READY = 'idle', 'warming', 'ready'
+
+
+class WarmupBudgetExhausted(Exception):
+    """Raised when WARMUP_MAX_SECONDS runs out before the next replay"""
+
+
+# Caches included in snapshots
+SNAPSHOT_CACHES = {
+    'response': response_cache,
+    'translation': translation_cache,
+}
+
+# Index loaders run before any replay
+INDEX_WARMERS = [
+    price_engine.refresh,
+    weather_engine.refresh,
+    scheme_engine.refresh,
+]
+
+
+def _freeze(value: Any) -> Hashable:
+    """JSON lists back to the tuples used as cache keys and values"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def save_snapshot(path: str = None) -> Dict[str, int]:
+    """Write the live cache entries atomically; returns entries per cache"""
+    path = path or Config.WARMUP_SNAPSHOT_FILE
+    caches = {name: cache.items() for name, cache in SNAPSHOT_CACHES.items()}
+    snapshot = {
+        'version': 1,
+        'built_at': datetime.now().isoformat(),
+        'saved_at': time.time(),
+        'caches': {name: [[key, value, round(ttl, 1)] for key, value, ttl in entries]
+                   for name, entries in caches.items()}
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_file, path)
+    return {name: len(entries) for name, entries in caches.items()}
+
+
+def load_snapshot(path: str = None) -> Dict[str, int]:
+    """Load unexpired snapshot entries into the caches; returns entries loaded per cache"""
+    path = path or Config.WARMUP_SNAPSHOT_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    age = max(time.time() - snapshot.get('saved_at', time.time()), 0.0)
+    loaded = {}
+    for name, entries in snapshot.get('caches', {}).items():
+        cache = SNAPSHOT_CACHES.get(name)
+        if cache is None:
+            continue
+        count = 0
+        for key, value, ttl in entries:
+            if ttl - age > 0:
+                cache.set(_freeze(key), _freeze(value), ttl - age)
+                count += 1
+        loaded[name] = count
+    return loaded
+
+
+def top_queries(top: int) -> List[Tuple[str, str]]:
+    """Most frequent (question, language) pairs: mined FAQ clusters, else the chat logs"""
+    faqs = load_faq_clusters(top=top) or collect_top_questions(chat_log_files(), top)
+    return [(faq['question'], faq.get('language') or Config.DEFAULT_LANGUAGE) for faq in faqs]
+
+
+class CacheWarmer:
+    """Warms the caches once per worker; /api/health reports ready afterwards"""
+
+    def __init__(self, snapshot_file: str = None, top_k: int = None, rate: float = None,
+                 max_seconds: float = None):
+        self.snapshot_file = snapshot_file or Config.WARMUP_SNAPSHOT_FILE
+        self.top_k = Config.WARMUP_TOP_K if top_k is None else top_k
+        self.rate = rate or Config.WARMUP_RATE
+        self.max_seconds = Config.WARMUP_MAX_SECONDS if max_seconds is None else max_seconds
+        self.state = IDLE
+        self.snapshot_entries = 0
+        self.replayed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.elapsed = None
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state != WARMING
+
+    def start(self):
+        """Warm up in a background thread (health reports warming until done)"""
+        if self._thread is not None:
+            return
+        self.state = WARMING
+        self._thread = threading.Thread(target=self.run, name='cache-warmup', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Warm up in the calling thread"""
+        self.state = WARMING
+        started = time.monotonic()
+        try:
+            for warm_index in INDEX_WARMERS:
+                try:
+                    warm_index()
+                except Exception as e:
+                    logger.error("Index warm-up %s failed: %s", getattr(warm_index, '__qualname__', warm_index), e)
+
+            try:
+                self.snapshot_entries = sum(load_snapshot(self.snapshot_file).values())
+            except Exception as e:
+                logger.error("Failed to load warm-up snapshot %s: %s", self.snapshot_file, e)
+
+            if self.top_k > 0:
+                self._replay(started)
+        except Exception as e:
+            logger.error("Cache warm-up failed: %s", e, exc_info=True)
+        finally:
+            self.elapsed = round(time.monotonic() - started, 2)
+            self.state = READY
+            logger.info("Cache warm-up finished in %.1fs: %d snapshot entries, %d replayed, %d skipped, %d failed",
+                        self.elapsed, self.snapshot_entries, self.replayed, self.skipped, self.failed)
+
+    def _replay(self, started: float):
+        bucket = TokenBucket(self.rate)
+        end = started + self.max_seconds
+
+        def throttle():
+            if not bucket.acquire(timeout=end - time.monotonic()):
+                raise WarmupBudgetExhausted()
+
+        for question, language in top_queries(self.top_k):
+            if time.monotonic() >= end:
+                logger.warning("Cache warm-up stopped after %.0fs (WARMUP_MAX_SECONDS)", self.max_seconds)
+                break
+            try:
+                if chatbot.warm_query(question, language, throttle):
+                    self.replayed += 1
+                else:
+                    self.skipped += 1
+            except WarmupBudgetExhausted:
+                logger.warning("Cache warm-up stopped after %.0fs (WARMUP_MAX_SECONDS)", self.max_seconds)
+                break
+            except Exception as e:
+                self.failed += 1
+                logger.error("Warm-up query failed: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'snapshot_entries': self.snapshot_entries,
+            'replayed': self.replayed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'elapsed_seconds': self.elapsed
+        }
+
+
+# Global instance
+cache_warmer = CacheWarmer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache warm-up snapshots")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Replay the top questions and save a cache snapshot")
+    build_parser.add_argument('--top', type=int, default=Config.WARMUP_TOP_K, help="Questions to replay")
+    build_parser.add_argument('--rate', type=float, default=Config.WARMUP_RATE, help="Questions per second")
+    build_parser.add_argument('--max-seconds', type=float, default=Config.WARMUP_MAX_SECONDS,
+                              help="Stop replaying after this long")
+    build_parser.add_argument('--output', default=Config.WARMUP_SNAPSHOT_FILE, help="Snapshot file")
+
+    show_parser = subparsers.add_parser('show', help="Show what a snapshot would load")
+    show_parser.add_argument('--snapshot', default=Config.WARMUP_SNAPSHOT_FILE, help="Snapshot file")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        warmer = CacheWarmer(args.output, args.top, args.rate, args.max_seconds)
+        warmer.run()
+        counts = save_snapshot(args.output)
+        print(f"Wrote {args.output}: {counts} ({warmer.replayed} replayed, {warmer.skipped} skipped, "
+              f"{warmer.failed} failed in {warmer.elapsed}s)")
+    else:
+        print(f"{args.snapshot}: {load_snapshot(args.snapshot) or 'no entries'}")
+
+
+if __name__ == '__main__':
+    main()
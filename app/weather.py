@@ -0,0 +1,468 @@
+"""
+District weather advisories from local forecast files
+
+Loads gridded or district-level forecasts from WEATHER_FORECAST_DIR as
+memory-mapped NumPy arrays, resolves village/taluka/district names in a
+question to forecast cells through a gazetteer (WEATHER_GAZETTEER), and turns
+the forecast for that place into crop advisories from a rule table. The
+result is added to the Gemini prompt for weather questions.
+
+Each forecast is a pair of files:
+
+    <name>.npy   float32, (days, variables, rows, cols) for a lat/lon grid
+                 or (days, variables, districts) for a district forecast
+    <name>.json  {"issued": "2024-06-01", "start_date": "2024-06-01",
+                  "variables": ["rain_mm", "tmax_c", "tmin_c", "rh_pct", "wind_kmh"],
+                  "grid": {"lat0": 22.0, "lon0": 72.5, "lat_step": -0.25, "lon_step": 0.25}}
+                 (a district forecast lists "districts" instead of "grid")
+
+The .json is written last, so a forecast is only picked up once complete. New
+or replaced files are loaded within WEATHER_RELOAD_SECONDS, without a restart.
+
+Usage:
+    python -m app.weather import-csv district_forecast.csv
+    python -m app.weather query "नाशिकमध्ये पाऊस कधी येईल?"
+"""
+
+import argparse
+import csv
+import json
+import logging
+import operator
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import Config
+from app.logging_setup import SAMPLED
+from app.market_prices import COMMODITIES
+from app.normalizer import lookup_prefix, normalize_text
+
+try:
+    import numpy as np
+except ImportError:  # Optional - weather context is disabled without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+VARIABLES = ('rain_mm', 'tmax_c', 'tmin_c', 'rh_pct', 'wind_kmh')
+
+# Other CSV column names accepted by import-csv
+_COLUMN_ALIASES = {
+    'rain': 'rain_mm', 'rainfall': 'rain_mm', 'rainfall_mm': 'rain_mm',
+    'tmax': 'tmax_c', 'max_temp': 'tmax_c', 'tmin': 'tmin_c', 'min_temp': 'tmin_c',
+    'rh': 'rh_pct', 'humidity': 'rh_pct', 'wind': 'wind_kmh', 'wind_speed': 'wind_kmh',
+}
+
+# Question words that mark a weather question (matched as token prefixes)
+WEATHER_WORDS = tuple(normalize_text(word, stem=False) for word in (
+    'weather', 'rain', 'forecast', 'temperature', 'humidity', 'wind',
+    'हवामान', 'पाऊस', 'पावसा', 'तापमान', 'आर्द्रता', 'वारा', 'वाऱ्या', 'गारपीट', 'थंडी',
+))
+
+_PLACE_RANK = {'village': 0, 'taluka': 1, 'district': 2}  # Most specific place wins
+
+# Advisory rules: (crops, variable, aggregate, days, comparison, threshold, advice_en, advice_mr).
+# Rules without crops apply to every weather question; crop rules (keys of
+# market_prices.COMMODITIES) apply when one of the crops is mentioned.
+ADVISORY_RULES = (
+    ((), 'rain_mm', 'sum', 3, '>=', 25,
+     "Heavy rain is expected in the next 3 days: postpone spraying and fertilizer application and keep field drains open.",
+     "पुढील 3 दिवसांत जोरदार पावसाची शक्यता: फवारणी व खते देणे पुढे ढकला आणि शेतातील चर मोकळे ठेवा."),
+    ((), 'rain_mm', 'sum', 5, '<', 2,
+     "No significant rain is expected in the next 5 days: plan irrigation for standing crops.",
+     "पुढील 5 दिवसांत लक्षणीय पाऊस अपेक्षित नाही: उभ्या पिकांसाठी पाण्याचे नियोजन करा."),
+    ((), 'wind_kmh', 'max', 2, '>=', 25,
+     "Strong winds are expected: avoid spraying and support tall crops.",
+     "जोरदार वाऱ्याची शक्यता: फवारणी टाळा आणि उंच पिकांना आधार द्या."),
+    ((), 'tmax_c', 'max', 3, '>=', 40,
+     "Very hot days ahead: irrigate in the evening and mulch to keep soil moisture.",
+     "पुढील दिवस खूप उष्ण: संध्याकाळी पाणी द्या आणि ओलावा टिकवण्यासाठी आच्छादन करा."),
+    (('grapes', 'pomegranate'), 'rh_pct', 'mean', 3, '>=', 80,
+     "High humidity favours downy mildew and bacterial blight: keep the canopy open and spray a preventive fungicide on a dry day.",
+     "जास्त आर्द्रतेमुळे डाऊनी मिल्ड्यू व तेलकट डाग रोगाचा धोका: फांद्यांची दाटी कमी करा आणि कोरड्या दिवशी प्रतिबंधात्मक बुरशीनाशक फवारा."),
+    (('onion', 'tomato', 'potato'), 'rh_pct', 'mean', 3, '>=', 85,
+     "Humid weather raises the risk of blight and purple blotch: scout the crop and spray a recommended fungicide when the weather clears.",
+     "दमट हवामानामुळे करपा रोगाचा धोका: पिकाची पाहणी करा आणि उघडीप मिळताच शिफारशीत बुरशीनाशक फवारा."),
+    (('cotton', 'soybean', 'tur'), 'rain_mm', 'sum', 3, '>=', 50,
+     "Very heavy rain may waterlog the field: drain excess water quickly to protect the roots.",
+     "अतिवृष्टीमुळे शेतात पाणी साचू शकते: मुळांच्या संरक्षणासाठी जास्तीचे पाणी लवकर काढून द्या."),
+    (('wheat', 'gram'), 'tmin_c', 'min', 3, '<=', 8,
+     "Cold nights ahead: give a light irrigation to protect the crop from cold injury.",
+     "थंड रात्रींची शक्यता: थंडीपासून संरक्षणासाठी पिकाला हलके पाणी द्या."),
+)
+
+_AGGREGATES = {'sum': sum, 'max': max, 'min': min, 'mean': lambda values: sum(values) / len(values)}
+_COMPARISONS = {'>=': operator.ge, '>': operator.gt, '<=': operator.le, '<': operator.lt}
+
+
+def _compile_rules(variables: List[str]) -> List[Tuple]:
+    """Bind the rule table to one forecast's variable layout"""
+    positions = {name: index for index, name in enumerate(variables)}
+    return [
+        (frozenset(crops), positions[variable], _AGGREGATES[aggregate], days,
+         _COMPARISONS[comparison], threshold, advice_en, advice_mr)
+        for crops, variable, aggregate, days, comparison, threshold, advice_en, advice_mr in ADVISORY_RULES
+        if variable in positions
+    ]
+
+
+class Gazetteer:
+    """Villages, talukas and districts with coordinates and a name index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.names: List[str] = []
+        self.names_mr: List[str] = []
+        self.districts: List[str] = []
+        self.ranks: List[int] = []
+        self.index: Dict[str, int] = {}
+        lats, lons = [], []
+
+        try:
+            self.mtime = os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                for row in csv.DictReader(f):
+                    place = len(self.names)
+                    self.names.append(row['name'].strip())
+                    self.names_mr.append((row.get('name_mr') or '').strip() or self.names[-1])
+                    self.districts.append((row.get('district') or row['name']).strip())
+                    self.ranks.append(_PLACE_RANK.get((row.get('kind') or '').strip(), len(_PLACE_RANK)))
+                    lats.append(float(row['lat']))
+                    lons.append(float(row['lon']))
+                    for alias in [row['name'], row.get('name_mr') or ''] + (row.get('aliases') or '').split(';'):
+                        key = normalize_text(alias, stem=False)
+                        if key:
+                            self.index.setdefault(key, place)
+        except OSError as e:
+            self.mtime = None
+            logger.warning("Weather gazetteer unavailable: %s", e)
+
+        # Coordinates are only needed to index gridded forecasts
+        self.lats = np.array(lats, dtype=np.float64) if np is not None else lats
+        self.lons = np.array(lons, dtype=np.float64) if np is not None else lons
+        self._max_words = max((key.count(' ') + 1 for key in self.index), default=1)
+
+    def resolve(self, tokens: List[str]) -> Optional[int]:
+        """Most specific place named in the tokens (a village over its district)"""
+        best = None
+        for start, token in enumerate(tokens):
+            place = None
+            for size in range(self._max_words, 1, -1):
+                place = self.index.get(' '.join(tokens[start:start + size]))
+                if place is not None:
+                    break
+            if place is None:
+                place = lookup_prefix(token, self.index)
+            if place is not None and (best is None or self.ranks[place] < self.ranks[best]):
+                best = place
+        return best
+
+    def display_name(self, place: int, language: str) -> str:
+        """'Niphad, Nashik district' / 'निफाड, नाशिक जिल्हा'"""
+        names = self.names_mr if language == 'mr' else self.names
+        district = self.index.get(normalize_text(self.districts[place], stem=False))
+        district_name = names[district] if district is not None else self.districts[place]
+        suffix = 'जिल्हा' if language == 'mr' else 'district'
+        if names[place] == district_name:
+            return f"{district_name} {suffix}"
+        return f"{names[place]}, {district_name} {suffix}"
+
+
+class Forecast:
+    """One memory-mapped forecast file with its place -> cell index"""
+
+    def __init__(self, meta_path: str, gazetteer: Gazetteer):
+        self.path = meta_path
+        self.mtime = os.path.getmtime(meta_path)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.issued = meta['issued']
+        self.start_date = date.fromisoformat(meta.get('start_date', meta['issued']))
+        self.variables = list(meta['variables'])
+        self.grid = meta.get('grid')
+        self.rules = _compile_rules(self.variables)
+
+        # Pages are only read for the cells that are looked up
+        data = np.load(os.path.splitext(meta_path)[0] + '.npy', mmap_mode='r')
+        if data.ndim not in (3, 4) or data.shape[1] != len(self.variables):
+            raise ValueError(f"Array shape {data.shape} does not match variables {self.variables}")
+
+        if self.grid:
+            if data.ndim != 4:
+                raise ValueError(f"Gridded forecast needs a 4-D array, got {data.shape}")
+            rows = np.rint((gazetteer.lats - self.grid['lat0']) / self.grid['lat_step']).astype(np.int64)
+            cols = np.rint((gazetteer.lons - self.grid['lon0']) / self.grid['lon_step']).astype(np.int64)
+            inside = (rows >= 0) & (rows < data.shape[2]) & (cols >= 0) & (cols < data.shape[3])
+            self.cells = np.where(inside, rows * data.shape[3] + cols, -1).tolist()
+            data = data.reshape(data.shape[0], data.shape[1], -1)
+        else:
+            districts = meta['districts']
+            if data.ndim != 3 or data.shape[2] != len(districts):
+                raise ValueError(f"District forecast needs {len(districts)} columns, got {data.shape}")
+            columns = {normalize_text(name, stem=False): column for column, name in enumerate(districts)}
+            self.cells = [columns.get(normalize_text(district, stem=False), -1) for district in gazetteer.districts]
+
+        self.data = data
+        self.days = data.shape[0]
+
+    def series(self, place: int, today: date) -> Optional[Tuple[date, List[List[float]]]]:
+        """(first day, one row of variables per day from today) for a place, or None if not covered"""
+        cell = self.cells[place]
+        offset = max((today - self.start_date).days, 0)
+        if cell < 0 or offset >= self.days:
+            return None
+        rows = self.data[offset:, :, cell].tolist()
+        if any(value != value for value in rows[0]):  # NaN: masked cell (sea) or missing district
+            return None
+        return self.start_date + timedelta(days=offset), rows
+
+    def advise(self, rows: List[List[float]], crops: Set[str], language: str) -> List[str]:
+        """Advisories whose rule fires on this forecast"""
+        advice = []
+        for rule_crops, position, aggregate, days, compare, threshold, advice_en, advice_mr in self.rules:
+            if (rule_crops and not rule_crops & crops) or len(rows) < days:
+                continue
+            if compare(aggregate([row[position] for row in rows[:days]]), threshold):
+                advice.append(advice_mr if language == 'mr' else advice_en)
+        return advice
+
+
+def format_weather_context(place: str, issued: str, first_day: date, variables: List[str],
+                           rows: List[List[float]], advice: List[str], language: str) -> str:
+    """Forecast and advisories as prompt context"""
+    positions = {name: index for index, name in enumerate(variables)}
+    marathi = language == 'mr'
+    lines = [f"स्थानिक हवामान अंदाज - {place} (जारी {issued}):" if marathi
+             else f"Local weather forecast for {place} (issued {issued}):"]
+
+    for offset, row in enumerate(rows):
+        parts = []
+        if 'rain_mm' in positions:
+            rain = row[positions['rain_mm']]
+            parts.append(f"पाऊस {rain:.0f} मिमी" if marathi else f"rain {rain:.0f} mm")
+        if 'tmin_c' in positions and 'tmax_c' in positions:
+            parts.append(f"{row[positions['tmin_c']]:.0f}-{row[positions['tmax_c']]:.0f}°C")
+        if 'rh_pct' in positions:
+            humidity = row[positions['rh_pct']]
+            parts.append(f"आर्द्रता {humidity:.0f}%" if marathi else f"humidity {humidity:.0f}%")
+        if 'wind_kmh' in positions:
+            wind = row[positions['wind_kmh']]
+            parts.append(f"वारा {wind:.0f} किमी/तास" if marathi else f"wind {wind:.0f} km/h")
+        lines.append(f"{(first_day + timedelta(days=offset)).isoformat()}: {', '.join(parts)}")
+
+    if advice:
+        lines.append("सल्ला:" if marathi else "Advisories:")
+        lines.extend(f"- {item}" for item in advice)
+    lines.append("उत्तर या अंदाजावर आणि सल्ल्यावर आधारित द्या." if marathi
+                 else "Base the answer on this forecast and these advisories.")
+    return '\n'.join(lines)
+
+
+class WeatherEngine:
+    """Forecast lookup and advisories for the place named in a question"""
+
+    def __init__(self, forecast_dir: str, gazetteer_path: str):
+        self.forecast_dir = forecast_dir
+        self.gazetteer_path = gazetteer_path
+        self._crop_index = {
+            normalize_text(alias, stem=False): key
+            for key, (_, _, aliases) in COMMODITIES.items()
+            for alias in aliases
+        }
+        # (gazetteer, forecasts newest first), replaced as a whole on refresh
+        self._snapshot: Tuple[Optional[Gazetteer], List[Forecast]] = (None, [])
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def refresh(self, force: bool = False):
+        """Load new or changed forecast files and gazetteer (at most every WEATHER_RELOAD_SECONDS)"""
+        if not force and self._checked_at and time.monotonic() - self._checked_at < Config.WEATHER_RELOAD_SECONDS:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # Another request is refreshing; use the current snapshot
+        try:
+            self._checked_at = time.monotonic()
+            gazetteer, current = self._snapshot
+            try:
+                gazetteer_mtime = os.path.getmtime(self.gazetteer_path)
+            except OSError:
+                gazetteer_mtime = None
+            rebuild = gazetteer is None or gazetteer.mtime != gazetteer_mtime
+            if rebuild:
+                gazetteer = Gazetteer(self.gazetteer_path)
+
+            try:
+                names = sorted(name for name in os.listdir(self.forecast_dir) if name.endswith('.json'))
+            except OSError:
+                names = []
+
+            loaded = {forecast.path: forecast for forecast in current}
+            forecasts = []
+            for name in names:
+                path = os.path.join(self.forecast_dir, name)
+                forecast = loaded.get(path)
+                try:
+                    if rebuild or forecast is None or forecast.mtime != os.path.getmtime(path):
+                        forecast = Forecast(path, gazetteer)
+                        logger.info("Loaded weather forecast %s (issued %s, %d days)", name, forecast.issued, forecast.days)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Skipping weather forecast %s: %s", name, e)
+                    continue
+                forecasts.append(forecast)
+
+            # Newest issue first; a grid beats a district forecast issued the same day
+            forecasts.sort(key=lambda forecast: (forecast.issued, forecast.grid is not None), reverse=True)
+            self._snapshot = (gazetteer, forecasts)
+        finally:
+            self._refresh_lock.release()
+
+    def parse_query(self, normalized_text: str) -> Optional[Tuple[int, Set[str]]]:
+        """(place, crops mentioned) for a weather question naming a known place, else None"""
+        tokens = normalized_text.split()
+        if not any(token.startswith(WEATHER_WORDS) for token in tokens):
+            return None
+
+        self.refresh()
+        gazetteer, _ = self._snapshot
+        if gazetteer is None:
+            return None  # First load still in progress in another request
+        place = gazetteer.resolve(tokens)
+        if place is None:
+            return None
+        crops = {lookup_prefix(token, self._crop_index) for token in tokens} - {None}
+        return place, crops
+
+    def cache_tag(self, query: str) -> str:
+        """
+        Response cache key suffix for weather questions. Their answers may be
+        based on the forecast, so they are keyed by the latest forecast issue
+        and today's date and never outlive the data they used.
+        """
+        if np is None:
+            return ''
+        tokens = normalize_text(query, stem=False).split()
+        if not any(token.startswith(WEATHER_WORDS) for token in tokens):
+            return ''
+        self.refresh()
+        _, forecasts = self._snapshot
+        issued = forecasts[0].issued if forecasts else ''
+        return f":wx:{issued}:{date.today().isoformat()}"
+
+    def context(self, query: str, language: str) -> Optional[str]:
+        """Context provider for GeminiAnswerGenerator: forecast and advisories for the place asked about"""
+        if np is None:
+            return None
+
+        started = time.perf_counter()
+        parsed = self.parse_query(normalize_text(query, stem=False))
+        if parsed is None:
+            return None
+        place, crops = parsed
+
+        gazetteer, forecasts = self._snapshot
+        today = date.today()
+        for forecast in forecasts:
+            series = forecast.series(place, today)
+            if series is None:
+                continue
+            first_day, rows = series
+            advice = forecast.advise(rows, crops, language)
+            text = format_weather_context(
+                gazetteer.display_name(place, language), forecast.issued, first_day,
+                forecast.variables, rows[:Config.WEATHER_CONTEXT_DAYS], advice, language
+            )
+            logger.info("Weather context for %s from %s (%.0f us)", gazetteer.names[place],
+                        os.path.basename(forecast.path), (time.perf_counter() - started) * 1e6, extra=SAMPLED)
+            return text
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        if np is None:
+            return {'enabled': False}
+        self.refresh()
+        gazetteer, forecasts = self._snapshot
+        return {
+            'enabled': True,
+            'places': len(gazetteer.names) if gazetteer else 0,
+            'forecasts': len(forecasts),
+            'latest_issued': forecasts[0].issued if forecasts else None
+        }
+
+
+def import_csv(path: str, forecast_dir: str = None, issued: str = None) -> str:
+    """Convert a district forecast CSV (district, date, rain_mm, tmax_c, ...) to a .npy/.json forecast"""
+    forecast_dir = forecast_dir or Config.WEATHER_FORECAST_DIR
+    records = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = [
+            _COLUMN_ALIASES.get(key, key)
+            for key in (name.strip().lower().replace(' ', '_') for name in reader.fieldnames or [])
+        ]
+        variables = [name for name in VARIABLES if name in reader.fieldnames]
+        for record in reader:
+            records.append((record['district'].strip(), date.fromisoformat(record['date'].strip()),
+                            [float(record[name]) if record[name].strip() else np.nan for name in variables]))
+    if not records:
+        raise ValueError(f"No forecast rows in {path}")
+
+    districts = sorted({district for district, _, _ in records})
+    start = min(day for _, day, _ in records)
+    days = (max(day for _, day, _ in records) - start).days + 1
+    columns = {district: column for column, district in enumerate(districts)}
+
+    data = np.full((days, len(variables), len(districts)), np.nan, dtype=np.float32)
+    for district, day, values in records:
+        data[(day - start).days, :, columns[district]] = values
+
+    issued = issued or start.isoformat()
+    base = os.path.join(forecast_dir, f"district_{issued}")
+    os.makedirs(forecast_dir, exist_ok=True)
+    with open(f"{base}.npy.tmp", 'wb') as f:
+        np.save(f, data)
+    os.replace(f"{base}.npy.tmp", f"{base}.npy")
+
+    # Metadata last: the engine only loads forecasts whose .json exists
+    meta = {'issued': issued, 'start_date': start.isoformat(), 'variables': variables, 'districts': districts}
+    with open(f"{base}.json.tmp", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(f"{base}.json.tmp", f"{base}.json")
+    return f"{base}.json"
+
+
+# Global instance
+weather_engine = WeatherEngine(Config.WEATHER_FORECAST_DIR, Config.WEATHER_GAZETTEER)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather forecast files and advisories")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import-csv', help="Convert a district forecast CSV")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--issued', help="Issue date (default: first forecast date)")
+    query_parser = subparsers.add_parser('query', help="Show the weather context for a question")
+    query_parser.add_argument('question')
+    query_parser.add_argument('--language', default='mr', choices=Config.SUPPORTED_LANGUAGES)
+    args = parser.parse_args()
+
+    if np is None:
+        parser.error("numpy is required for weather forecasts (pip install numpy)")
+
+    if args.command == 'import-csv':
+        meta_path = import_csv(args.file, issued=args.issued)
+        print(f"Wrote {meta_path}")
+    else:
+        weather_engine.refresh(force=True)
+        started = time.perf_counter()
+        context = weather_engine.context(args.question, args.language)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(context or "No local forecast for this question")
+        print(f"({elapsed:.0f} us)")
+
+
+if __name__ == '__main__':
+    main()
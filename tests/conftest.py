@@ -0,0 +1,20 @@
+"""
+Test configuration: keep background workers off and give the Gemini key a
+placeholder so app modules import without a live environment. The app log,
+chat logs and the history database go to a temporary directory.
+"""
+
+import os
+import sys
+import tempfile
+
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+os.environ.setdefault('JOB_WORKERS', '0')
+os.environ.setdefault('WARMUP_ENABLED', 'false')
+os.environ.setdefault('HISTORY_ENABLED', 'false')
+_data_dir = tempfile.mkdtemp(prefix='agri-chatbot-tests-')
+os.environ.setdefault('LOG_FILE', os.path.join(_data_dir, 'app.log'))
+os.environ.setdefault('CHAT_LOG_FILE', os.path.join(_data_dir, 'chat_logs.jsonl'))
+os.environ.setdefault('HISTORY_DB', os.path.join(_data_dir, 'history.db'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,19 @@
+"""Prompt selection: the direct-Marathi system prompt only in the pipeline's direct mode"""
+
+from app.answer_generator import answer_generator
+from app.config import Config
+
+QUESTION = 'when to sow cotton crop'
+
+
+def test_direct_mode_uses_the_marathi_system_prompt():
+    prompt = answer_generator._create_enhanced_prompt(QUESTION, 'mr', direct=True)
+    assert prompt.startswith(Config.get_system_prompt('marathi'))
+    assert 'नेहमी मराठीत उत्तर द्या' in prompt
+
+
+def test_other_marathi_calls_keep_the_koti_prompt():
+    prompt = answer_generator._create_enhanced_prompt(QUESTION, 'mr')
+    assert not prompt.startswith(Config.get_system_prompt('marathi'))
+    assert prompt.startswith('तुम्ही कोती आहात')
+    assert 'नेहमी मराठीत उत्तर द्या' in prompt
@@ -0,0 +1,53 @@
+"""Static asset builds: old fingerprints survive a rebuild, manifest reload, real 404s"""
+
+import os
+
+import pytest
+
+from app import assets
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    for path, text in (('css/style.css', 'body { color: red; }'), ('js/script.js', 'var a = 1;')):
+        os.makedirs(tmp_path / 'static' / os.path.dirname(path), exist_ok=True)
+        (tmp_path / 'static' / path).write_text(text, encoding='utf-8')
+    return tmp_path / 'static'
+
+
+def test_rebuild_keeps_previous_build_until_it_is_old(static_dir, tmp_path):
+    dist = str(tmp_path / 'dist')
+    first = assets.build_assets(static_dir=str(static_dir), dist_dir=dist, keep_days=7)['assets']['js/script.js']
+
+    (static_dir / 'js' / 'script.js').write_text('var a = 2;', encoding='utf-8')
+    second = assets.build_assets(static_dir=str(static_dir), dist_dir=dist, keep_days=7)['assets']['js/script.js']
+    assert first != second
+    assert os.path.isfile(os.path.join(dist, first))
+    assert os.path.isfile(os.path.join(dist, second))
+
+    old = os.path.join(dist, first)
+    os.utime(old, (0, 0))
+    os.utime(f"{old}.gz", (0, 0))
+    manifest = assets.build_assets(static_dir=str(static_dir), dist_dir=dist, keep_days=7)
+    assert not os.path.exists(old) and not os.path.exists(f"{old}.gz")
+    assert os.path.isfile(os.path.join(dist, manifest['assets']['js/script.js']))
+    assert os.path.isfile(os.path.join(dist, 'manifest.json'))
+
+
+def test_manifest_is_reloaded_after_a_rebuild(static_dir, tmp_path, monkeypatch):
+    dist = str(tmp_path / 'dist')
+    monkeypatch.setattr(assets, 'MANIFEST_FILE', os.path.join(dist, 'manifest.json'))
+    monkeypatch.setattr(assets, 'MANIFEST_CHECK_SECONDS', 0)
+    monkeypatch.setattr(assets, '_manifest', None)
+
+    assert assets.load_manifest() == {}
+    built = assets.build_assets(static_dir=str(static_dir), dist_dir=dist)['assets']
+    assert assets.load_manifest() == built
+
+
+def test_missing_asset_is_a_real_404():
+    from app.main import app
+
+    response = app.test_client().get('/assets/js/script.0000000000.js')
+    assert response.status_code == 404
+    assert 'immutable' not in response.headers.get('Cache-Control', '')
@@ -0,0 +1,46 @@
+"""Batch chat: per-item validation and ordering"""
+
+import pytest
+
+from app.chatbot import AgriChatbot
+
+
+@pytest.fixture
+def chatbot(monkeypatch):
+    bot = AgriChatbot()
+    calls = []
+
+    def process_query(message, session_id=None, language=None):
+        calls.append((message, session_id, language))
+        return {'response': f'answer: {message}', 'language': language, 'status': 'success'}
+
+    monkeypatch.setattr(bot, 'process_query', process_query)
+    bot.calls = calls
+    return bot
+
+
+def test_invalid_items_get_per_item_errors(chatbot):
+    items = [
+        {'id': 'a', 'message': 123},
+        {'id': 'b', 'message': None},
+        {'id': 'c', 'message': '   '},
+        {'id': 'd', 'message': 'wheat sowing time', 'session_id': ['x']},
+        {'id': 'e', 'message': 'wheat sowing time', 'language': 'en'},
+    ]
+    results = chatbot.process_batch(items, 'mr')
+
+    assert [result['id'] for result in results] == ['a', 'b', 'c', 'd', 'e']
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert results[0]['error'] == 'message must be a string'
+    assert results[1]['error'] == 'message must be a string'
+    assert results[2]['error'] == 'Empty message'
+    assert results[3]['error'] == 'session_id must be a string'
+    assert all(result['status'] == 'error' for result in results[:4])
+    assert results[4]['status'] == 'success'
+    assert chatbot.calls == [('wheat sowing time', None, 'en')]
+
+
+def test_default_language_applies_to_items_without_one(chatbot):
+    results = chatbot.process_batch([{'message': 'onion price'}, {'message': 'onion price', 'language': 'en'}], 'mr')
+
+    assert [result['language'] for result in results] == ['mr', 'en']
@@ -0,0 +1,61 @@
+"""Hedged calls under the adaptive limiter, and translation timeouts"""
+
+import threading
+import time
+
+import pytest
+
+from app import translator
+from app.concurrency import AdaptiveLimiter, Hedger
+
+
+def make_hedger(limit):
+    limiter = AdaptiveLimiter('test', initial_limit=limit, max_limit=limit, max_queue_time=0.05)
+    hedger = Hedger('test', enabled=True, min_samples=1, limiter=limiter)
+    hedger.latencies.record(0.01)  # Hedge after ~10 ms
+    return limiter, hedger
+
+
+def test_each_attempt_holds_a_slot_until_it_finishes():
+    limiter, hedger = make_hedger(limit=2)
+    release = threading.Event()
+    in_flight = []
+
+    def slow():
+        in_flight.append(limiter.metrics()['in_flight'])
+        release.wait(5)
+        return 'ok'
+
+    with pytest.raises(TimeoutError):
+        hedger.call(slow, timeout=0.2)
+    assert hedger.hedges == 1
+    # Both abandoned attempts are still running and still hold their slots
+    assert limiter.metrics()['in_flight'] == 2
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while limiter.metrics()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert limiter.metrics()['in_flight'] == 0
+    assert max(in_flight) <= 2
+
+
+def test_no_hedge_without_a_free_slot():
+    limiter, hedger = make_hedger(limit=1)
+
+    def slow():
+        time.sleep(0.1)
+        return 'ok'
+
+    assert hedger.call(slow, timeout=2) == 'ok'
+    assert (hedger.hedges, hedger.hedges_skipped) == (0, 1)
+    assert limiter.metrics()['in_flight'] == 0
+
+
+def test_translation_timeout_returns_the_original_text(monkeypatch):
+    def timed_out(fn, timeout=None):
+        raise TimeoutError('translate: no attempt finished')
+
+    monkeypatch.setattr(translator.translate_hedger, 'call', timed_out)
+    text = 'hedged translation timeout check'
+    assert translator.language_processor._translate(text, 'en', 'mr') == text
@@ -0,0 +1,52 @@
+import pytest
+
+from app.faq_miner import cluster_signatures, entities, is_data_dependent, minhash, similarity
+from app.normalizer import normalize_text
+
+# Reworded pairs that are character-similar but need different answers
+DIFFERENT_ANSWERS = [
+    ("कांद्याला पाणी किती द्यावे", "कापसाला पाणी किती द्यावे"),
+    ("how much urea for 2 acres of wheat", "how much urea for 5 acres of wheat"),
+    ("how to grow tomato in summer", "how to grow potato in summer"),
+]
+
+
+def cluster(questions, use_entities=True):
+    signatures = [minhash(normalize_text(question)) for question in questions]
+    keys = [entities(question) for question in questions] if use_entities else None
+    sets = cluster_signatures(signatures, keys=keys)
+    return len({sets.find(index) for index in range(len(questions))})
+
+
+@pytest.mark.parametrize('left, right', DIFFERENT_ANSWERS)
+def test_different_crops_or_numbers_are_not_merged(left, right):
+    assert entities(left) != entities(right)
+    assert cluster([left, right]) == 2
+
+
+@pytest.mark.parametrize('left, right', [
+    ("कांद्याला पाणी किती द्यावे", "कांद्याला पाणी किती दयावे"),
+    ("how much water does the onion crop need", "how much water does onion crop need"),
+])
+def test_spelling_variants_are_merged(left, right):
+    assert similarity(minhash(normalize_text(left)), minhash(normalize_text(right))) >= 0.6
+    assert cluster([left, right]) == 1
+
+
+def test_entities_fold_marathi_digits():
+    assert entities("२ एकर गहू") == entities("2 एकर गव्हाला")
+
+
+@pytest.mark.parametrize('question', [
+    "लासलगाव कांद्याचा भाव",
+    "onion price today",
+    "उद्या पाऊस पडेल का?",
+    "pm kisan installment",
+    "2 एकर कांद्यासाठी किती खत द्यावे?",
+])
+def test_data_dependent_questions_are_excluded(question):
+    assert is_data_dependent(question)
+
+
+def test_agronomy_question_is_minable():
+    assert not is_data_dependent("कांद्याला पाणी किती द्यावे")
@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from app.fertilizer import fertilizer_calculator
+from app.normalizer import normalize_text
+
+
+def answer(question, language='en'):
+    return fertilizer_calculator.answer(question, normalize_text(question, stem=False), language)
+
+
+@pytest.mark.parametrize('question, language', [
+    ("What is the dose of imidacloprid spray for cotton?", 'en'),
+    ("कापसावर कीटकनाशकाची मात्रा किती?", 'mr'),
+    ("What insecticide dose and fertilizer for cotton?", 'en'),
+])
+def test_pesticide_dose_questions_are_not_answered(question, language):
+    assert answer(question, language) is None
+
+
+@pytest.mark.parametrize('question, language', [
+    ("How much urea for 2 acres of wheat?", 'en'),
+    ("how much nitrogen does cotton need", 'en'),
+    ("2 एकर कांद्यासाठी किती खत द्यावे?", 'mr'),
+])
+def test_fertilizer_questions_are_answered(question, language):
+    assert answer(question, language)
+
+
+@pytest.mark.parametrize('acres, label', [(150, '150 acres'), (12.5, '12.5 acres'), (0.25, '0.25 acres')])
+def test_area_uses_fixed_point(acres, label):
+    first_line = answer(f"how much urea for {acres} acres of wheat").split('\n')[0]
+    assert label in first_line
+    assert 'e+' not in first_line
+
+
+@pytest.mark.parametrize('record', [
+    {'crop': 'wheat', 'area_ha': 'nan'},
+    {'crop': 'wheat', 'area_ha': 'inf'},
+    {'crop': 'wheat', 'area_acres': '-inf'},
+    {'crop': 'wheat', 'area_ha': '0'},
+    {'crop': 'wheat', 'area_ha': '1', 'soil_n': 'inf'},
+])
+def test_batch_rejects_invalid_rows(record):
+    result, valid = fertilizer_calculator.calculate_batch([record, {'crop': 'wheat', 'area_ha': '1'}])
+    assert result['error'].startswith('Invalid plot')
+    assert 'urea_kg' not in result
+    assert valid['urea_kg'] > 0
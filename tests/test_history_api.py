@@ -0,0 +1,27 @@
+"""Session history API: browsers can only read their own session"""
+
+import pytest
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    return app.test_client()
+
+
+def test_cookie_session_cannot_read_another_session(client):
+    with client.session_transaction() as cookie:
+        cookie['session_id'] = 'own-session'
+
+    assert client.get('/api/session/history?session_id=other-session').status_code == 403
+    response = client.get('/api/session/history?session_id=own-session')
+    assert response.status_code == 200
+    assert response.get_json()['session_id'] == 'own-session'
+    assert client.get('/api/session/history').get_json()['session_id'] == 'own-session'
+
+
+def test_api_client_without_cookie_reads_by_session_id(client):
+    response = client.get('/api/session/history?session_id=api-session&limit=5')
+    assert response.status_code == 200
+    assert response.get_json()['messages'] == []
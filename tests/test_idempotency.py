@@ -0,0 +1,58 @@
+"""Idempotency store: what is replayed and how long duplicates wait"""
+
+import threading
+
+import pytest
+
+from app.idempotency import IdempotencyInProgress, IdempotencyStore
+from app.messages import get_message
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(max_size=100, ttl=60)
+
+
+def test_real_answer_is_replayed(store):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'answer': 'Sow onion in October.', 'status': 'success'}, 200
+
+    assert store.run('chat', 's1', 'k1', 'fp', compute)[2] is False
+    payload, status_code, replayed = store.run('chat', 's1', 'k1', 'fp', compute)
+    assert replayed and payload['answer'] == 'Sow onion in October.'
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize('field', ['answer', 'response'])
+def test_canned_fallback_is_not_stored(store, field):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {field: get_message('fallback', 'mr'), 'status': 'success'}, 200
+
+    store.run('chat', 's1', 'k2', 'fp', compute)
+    assert store.run('chat', 's1', 'k2', 'fp', compute)[2] is False
+    assert len(calls) == 2
+
+
+def test_duplicate_gives_up_after_its_timeout(store):
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {'answer': 'done', 'status': 'success'}, 200
+
+    original = threading.Thread(target=store.run, args=('chat', 's1', 'k3', 'fp', slow))
+    original.start()
+    started.wait(5)
+    try:
+        with pytest.raises(IdempotencyInProgress):
+            store.run('chat', 's1', 'k3', 'fp', slow, timeout=0.05)
+    finally:
+        release.set()
+        original.join(5)
@@ -0,0 +1,123 @@
+"""Job queue: callback allow-list, retries, dead-lettering and callback delivery"""
+
+import threading
+import time
+
+import pytest
+
+from app import job_queue as job_queue_module
+from app.config import Config
+from app.job_queue import DEAD, DONE, QUEUED, JobQueue, JobRejected, is_allowed_callback
+
+
+def wait_for(predicate, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(handler, **kwargs):
+        queue = JobQueue(str(tmp_path / 'jobs.db'), handler, workers=kwargs.pop('workers', 1), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+@pytest.mark.parametrize('url, allowed', [
+    ('https://partner.example.com/hooks/sms', True),
+    ('https://partner.example.com:443/hooks', True),
+    ('https://partner.example.com/hooks', True),
+    ('https://partner.example.com.evil.net/hooks', False),
+    ('https://partner.example.com@evil.net/hooks', False),
+    ('https://partner.example.com:8443/hooks', False),
+    ('http://partner.example.com/hooks', False),
+    ('https://partner.example.com/hookshot', False),
+    ('https://partner.example.com/other', False),
+    ('https://partner.example.com/hooks/../admin', False),
+    ('not a url', False),
+])
+def test_callback_allow_list_compares_scheme_host_port_and_path(monkeypatch, url, allowed):
+    monkeypatch.setattr(Config, 'JOB_CALLBACK_ALLOWED_PREFIXES', ['https://partner.example.com/hooks'])
+    assert is_allowed_callback(url) is allowed
+
+
+def test_rejected_job_is_done_with_error_and_not_retried(make_queue):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        raise JobRejected('Empty input provided')
+
+    queue = make_queue(handler, max_attempts=3, retry_delay=0)
+    job_id = queue.submit({'message': ''})
+    queue.start()
+
+    assert wait_for(lambda: queue.get(job_id)['status'] == DONE)
+    job = queue.get(job_id)
+    assert job['error'] == 'Empty input provided'
+    assert job['attempts'] == 1
+    assert len(calls) == 1
+
+
+def test_failing_job_is_dead_lettered_after_max_attempts(make_queue):
+    def handler(payload):
+        raise RuntimeError('upstream down')
+
+    queue = make_queue(handler, max_attempts=2, retry_delay=0)
+    job_id = queue.submit({'message': 'x'})
+    queue.start()
+
+    assert wait_for(lambda: queue.get(job_id)['status'] == DEAD)
+    assert queue.get(job_id)['attempts'] == 2
+
+
+def test_stale_jobs_count_the_lost_attempt(make_queue):
+    queue = make_queue(lambda payload: {}, workers=0, max_attempts=2, retry_delay=0, visibility_timeout=0)
+    job_id = queue.submit({'message': 'x'})
+
+    queue._claim()
+    queue._requeue_stale()
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts']) == (QUEUED, 1)
+    assert job['error'] == 'Worker lost during attempt 1'
+
+    queue._claim()
+    queue._requeue_stale()
+    assert queue.get(job_id)['status'] == DEAD
+
+
+def test_slow_callback_does_not_block_workers(make_queue, monkeypatch):
+    release = threading.Event()
+    delivered = []
+
+    class Response:
+        status_code = 200
+
+    def post(url, json=None, timeout=None):
+        release.wait(5)
+        delivered.append(json['job_id'])
+        return Response()
+
+    monkeypatch.setattr(job_queue_module.requests, 'post', post)
+    queue = make_queue(lambda payload: {'response': payload['message']})
+    first = queue.submit({'message': 'a'}, callback_url='https://partner.example.com/hooks')
+    second = queue.submit({'message': 'b'})
+    queue.start()
+
+    # The only worker finishes the second job while the first callback is still in flight
+    assert wait_for(lambda: queue.get(second)['status'] == DONE)
+    assert queue.get(first)['callback_status'] == 'pending'
+
+    release.set()
+    assert wait_for(lambda: queue.get(first)['callback_status'] == 'delivered')
+    assert delivered == [first]
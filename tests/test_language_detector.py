@@ -0,0 +1,83 @@
+"""Local language detection and when the Translate API is asked instead"""
+
+import pytest
+
+from app import translator
+from app.config import Config
+from app.language_detector import language_detector
+from app.translator import LanguageProcessor
+
+
+@pytest.mark.parametrize('text, language', [
+    ("कांद्याला किती पाणी द्यावे?", 'mr'),
+    ("प्याज की कीमत क्या है", 'hi'),
+    ("kanda pikala pani kiti", 'mr'),
+    ("how much water should i give my onion crop", 'en'),
+])
+def test_confident_detection(text, language):
+    detected, confidence = language_detector.detect(text)
+    assert detected == language
+    assert confidence >= Config.LANGUAGE_DETECTION_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('text', ['', '   ', '12345 ?'])
+def test_text_without_letters_defaults_to_marathi(text):
+    assert language_detector.detect(text) == ('mr', 0.0)
+
+
+def test_short_latin_text_is_low_confidence():
+    assert language_detector.detect('ok')[1] < Config.LANGUAGE_DETECTION_MIN_CONFIDENCE
+
+
+class Response:
+    status_code = 200
+
+    def json(self):
+        return {'data': {'detections': [[{'language': 'en', 'confidence': 0.9}]]}}
+
+
+@pytest.fixture
+def api_calls(monkeypatch):
+    calls = []
+
+    def post(url, json=None, timeout=None):
+        calls.append(json)
+        return Response()
+
+    monkeypatch.setattr(translator.requests, 'post', post)
+    return calls
+
+
+def test_low_confidence_asks_the_api(api_calls):
+    processor = LanguageProcessor()
+    processor.api_key = 'key'
+    assert processor.detect_language_with_confidence('ok') == ('en', 0.9)
+    assert api_calls == [{'q': 'ok'}]
+
+
+def test_confident_or_keyless_detection_stays_local(api_calls):
+    processor = LanguageProcessor()
+    processor.api_key = 'key'
+    assert processor.detect_language("kanda pikala pani kiti") == 'mr'
+    assert processor.detect_language("प्याज की कीमत क्या है") == 'mr'  # Hindi is served in Marathi
+    processor.api_key = None
+    assert processor.detect_language_with_confidence('ok')[0] == 'mr'
+    assert processor.detect_language_with_confidence('') == ('mr', 0.0)
+    assert api_calls == []
+
+
+def test_chat_api_detects_language_when_not_given(monkeypatch):
+    from app.main import app, chatbot
+
+    languages = []
+
+    def process_query(message, session_id=None, language=None, deadline=None):
+        languages.append(language)
+        return {'response': 'ok', 'language': language or 'en', 'status': 'success',
+                'session_id': 's1', 'timestamp': 'now'}
+
+    monkeypatch.setattr(chatbot, 'process_query', process_query)
+    client = app.test_client()
+    client.post('/api/chat', json={'message': 'how much water for onion'})
+    client.post('/api/chat', json={'message': 'कांद्याला पाणी', 'language': 'mr'})
+    assert languages == [None, 'mr']
@@ -0,0 +1,58 @@
+"""Chat log analytics over JSON Lines and legacy JSON array logs"""
+
+import io
+import json
+import sys
+
+import pytest
+
+from app import log_analytics
+from app.utils import _iter_json_array
+
+ENTRIES = [
+    {'session_id': 's1', 'user_input': 'कांदा भाव', 'bot_response': 'Onion is ₹1500/quintal',
+     'language': 'mr', 'is_agriculture_related': True},
+    {'session_id': 's1', 'user_input': 'Wheat sowing time?', 'bot_response': 'November',
+     'language': 'en', 'is_agriculture_related': True},
+    {'session_id': 's2', 'user_input': 'Who won the match?', 'bot_response': 'ERROR: redirect',
+     'language': 'en', 'is_agriculture_related': False},
+]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    jsonl = tmp_path / 'chat_logs.jsonl'
+    jsonl.write_text(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in ENTRIES), encoding='utf-8')
+    legacy = tmp_path / 'chat_logs.json'
+    legacy.write_text(json.dumps(ENTRIES, ensure_ascii=False, indent=2), encoding='utf-8')
+    return str(jsonl), str(legacy)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_json_array_is_decoded_across_chunks(chunk_size):
+    text = json.dumps(ENTRIES, ensure_ascii=False, indent=2)
+    f = io.StringIO(text)
+    f.read(1)  # Opening bracket
+    assert list(_iter_json_array(f, chunk_size)) == ENTRIES
+
+
+def test_cli_aggregates_both_formats(logs, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['log_analytics', *logs, '--workers', '1', '--json'])
+    log_analytics.main()
+    report = json.loads(capsys.readouterr().out)
+
+    assert report['total_entries'] == 6
+    assert report['errors'] == 2
+    assert report['language_distribution'] == {'mr': 2, 'en': 4}
+    assert report['non_agriculture_share'] == round(2 / 6, 4)
+    assert report['distinct_sessions_approx'] == 2
+    assert report['distinct_questions_approx'] == 3
+    assert report['answer_length']['count'] == 4
+    assert [item['count'] for item in report['top_questions']] == [2, 2, 2]
+
+
+@pytest.mark.parametrize('index', [0, 1])
+def test_each_format_alone(logs, index):
+    report = log_analytics.analyze([logs[index]], workers=1).report()
+    assert report['total_entries'] == 3
+    assert report['deepest_sessions'][0] == {'session_id': 's1', 'turns': 2}
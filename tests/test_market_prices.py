@@ -0,0 +1,76 @@
+import pytest
+
+from app.market_prices import MarketPriceEngine, format_price_answer
+from app.normalizer import normalize_text
+
+CSV = """Market,Commodity,Variety,Arrival_Date,Min_Price,Max_Price,Modal_Price
+Lasalgaon,Onion,Red,01/06/2024,1200,1800,1500
+Pune,Onion,Red,01/06/2024,1100,1700,1450
+Pune,Wheat,Other,01/06/2024,2400,2800,2600
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    prices = tmp_path / 'prices.csv'
+    prices.write_text(CSV, encoding='utf-8')
+    engine = MarketPriceEngine(str(tmp_path / 'prices.db'))
+    engine.ingest_csv(str(prices))
+    return engine
+
+
+def parse(engine, question):
+    return engine.parse_query(normalize_text(question, stem=False))
+
+
+@pytest.mark.parametrize('question', [
+    "What is the seed rate of wheat per acre?",
+    "कांद्याला दररोज किती पाणी द्यावे?",
+    "कापूस दरवर्षी कोणत्या महिन्यात पेरावा?",
+    "कांदा लागवडी दरम्यान कोणती काळजी घ्यावी?",
+    "What is the growth rate of onion?",
+])
+def test_agronomy_questions_are_not_price_lookups(engine, question):
+    assert parse(engine, question) is None
+
+
+@pytest.mark.parametrize('question, expected', [
+    ("onion price", ('onion', None)),
+    ("लासलगाव कांद्याचा भाव", ('onion', 'lasalgaon')),
+    ("onion rate in Lasalgaon", ('onion', 'lasalgaon')),
+    ("पुणे बाजारात गव्हाचा दर काय आहे", ('wheat', 'pune')),
+    ("today onion rate", ('onion', None)),
+])
+def test_price_questions(engine, question, expected):
+    assert parse(engine, question) == expected
+
+
+def test_answer_across_one_market(engine):
+    result = engine.lookup('wheat')
+    assert result['markets'] == 1
+    assert 'across 1 market ' in format_price_answer(result, 'en')
+    assert 'across 2 markets' in format_price_answer(engine.lookup('onion'), 'en')
+
+
+@pytest.mark.parametrize('question', [
+    "how to get better price for onion",
+    "onion prices are falling, should I store my onions in chawl?",
+    "कांद्याला भाव मिळण्यासाठी साठवणूक कशी करावी",
+])
+def test_advice_questions_are_not_price_lookups(engine, question):
+    assert parse(engine, question) is None
+
+
+@pytest.mark.parametrize('question', [
+    "onion price in Nashik",
+    "नाशिकमध्ये कांद्याचा भाव किती आहे?",
+    "onion price at Rahuri market",
+])
+def test_market_not_in_store_is_not_averaged(engine, question):
+    assert parse(engine, question) is None
+    assert engine.answer(question, normalize_text(question, stem=False), 'en') is None
+
+
+def test_non_market_words_after_in_keep_the_aggregate(engine):
+    assert parse(engine, "onion price in the market today") == ('onion', None)
+    assert parse(engine, "wheat price in Maharashtra") == ('wheat', None)
@@ -0,0 +1,51 @@
+"""Query normalization: one canonical form for cache keys and lookups"""
+
+import unicodedata
+
+import pytest
+
+from app.normalizer import canonical_key, lookup_prefix, normalize_text
+
+
+@pytest.mark.parametrize('text, expected', [
+    (unicodedata.normalize('NFD', 'Café'), 'café'),
+    ("कां\u200dदा\u200b भा\u00adव\ufeff", 'कांदा भाव'),
+    ("क़", 'क'),
+    ("ऱ", 'र'),
+    ("१० किलो, २५०० रुपये", '10 किलो 2500 रुपये'),
+    ("कांदा, भाव! काय? । ॥", 'कांदा भाव काय'),
+    ("  ONION\tPrice?? ", 'onion price'),
+    ("", ''),
+])
+def test_character_folds(text, expected):
+    assert normalize_text(text, stem=False) == expected
+
+
+def test_stemming_is_optional():
+    assert normalize_text("कांद्याचा भाव", stem=True) == 'कांद्य भाव'
+    assert normalize_text("कांद्याचा भाव", stem=False) == 'कांद्याचा भाव'
+    # English tokens and stems shorter than two letters are left alone
+    assert normalize_text("onions चा", stem=True) == 'onions चा'
+
+
+@pytest.mark.parametrize('variant', [
+    "कांदा भाव १०",
+    "कां\u200cदा  भाव 10",
+    unicodedata.normalize('NFD', "कांदा भाव 10!"),
+    "कांदा, भाव। 10?",
+])
+def test_canonical_key_ignores_folded_differences(variant):
+    assert canonical_key(variant) == canonical_key("कांदा भाव 10")
+    assert canonical_key(variant) != canonical_key("कांदा भाव 11")
+
+
+def test_canonical_key_of_normalized_text():
+    normalized = normalize_text("Onion price?")
+    assert canonical_key(normalized, normalized=True) == canonical_key("Onion price?")
+
+
+def test_lookup_prefix_strips_marathi_suffixes():
+    index = {'कांद': 'onion', 'onion': 'onion'}
+    assert lookup_prefix('कांद्याला', index) == 'onion'
+    assert lookup_prefix('onions', index) is None  # ASCII tokens match exactly
+    assert lookup_prefix('कां', index) is None
@@ -0,0 +1,46 @@
+"""Pipeline stages: language detection only when needed, no queueing behind busy workers"""
+
+import threading
+
+from app import pipeline
+from app.chatbot import AgriChatbot
+from app.translator import language_processor
+
+
+def test_stage_runs_on_caller_thread_when_workers_are_busy(monkeypatch):
+    monkeypatch.setattr(pipeline, '_stage_slots', threading.BoundedSemaphore(1))
+    release = threading.Event()
+    busy = pipeline.start_stage('busy', release.wait, 5)
+    try:
+        inline = pipeline.start_stage('inline', threading.current_thread)
+        assert inline.done()
+        assert inline.result() is threading.current_thread()
+    finally:
+        release.set()
+        busy.result(5)
+
+    # The slot is free again, so the next stage runs on a worker
+    worker = pipeline.start_stage('worker', threading.current_thread)
+    assert worker.result(5) is not threading.current_thread()
+
+
+def test_stage_exceptions_reach_the_caller(monkeypatch):
+    monkeypatch.setattr(pipeline, '_stage_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(pipeline._stage_slots, 'acquire', lambda blocking=True: False)
+    future = pipeline.start_stage('fails', int, 'not a number')
+    assert isinstance(future.exception(), ValueError)
+
+
+def test_detection_skipped_when_language_is_given(monkeypatch):
+    calls = []
+    monkeypatch.setattr(language_processor, 'detect_language',
+                        lambda *args, **kwargs: calls.append(args) or 'mr')
+    bot = AgriChatbot()
+
+    result = bot.process_query('tell me a movie story', language='en')
+    assert result['status'] == 'redirect'
+    assert result['language'] == 'en'
+    assert calls == []
+
+    bot.process_query('tell me a movie story')
+    assert len(calls) == 1
@@ -0,0 +1,32 @@
+import pytest
+
+from app.normalizer import normalize_text
+from app.schemes import scheme_engine
+
+
+def answer(question, language='en'):
+    return scheme_engine.answer(question, normalize_text(question, stem=False), language)
+
+
+@pytest.mark.parametrize('question, language', [
+    ("Which insecticide is eligible for spraying on cotton?", 'en'),
+    ("कापसासाठी कोणते औषध पात्र आहे?", 'mr'),
+    ("Which scheme is best for cotton?", 'en'),
+    ("How to control pink bollworm in cotton?", 'en'),
+])
+def test_non_scheme_or_crop_only_questions_get_no_eligibility_list(question, language):
+    assert answer(question, language) is None
+
+
+def test_named_scheme_is_answered():
+    assert 'PM-KISAN' in answer("Am I eligible for PM-KISAN? I have 2 acres")
+
+
+def test_eligibility_needs_scheme_noun_and_profile():
+    result = answer("मला 2 एकर जमीन आहे, मी अनुसूचित जाती, कोणत्या योजना मिळतील?", 'mr')
+    assert result.startswith('तुमच्या माहितीनुसार')
+
+
+def test_is_scheme_question():
+    assert scheme_engine.is_scheme_question(normalize_text("pm kisan installment date", stem=False))
+    assert not scheme_engine.is_scheme_question(normalize_text("is this seed eligible for sowing", stem=False))
@@ -0,0 +1,89 @@
+"""JSON encoding, response compression and welcome revalidation"""
+
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify, request
+
+from app.config import Config
+from app.serialization import FastJSONProvider, compress_response, dumps, etag_for
+
+
+@pytest.fixture
+def small_app():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route('/json/<int:size>')
+    def json_body(size):
+        return jsonify({'answer': 'कांदा' * size})
+
+    @app.route('/tagged/<int:size>')
+    def tagged(size):
+        body = dumps({'answer': 'कांदा' * size})
+        result = app.response_class(body, mimetype='application/json')
+        result.set_etag(etag_for(body))
+        return result
+
+    @app.after_request
+    def after_request(response):
+        return compress_response(response, request.accept_encodings)
+
+    return app.test_client()
+
+
+def test_jsonify_is_compact_utf8(small_app):
+    response = small_app.get('/json/1')
+    assert response.data == '{"answer":"कांदा"}'.encode('utf-8')
+    assert b'\\u' not in response.data
+    assert dumps({'a': [1, 2]}) == b'{"a":[1,2]}'
+
+
+def test_small_bodies_are_not_compressed(small_app):
+    response = small_app.get('/json/1', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < Config.COMPRESSION_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.headers.get('Vary', '')
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(small_app):
+    response = small_app.get('/json/200', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data)) == {'answer': 'कांदा' * 200}
+
+    plain = small_app.get('/json/200')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']  # Caches must still key on the encoding
+
+
+def test_etag_becomes_weak_once_encoded(small_app):
+    identity = small_app.get('/tagged/200')
+    encoded = small_app.get('/tagged/200', headers={'Accept-Encoding': 'gzip'})
+    etag, weak = identity.get_etag()
+    assert not weak
+    assert encoded.get_etag() == (etag, True)
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize('encoding', [None, 'gzip'])
+def test_welcome_revalidates_with_304(client, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    first = client.get('/api/welcome?lang=mr&session_id=s1', headers=headers)
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get('/api/welcome?lang=mr&session_id=s1',
+                       headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert again.status_code == 304
+    assert again.data == b''
+
+    other = client.get('/api/welcome?lang=en&session_id=s1',
+                       headers=dict(headers, **{'If-None-Match': first.headers['ETag']}))
+    assert other.status_code == 200
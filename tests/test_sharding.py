@@ -0,0 +1,37 @@
+"""Cluster membership: every worker follows the shared membership file"""
+
+from app.sharding import SessionRouter
+
+NODES = ['http://node1:5000', 'http://node2:5000']
+
+
+def make_router(path, nodes=None):
+    return SessionRouter(nodes=nodes or NODES, self_url='http://node1:5000', secret='s', nodes_file=str(path))
+
+
+def test_membership_published_by_one_worker_reaches_the_others(tmp_path):
+    path = tmp_path / 'cluster_nodes.json'
+    first, second = make_router(path), make_router(path)
+    changes = []
+    second.on_change = lambda: changes.append(second.ring.nodes)
+
+    first.publish_nodes(NODES + ['http://node3:5000/'])
+    assert first.ring.nodes == NODES + ['http://node3:5000']
+
+    assert second.reload() is True
+    assert changes == [NODES + ['http://node3:5000']]
+    assert second.reload() is False  # Unchanged file
+
+
+def test_membership_file_overrides_the_initial_nodes(tmp_path):
+    path = tmp_path / 'cluster_nodes.json'
+    make_router(path).publish_nodes(['http://node1:5000'])
+    assert make_router(path).ring.nodes == ['http://node1:5000']
+
+
+def test_invalid_membership_file_is_ignored(tmp_path):
+    path = tmp_path / 'cluster_nodes.json'
+    path.write_text('{"nodes": "http://node9:5000"}', encoding='utf-8')
+    router = make_router(path)
+    assert router.ring.nodes == NODES
+    assert router.reload() is False
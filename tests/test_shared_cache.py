@@ -0,0 +1,206 @@
+"""Shared cache backends: eviction, expiry, key encoding and cross-worker single flight"""
+
+import fnmatch
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import pytest
+
+from app import shared_cache
+from app.shared_cache import RedisCache, SharedMemoryCache, _decode_key, _encode_key
+
+
+class FakeClock:
+    """Stands in for the time module inside app.shared_cache"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeRedis:
+    """In-memory stand-in with the redis-py calls RedisCache uses"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}  # name -> (value, expires at or None)
+
+    def _live(self, name):
+        entry = self.data.get(name)
+        if entry and entry[1] is not None and entry[1] <= self.clock.time():
+            del self.data[name]
+            return None
+        return entry
+
+    def get(self, name):
+        entry = self._live(name)
+        return entry[0] if entry else None
+
+    def set(self, name, value, px=None, nx=False):
+        if nx and self._live(name):
+            return None
+        expires_at = self.clock.time() + px / 1000 if px else None
+        self.data[name] = (value, expires_at)
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+    def pttl(self, name):
+        entry = self._live(name)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int((entry[1] - self.clock.time()) * 1000)
+
+    def scan_iter(self, match):
+        return [name for name in list(self.data) if self._live(name) and fnmatch.fnmatch(name, match)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(shared_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def make_shm():
+    prefix = f"agri-test-{uuid.uuid4().hex[:8]}"
+    caches = []
+
+    def make(max_size=8, ttl=60, slot_bytes=1024, lease=5):
+        cache = SharedMemoryCache(max_size, ttl, 'test', slot_bytes=slot_bytes, prefix=prefix, lease=lease)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        os.close(cache._lock_fd)
+        cache._shm.close()
+    if caches:
+        caches[0]._shm.unlink()
+        os.remove(os.path.join(tempfile.gettempdir(), f"{caches[0]._shm.name.lstrip('/')}.lock"))
+
+
+@pytest.fixture
+def redis_cache(clock):
+    return RedisCache(100, 60, 'test', client=FakeRedis(clock), prefix='agri-test', lease=5)
+
+
+@pytest.mark.parametrize('key', ['plain', 'कांदा भाव', ('chat', 'mr', 'abc'), ('nested', ('mr', 2))])
+def test_keys_round_trip(key):
+    assert _decode_key(_encode_key(key)) == key
+
+
+def test_full_bucket_evicts_least_recently_used(make_shm, clock):
+    cache = make_shm(max_size=8)  # One bucket of eight slots
+    for index in range(8):
+        cache.set(f"k{index}", index)
+        clock.sleep(1)
+    assert cache.get('k0') == 0  # Touch k0, so k1 is now the oldest
+    clock.sleep(1)
+    cache.set('k8', 8)
+    assert cache.get('k1') is None
+    assert cache.get('k0') == 0 and cache.get('k8') == 8
+    assert len(cache) == 8
+
+
+def test_entries_expire(make_shm, clock):
+    cache = make_shm(ttl=10)
+    cache.set('short', 'a', ttl=1)
+    cache.set('long', 'b')
+    clock.sleep(2)
+    assert cache.get('short') is None
+    assert cache.get('long') == 'b'
+    clock.sleep(10)
+    assert cache.get('long') is None and len(cache) == 0
+
+
+def test_oversized_value_is_not_stored(make_shm):
+    cache = make_shm(slot_bytes=1024)
+    cache.set('big', 'x' * 100000)
+    assert cache.get('big') is None
+    assert cache.stats()['oversize'] == 1
+
+
+def test_tuple_keys_survive_items(make_shm):
+    cache = make_shm()
+    cache.set(('chat', 'mr', 'abc'), {'answer': 'कांदा'})
+    assert cache.get(('chat', 'mr', 'abc')) == {'answer': 'कांदा'}
+    [(key, value, ttl)] = cache.items()
+    assert key == ('chat', 'mr', 'abc') and value == {'answer': 'कांदा'} and 0 < ttl <= 60
+
+
+def test_second_worker_waits_for_claimed_key(make_shm):
+    owner, other = make_shm(), make_shm()  # Two attachments of one segment, like two workers
+    started, finish = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append('owner')
+        started.set()
+        finish.wait(5)
+        return 'answer'
+
+    def fast():
+        calls.append('other')
+        return 'duplicate'
+
+    thread = threading.Thread(target=lambda: owner.get_or_compute('q', slow))
+    thread.start()
+    assert started.wait(5)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(other.get_or_compute('q', fast)))
+    waiter.start()
+    time.sleep(0.1)
+    finish.set()
+    thread.join(5)
+    waiter.join(5)
+
+    assert results == ['answer'] and calls == ['owner']
+    assert other.shared == 1
+
+
+def test_failed_computation_releases_claim(make_shm):
+    cache = make_shm()
+
+    def fail():
+        raise RuntimeError('gemini down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('q', fail)
+    assert cache.get_or_compute('q', lambda: 'answer') == 'answer'
+    assert cache.get('q') == 'answer'
+
+
+def test_redis_round_trip_and_expiry(redis_cache, clock):
+    redis_cache.set(('chat', 'mr', 'abc'), 'कांदा', ttl=1)
+    redis_cache.set('long', 'b')
+    assert redis_cache.get(('chat', 'mr', 'abc')) == 'कांदा'
+    assert {key for key, _, _ in redis_cache.items()} == {('chat', 'mr', 'abc'), 'long'}
+    clock.sleep(2)
+    assert redis_cache.get(('chat', 'mr', 'abc')) is None
+    assert len(redis_cache) == 1
+
+
+def test_redis_claim_blocks_other_workers(redis_cache, clock):
+    other = RedisCache(100, 60, 'test', client=redis_cache.client, prefix='agri-test', lease=5)
+    assert redis_cache._get_or_claim('q') == (shared_cache.CLAIMED, None)
+    assert other._get_or_claim('q') == (shared_cache.PENDING, None)
+    redis_cache.set('q', 'answer')
+    assert other.get_or_compute('q', lambda: 'duplicate') == 'answer'
+
+
+def test_redis_lease_expires(redis_cache, clock):
+    other = RedisCache(100, 60, 'test', client=redis_cache.client, prefix='agri-test', lease=5)
+    redis_cache._get_or_claim('q')  # Owner dies without storing a value
+    assert other.get_or_compute('q', lambda: 'recomputed') == 'recomputed'
+    assert other.shared == 1 and clock.now >= 1_000_005
@@ -0,0 +1,133 @@
+"""Running statistics: windowed rates and session aggregates kept in step with session_data"""
+
+import pytest
+
+from app import chatbot as chatbot_module
+from app.chatbot import AgriChatbot
+from app.stats import ChatStats, RateCounter
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def windows(counter):
+    return counter.snapshot()['per_minute']
+
+
+def test_events_leave_each_window_on_time():
+    clock = Clock()
+    counter = RateCounter(clock)
+    counter.add(6)
+    assert windows(counter) == {'1m': 6.0, '5m': 1.2, '1h': 0.1}
+
+    clock.now += 59
+    assert windows(counter)['1m'] == 6.0
+    clock.now += 1
+    assert windows(counter) == {'1m': 0.0, '5m': 1.2, '1h': 0.1}
+
+    clock.now += 240
+    assert windows(counter) == {'1m': 0.0, '5m': 0.0, '1h': 0.1}
+
+    clock.now += 3300
+    assert windows(counter) == {'1m': 0.0, '5m': 0.0, '1h': 0.0}
+    assert counter.snapshot()['total'] == 6
+
+
+def test_events_in_different_seconds_expire_separately():
+    clock = Clock()
+    counter = RateCounter(clock)
+    counter.add()
+    clock.now += 30
+    counter.add(2)
+    clock.now += 30
+    assert windows(counter)['1m'] == 2.0
+    clock.now += 30
+    assert windows(counter)['1m'] == 0.0
+    assert windows(counter)['5m'] == 0.6
+
+
+def test_gap_longer_than_an_hour_resets_the_windows():
+    clock = Clock()
+    counter = RateCounter(clock)
+    counter.add(5)
+    clock.now += 2 * 3600 + 7
+    counter.add()
+    assert windows(counter) == {'1m': 1.0, '5m': 0.2, '1h': round(1 / 60, 2)}
+    assert counter.snapshot()['total'] == 6
+    # The ring buffer is reused after the reset: the new event still expires after a minute
+    clock.now += 60
+    assert windows(counter)['1m'] == 0.0
+
+
+def test_server_errors_are_counted_separately():
+    stats = ChatStats()
+    stats.record_request('chat', 200)
+    stats.record_request('chat', 503)
+    stats.record_request('chat', 500)
+    stats.record_request('welcome', 404)
+    endpoints = stats.traffic_snapshot()['requests_by_endpoint']
+    assert endpoints['chat']['total'] == 3
+    assert endpoints['chat 5xx']['total'] == 2
+    assert endpoints['welcome']['total'] == 1
+    assert 'welcome 5xx' not in endpoints
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setattr(chatbot_module, 'chat_stats', ChatStats())
+    return AgriChatbot()
+
+
+def recount(bot):
+    """What the statistics would be if computed by walking session_data"""
+    sessions = list(bot.session_data.values())
+    languages = {'mr': 0, 'en': 0}
+    for session in sessions:
+        languages[session['preferred_language']] = languages.get(session['preferred_language'], 0) + 1
+    return {
+        'total_sessions': len(sessions),
+        'total_conversations': sum(session['conversation_count'] for session in sessions),
+        'language_distribution': languages,
+    }
+
+
+def snapshot(bot):
+    stats = chatbot_module.chat_stats.sessions_snapshot()
+    return {key: stats[key] for key in ('total_sessions', 'total_conversations', 'language_distribution')}
+
+
+def test_session_snapshot_matches_session_data(bot):
+    first = bot.create_session()
+    second = bot.create_session()
+    assert snapshot(bot) == recount(bot)
+
+    bot._update_session(first, 'en')
+    bot._update_session(first, 'en')
+    bot._update_session('unknown', 'mr')  # Creates the session
+    assert snapshot(bot) == recount(bot)
+    assert snapshot(bot)['total_conversations'] == 3
+
+    bot._put_session(second, dict(bot.session_data[second], preferred_language='en', conversation_count=4))
+    assert snapshot(bot) == recount(bot)
+
+    bot.import_sessions({
+        'moved': {'created_at': '2024-01-01T00:00:00', 'conversation_count': 2,
+                  'preferred_language': 'en', 'last_activity': '2024-01-01T00:00:00'},
+    })
+    assert snapshot(bot) == recount(bot)
+
+    bot._drop_session(second, expired=True)
+    assert snapshot(bot) == recount(bot)
+
+    bot.cleanup_old_sessions(hours=0)
+    assert not bot.session_data
+    assert snapshot(bot) == recount(bot)
+
+    stats = chatbot_module.chat_stats.sessions_snapshot()
+    assert stats['sessions_created']['total'] == 3
+    assert stats['sessions_expired']['total'] == 4
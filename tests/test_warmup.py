@@ -0,0 +1,81 @@
+"""Cache warm-up: readiness reporting and prefilling the response cache"""
+
+import threading
+
+import pytest
+
+from app import chatbot as chatbot_module
+from app import main, warmup
+from app.cache import response_cache
+from app.chatbot import chatbot
+from app.normalizer import canonical_key, normalize_text
+from app.warmup import CacheWarmer
+
+QUESTION = "How to control pink bollworm in cotton crop"
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+
+    def generate_response(self, text, language, timeout=None, direct=False):
+        self.calls.append(text)
+        return "Use pheromone traps and spray as advised."
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    generator = FakeGenerator()
+    monkeypatch.setattr(chatbot_module, 'answer_generator', generator)
+    response_cache.clear()
+    yield generator
+    response_cache.clear()
+
+
+def test_health_reports_warming_until_warmup_finishes(monkeypatch, tmp_path):
+    release = threading.Event()
+    monkeypatch.setattr(warmup, 'INDEX_WARMERS', [lambda: release.wait(5)])
+    warmer = CacheWarmer(str(tmp_path / 'snapshot.json'), top_k=0)
+    monkeypatch.setattr(main, 'cache_warmer', warmer)
+    client = main.app.test_client()
+
+    warmer.start()
+    response = client.get('/api/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'warming'
+    assert response.get_json()['components']['warmup'] == 'warming'
+
+    release.set()
+    warmer._thread.join(5)
+    response = client.get('/api/health')
+    assert response.status_code == 200
+    assert response.get_json()['components']['warmup'] == 'ready'
+
+
+def test_warm_query_fills_the_response_cache(generator):
+    throttled = []
+    assert chatbot.warm_query(QUESTION, 'en', lambda: throttled.append(1)) is True
+    assert generator.calls and throttled == [1]
+
+    query_key = canonical_key(normalize_text(QUESTION), normalized=True)
+    answer, cacheable = response_cache.get(chatbot._response_key(query_key, QUESTION, 'en'))
+    assert answer == "Use pheromone traps and spray as advised." and cacheable
+
+    # Already cached: nothing is generated or throttled again
+    assert chatbot.warm_query(QUESTION, 'en', lambda: throttled.append(1)) is False
+    assert len(generator.calls) == 1 and throttled == [1]
+
+
+def test_warm_query_skips_non_agriculture_questions(generator):
+    assert chatbot.warm_query("Who won the cricket match yesterday", 'en') is False
+    assert generator.calls == []
+
+
+def test_run_replays_top_questions(generator, monkeypatch, tmp_path):
+    monkeypatch.setattr(warmup, 'INDEX_WARMERS', [])
+    monkeypatch.setattr(warmup, 'top_queries', lambda top: [(QUESTION, 'en'), (QUESTION, 'en')])
+    warmer = CacheWarmer(str(tmp_path / 'snapshot.json'), top_k=2, rate=100)
+    warmer.run()
+    assert warmer.status()['state'] == 'ready'
+    assert (warmer.replayed, warmer.skipped, warmer.failed) == (1, 1, 0)
+    assert len(generator.calls) == 1
@@ -0,0 +1,50 @@
+"""Weather engine: cache keys follow the forecast, lookups during the first load"""
+
+import json
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app.weather import WeatherEngine
+
+
+def write_forecast(directory, issued, districts=('Nashik',)):
+    data = np.zeros((3, 1, len(districts)), dtype=np.float32)
+    np.save(directory / f"district_{issued}.npy", data)
+    meta = {'issued': issued, 'start_date': issued, 'variables': ['rain_mm'], 'districts': list(districts)}
+    (directory / f"district_{issued}.json").write_text(json.dumps(meta), encoding='utf-8')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    gazetteer = tmp_path / 'gazetteer.csv'
+    gazetteer.write_text("name,name_mr,district,kind,lat,lon\nNashik,नाशिक,Nashik,district,20.0,73.8\n",
+                         encoding='utf-8')
+    return WeatherEngine(str(tmp_path), str(gazetteer))
+
+
+def test_cache_tag_follows_forecast_issue_and_day(engine, tmp_path):
+    today = date.today().isoformat()
+    write_forecast(tmp_path, '2024-06-01')
+    engine.refresh(force=True)
+    first = engine.cache_tag('will it rain in nashik')
+    assert first == f":wx:2024-06-01:{today}"
+
+    write_forecast(tmp_path, '2024-06-02')
+    engine.refresh(force=True)
+    assert engine.cache_tag('will it rain in nashik') != first
+
+
+def test_cache_tag_is_empty_for_other_questions(engine):
+    assert engine.cache_tag('onion sowing time') == ''
+
+
+def test_parse_query_while_first_load_holds_the_lock(engine):
+    engine._refresh_lock.acquire()
+    try:
+        assert engine.parse_query('rain in nashik') is None
+        assert engine.context('rain in nashik', 'en') is None
+    finally:
+        engine._refresh_lock.release()
@@ -10,11 +10,20 @@ class AgriChatbot {
         this.typingSpeed = {min: 30, max: 90}; // Characters per second
         this.suggestionsVisible = false;
         this.debug = true; // Enable console logs for debugging
+        this.outbox = this.loadOutbox(); // Questions waiting to be sent (offline queue)
+        this.shownMessageIds = new Set();
+        this.retryTimer = null;
+        this.flushing = false;
         
         this.initializeElements();
         this.bindEvents();
         this.loadTranslations();
         this.initializeChat();
+        this.registerServiceWorker();
+        
+        // Send queued questions as soon as the connection returns
+        window.addEventListener('online', () => this.flushOutbox());
+        this.flushOutbox();
         
         // Log initialization state
         if (this.debug) this.logInitializationState();
@@ -218,6 +227,7 @@ class AgriChatbot {
                 weatherBtn: "Weather Tips",
                 processing: "Processing your query...",
                 errorMessage: "Something went wrong. Please try again.",
+                queuedMessage: "You are offline. Your question is saved and will be sent automatically when the connection returns.",
                 typing: "AI is thinking...",
                 sendButtonLabel: "Send message",
                 suggestedQuestions: "Suggested questions",
@@ -237,6 +247,7 @@ class AgriChatbot {
                 weatherBtn: "हवामान टिप्स",
                 processing: "तुमची क्वेरी प्रक्रिया करत आहे...",
                 errorMessage: "काहीतरी चूक झाली. कृपया पुन्हा प्रयत्न करा.",
+                queuedMessage: "तुम्ही ऑफलाइन आहात. तुमचा प्रश्न जतन केला आहे आणि कनेक्शन परत आल्यावर आपोआप पाठवला जाईल.",
                 typing: "AI विचार करत आहे...",
                 sendButtonLabel: "संदेश पाठवा",
                 suggestedQuestions: "सुचवलेले प्रश्न",
@@ -289,6 +300,9 @@ class AgriChatbot {
             console.error('Failed to fetch welcome message:', error);
         }
         
+        // Show the conversation so far after a reload
+        await this.restoreHistory();
+        
         // Focus on input field
         setTimeout(() => {
             this.userInput.focus();
@@ -310,6 +324,31 @@ class AgriChatbot {
         }
     }
 
+    async restoreHistory() {
+        if (!this.sessionId) return;
+        
+        try {
+            const response = await fetch(`/api/session/history?session_id=${encodeURIComponent(this.sessionId)}`);
+            if (!response.ok) return;
+            const history = await response.json();
+            if (!history.messages || history.messages.length === 0) return;
+            
+            history.messages.forEach(message => {
+                this.addMessage(message.user_input, 'user', message.timestamp);
+                this.addMessage(message.bot_response, 'bot', message.timestamp);
+                this.messageHistory.push({
+                    user: message.user_input,
+                    bot: message.bot_response,
+                    timestamp: message.timestamp,
+                    language: message.language
+                });
+            });
+            this.hideQuickActions();
+        } catch (error) {
+            console.error('Failed to restore history:', error);
+        }
+    }
+
     async sendMessage() {
         const message = this.userInput.value.trim();
         if (!message || this.isTyping) return;
@@ -331,6 +370,16 @@ class AgriChatbot {
         // Show typing indicator with realistic delay
         this.showTyping();
         
+        // The ID doubles as the Idempotency-Key, so retries never generate twice
+        const entry = {
+            id: this.generateMessageId(),
+            message: message,
+            language: this.currentLanguage,
+            queuedAt: Date.now(),
+            attempts: 0
+        };
+        this.shownMessageIds.add(entry.id);
+        
         try {
             // Calculate a realistic typing delay based on message length
             const messageLength = message.length;
@@ -345,91 +394,199 @@ class AgriChatbot {
             await new Promise(resolve => setTimeout(resolve, calculatedDelay));
             
             // Make API call to get response
-            const response = await this.callChatbotAPI(message);
+            const response = await this.callChatbotAPI(entry);
+            this.hideTyping();
+            this.handleBotResponse(entry, response);
+            
+        } catch (error) {
             this.hideTyping();
             
-            if (response) {
-                // Get the answer from the response
-                let botAnswer = '';
-                if (response.answer) {
-                    botAnswer = response.answer;
-                } else if (response.response) {
-                    botAnswer = response.response;
-                } else if (typeof response === 'string') {
-                    botAnswer = response;
+            if (error.retryable) {
+                // Offline or server unavailable: answer from the recent answers if we can,
+                // otherwise keep the question and retry with backoff
+                const recentAnswer = this.getRecentAnswer(entry.message, entry.language);
+                if (recentAnswer) {
+                    this.addMessage(recentAnswer, 'bot');
                 } else {
-                    throw new Error('Invalid response format');
-                }
-                
-                this.addMessage(botAnswer, 'bot');
-                
-                // Store in message history
-                this.messageHistory.push({
-                    user: message,
-                    bot: botAnswer,
-                    timestamp: new Date().toISOString(),
-                    language: this.currentLanguage
-                });
-                
-                // Update session ID if provided
-                if (response.session_id && !this.sessionId) {
-                    this.sessionId = response.session_id;
-                    localStorage.setItem('agri_chatbot_session_id', this.sessionId);
+                    this.queueMessage(entry);
+                    this.showError(this.translations[this.currentLanguage].queuedMessage);
                 }
             } else {
-                throw new Error('Invalid response format');
+                this.showError(this.translations[this.currentLanguage].errorMessage);
             }
-            
-        } catch (error) {
-            this.hideTyping();
-            this.showError(this.translations[this.currentLanguage].errorMessage);
             console.error('Chat error:', error);
         }
     }
 
-    async callChatbotAPI(message) {
+    handleBotResponse(entry, response) {
+        // Get the answer from the response
+        let botAnswer = '';
+        if (response && response.answer) {
+            botAnswer = response.answer;
+        } else if (response && response.response) {
+            botAnswer = response.response;
+        } else if (typeof response === 'string') {
+            botAnswer = response;
+        } else {
+            throw new Error('Invalid response format');
+        }
+        
+        // Questions queued before a reload are no longer on screen
+        if (!this.shownMessageIds.has(entry.id)) {
+            this.addMessage(entry.message, 'user');
+            this.shownMessageIds.add(entry.id);
+        }
+        
+        this.addMessage(botAnswer, 'bot');
+        this.saveRecentAnswer(entry.message, entry.language, botAnswer);
+        
+        // Store in message history
+        this.messageHistory.push({
+            user: entry.message,
+            bot: botAnswer,
+            timestamp: new Date().toISOString(),
+            language: entry.language
+        });
+        
+        // Update session ID if provided
+        if (response.session_id && !this.sessionId) {
+            this.sessionId = response.session_id;
+            localStorage.setItem('agri_chatbot_session_id', this.sessionId);
+        }
+    }
+
+    async callChatbotAPI(entry) {
+        let response;
         try {
-            // First try the main chat API
-            const response = await fetch('/api/chat', {
+            response = await fetch('/api/chat', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Idempotency-Key': entry.id
                 },
                 body: JSON.stringify({
-                    message: message,
+                    message: entry.message,
+                    message_id: entry.id,
                     session_id: this.sessionId,
-                    language: this.currentLanguage
+                    language: entry.language
                 })
             });
+        } catch (error) {
+            // Network failure (offline, dropped connection) - worth retrying
+            error.retryable = true;
+            throw error;
+        }
 
-            if (response.ok) {
-                return await response.json();
-            }
-            
-            // Fallback to the direct generate API if main API fails
-            console.log("Falling back to direct generate API");
-            const fallbackResponse = await fetch('/generate', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    prompt: message
-                })
-            });
+        if (response.ok) {
+            return await response.json();
+        }
+
+        const error = new Error(`HTTP error! status: ${response.status}`);
+        error.retryable = response.status === 429 || response.status >= 500;
+        throw error;
+    }
+
+    generateMessageId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    loadOutbox() {
+        try {
+            const outbox = JSON.parse(localStorage.getItem('agri_chatbot_outbox')) || [];
+            // Give up on questions that have been waiting for more than a day
+            return outbox.filter(entry => Date.now() - entry.queuedAt < 24 * 60 * 60 * 1000);
+        } catch (error) {
+            return [];
+        }
+    }
+
+    saveOutbox() {
+        localStorage.setItem('agri_chatbot_outbox', JSON.stringify(this.outbox));
+    }
+
+    queueMessage(entry) {
+        this.outbox.push(entry);
+        this.saveOutbox();
+        this.scheduleRetry();
+    }
+
+    scheduleRetry() {
+        if (this.retryTimer || !this.outbox.length) return;
+        
+        // Exponential backoff with jitter: ~2s, 4s, 8s ... capped at 5 minutes
+        const attempts = this.outbox[0].attempts;
+        const delay = Math.min(300000, 2000 * Math.pow(2, attempts)) * (0.5 + Math.random() / 2);
+        this.retryTimer = setTimeout(() => {
+            this.retryTimer = null;
+            this.flushOutbox();
+        }, delay);
+    }
 
-            if (!fallbackResponse.ok) {
-                throw new Error(`HTTP error! status: ${fallbackResponse.status}`);
+    async flushOutbox() {
+        if (this.flushing || !this.outbox.length) return;
+        this.flushing = true;
+        
+        try {
+            // Send in order; stop at the first retryable failure and back off
+            while (this.outbox.length && navigator.onLine !== false) {
+                const entry = this.outbox[0];
+                let response;
+                try {
+                    response = await this.callChatbotAPI(entry);
+                } catch (error) {
+                    if (error.retryable) {
+                        entry.attempts += 1;
+                        this.saveOutbox();
+                        break;
+                    }
+                    response = null;
+                }
+                
+                this.outbox.shift();
+                this.saveOutbox();
+                try {
+                    this.handleBotResponse(entry, response);
+                } catch (error) {
+                    this.showError(this.translations[this.currentLanguage].errorMessage);
+                    console.error('Queued chat error:', error);
+                }
             }
+        } finally {
+            this.flushing = false;
+            this.scheduleRetry();
+        }
+    }
 
-            return await fallbackResponse.json();
+    getRecentAnswer(message, language) {
+        const key = `${language}:${message.trim().toLowerCase()}`;
+        const recent = JSON.parse(localStorage.getItem('agri_chatbot_recent_answers') || '[]');
+        const match = recent.find(item => item.key === key);
+        return match ? match.answer : null;
+    }
+
+    saveRecentAnswer(message, language, answer) {
+        const key = `${language}:${message.trim().toLowerCase()}`;
+        let recent = JSON.parse(localStorage.getItem('agri_chatbot_recent_answers') || '[]');
+        recent = [{key: key, answer: answer}].concat(recent.filter(item => item.key !== key)).slice(0, 50);
+        try {
+            localStorage.setItem('agri_chatbot_recent_answers', JSON.stringify(recent));
         } catch (error) {
-            console.error("API call failed:", error);
-            throw error;
+            console.error('Could not save recent answer:', error);
         }
     }
 
-    addMessage(content, sender) {
+    registerServiceWorker() {
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('/sw.js').catch(error => {
+                console.error('Service worker registration failed:', error);
+            });
+        }
+    }
+
+    addMessage(content, sender, timestamp = null) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
         messageDiv.setAttribute('role', 'listitem');
@@ -454,7 +611,7 @@ class AgriChatbot {
         // Add timestamp
         const timestampDiv = document.createElement('div');
         timestampDiv.className = 'message-timestamp';
-        timestampDiv.textContent = this.getFormattedTimestamp();
+        timestampDiv.textContent = this.getFormattedTimestamp(timestamp);
         contentDiv.appendChild(timestampDiv);
         
         messageDiv.appendChild(avatarDiv);
@@ -504,10 +661,19 @@ class AgriChatbot {
             .replace(/\n/g, '<br>');
     }
 
-    getFormattedTimestamp() {
+    getFormattedTimestamp(timestamp = null) {
         const now = new Date();
         const translations = this.translations[this.currentLanguage].timestamp;
         
+        // Restored messages show when they were sent
+        if (timestamp) {
+            const sent = new Date(timestamp);
+            if (!isNaN(sent)) {
+                return sent.toLocaleString(this.currentLanguage === 'mr' ? 'mr-IN' : 'en-IN',
+                    {dateStyle: 'medium', timeStyle: 'short'});
+            }
+        }
+        
         return translations.justNow;
     }
 
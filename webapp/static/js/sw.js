@@ -0,0 +1,85 @@
+// AI Agri Chatbot - Service worker: offline app shell and asset cache
+//
+// Chat questions asked while offline are queued by the page (script.js),
+// not here, so they can be retried with backoff and shown as they arrive.
+
+const SHELL_CACHE = 'agri-shell-v1';
+const ASSET_CACHE = 'agri-assets-v1';
+const SHELL_URL = '/';
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const response = await fetch(SHELL_URL, {cache: 'no-cache'});
+        const shell = await caches.open(SHELL_CACHE);
+        await shell.put(SHELL_URL, response.clone());
+
+        // Precache the CSS/JS the shell references, and drop superseded versions
+        const html = await response.text();
+        const urls = [...html.matchAll(/(?:src|href)="(\/(?:assets|static)\/[^"]+)"/g)].map(match => match[1]);
+        const assets = await caches.open(ASSET_CACHE);
+        await assets.addAll(urls);
+        const current = new Set(urls.map(url => new URL(url, self.location.origin).href));
+        for (const request of await assets.keys()) {
+            if (!current.has(request.url)) {
+                await assets.delete(request);
+            }
+        }
+
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const keep = [SHELL_CACHE, ASSET_CACHE];
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => !keep.includes(name)).map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    // Chat POSTs and third-party requests go straight to the network
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+
+    if (url.pathname.startsWith('/assets/')) {
+        // Fingerprinted and immutable: the cached copy is always right
+        event.respondWith(cacheFirst(request, ASSET_CACHE));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, SHELL_CACHE, SHELL_URL));
+    } else if (url.pathname.startsWith('/static/') || url.pathname === '/api/welcome') {
+        event.respondWith(networkFirst(request, ASSET_CACHE));
+    }
+});
+
+async function cacheFirst(request, cacheName) {
+    const cached = await caches.match(request);
+    if (cached) return cached;
+
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(cacheName);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request, cacheName, fallbackUrl) {
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            const cache = await caches.open(cacheName);
+            await cache.put(fallbackUrl || request, response.clone());
+        }
+        return response;
+    } catch (error) {
+        // Offline: serve the last good copy of this exact URL (the welcome
+        // message's query string selects its language)
+        const cached = await caches.match(fallbackUrl || request);
+        if (cached) return cached;
+        throw error;
+    }
+}